@@ -3,34 +3,67 @@ import random
 import math
 import statistics
 import itertools
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+import heapq
 import threading
 import time
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
+from collections import defaultdict, deque, OrderedDict
+from functools import lru_cache
 import pickle
+import json
+import hashlib
+import hmac
+import sqlite3
 import os
 import sys
 import queue
 import uuid
 import signal
-import win32api
+import socket
+import socketserver
+import argparse
+import csv
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Importing the module has no side effects: the Windows console hooks below are
+# only loaded and installed by the interactive main()
+
+def _send_console_interrupt():
+    # Raises Ctrl+C in the Windows console so blocked threads wake up; elsewhere the
+    # optimizers' running flags are enough
+    try:
+        import win32api
+    except ImportError:
+        return
+    win32api.GenerateConsoleCtrlEvent(signal.CTRL_C_EVENT, 0)
 
 def handler(sig, frame):
     if sig == signal.SIGINT:
         print("\nCtrl+C detected. Gracefully shutting down...")
-        win32api.GenerateConsoleCtrlEvent(signal.CTRL_C_EVENT, 0)
+        if os.name == 'nt':
+            _send_console_interrupt()
+        else:
+            # Raise KeyboardInterrupt in the main thread, which cancels the optimizers
+            signal.default_int_handler(sig, frame)
 
-# Set up signal handlers
-signal.signal(signal.SIGINT, handler)
+def install_interrupt_handler():
+    signal.signal(signal.SIGINT, handler)
 
 class KeyboardMonitor:
-    def __init__(self, stop_word="bova"):
+    def __init__(self, stop_word="bova", stop_event=None):
         self.running = True
         self.stop_word = stop_word.lower()
         self.input_queue = queue.Queue()
         self.thread = threading.Thread(target=self._input_monitor)
         self.thread.daemon = True
-        self.stop_event = threading.Event()
+        # Pass the optimizers' cancel event to have the stop word cancel them directly
+        self.stop_event = stop_event if stop_event is not None else threading.Event()
         self.input_buffer = ""
     
     def start(self):
@@ -47,9 +80,18 @@ class KeyboardMonitor:
         if self.thread.is_alive():
             self.input_queue.put("")
     
+    def close(self):
+        # Stops reading the keyboard without cancelling anything, so that input()
+        # gets every line once the analysis is over
+        self.running = False
+        if self.thread.is_alive():
+            self.thread.join()
+    
     def _input_monitor(self):
-        import sys
-        import msvcrt
+        try:
+            import msvcrt
+        except ImportError:
+            return self._line_monitor()
         
         while self.running:
             try:
@@ -80,6 +122,22 @@ class KeyboardMonitor:
                 self.stop_event.set()
                 break
     
+    def _line_monitor(self):
+        # Without msvcrt (not on Windows), read whole lines from stdin instead
+        import select
+        
+        while self.running and not self.stop_event.is_set():
+            try:
+                ready, _, _ = select.select([sys.stdin], [], [], 0.1)
+                if ready and sys.stdin.readline().strip().lower() == self.stop_word:
+                    print("\nStop command received. Gracefully shutting down...")
+                    self.running = False
+                    self.stop_event.set()
+            except (OSError, ValueError, KeyboardInterrupt):
+                self.running = False
+                self.stop_event.set()
+                break
+    
     def should_continue(self):
         return self.running and not self.stop_event.is_set()
 
@@ -161,6 +219,7 @@ class PlayerManager:
                     print("Value must be between 0 and 1")
                     return
                 player.hit_chance = new_value
+                return player_name
             else:
                 print("\nEnter new hit probabilities (as decimals):")
                 print("Current values:")
@@ -205,78 +264,175 @@ class PlayerManager:
                     except ValueError:
                         print("Invalid input. Please enter decimal numbers.")
                         continue
+                return player_name
                     
         except ValueError:
             print("Invalid input. Please enter a number.")
             return
 
+class CommonRandomNumbers:
+    # Fixed, reproducible uniform streams, one per game index and one draw per plate
+    # appearance, so every lineup scored against game i faces the same luck
+    DRAWS_PER_GAME = 64
+    
+    def __init__(self, seed: int):
+        self.seed = seed
+        self.streams = {}
+    
+    def draws(self, game: int, count: int) -> List[float]:
+        stream = self.streams.get(game)
+        if stream is None:
+            stream = self.streams[game] = (random.Random(f"{self.seed}:{game}"), [])
+        generator, values = stream
+        while len(values) < count:
+            values.append(generator.random())
+        return values
+    
+    def game_stream(self, game: int):
+        values = self.draws(game, self.DRAWS_PER_GAME)
+        position = 0
+        while True:
+            if position == len(values):
+                values = self.draws(game, position * 2)
+            yield values[position]
+            position += 1
+    
+    def matrix(self, first_game: int, n_games: int, width: int = DRAWS_PER_GAME):
+        return np.array([self.draws(game, width)[:width] for game in range(first_game, first_game + n_games)])
+
+class RandomStreams:
+    # Independent, reproducible random streams spawned from one root seed. A child
+    # is keyed by what it is for (a lineup's games, the search itself) rather than
+    # by the thread, worker or shard that asks, so results don't depend on how the
+    # work is split up and no stream is ever shared between threads.
+    def __init__(self, seed: int):
+        self.seed = seed
+    
+    def key(self, *labels) -> int:
+        digest = hashlib.blake2b(repr((self.seed, labels)).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+    
+    def child(self, *labels) -> random.Random:
+        return random.Random(self.key(*labels))
+    
+    def generator(self, *labels) -> "np.random.Generator":
+        # numpy counterpart of child, spawned through SeedSequence; the batch
+        # engine and sensitivity grid take their bulk draws from one of these
+        if np is None:
+            raise ImportError("generator requires numpy")
+        return np.random.default_rng(np.random.SeedSequence(self.seed, spawn_key=(self.key(*labels),)))
+
+class CompiledLineup:
+    # Per-slot hitting numbers for one lineup, built once and reused for every
+    # game it plays
+    __slots__ = ('names', 'size', 'hit_chances', 'hit_thresholds')
+    
+    def __init__(self, players: Dict[str, Player], lineup: List[str]):
+        self.names = tuple(lineup)
+        self.size = len(lineup)
+        self.hit_chances = tuple(players[name].hit_chance for name in lineup)
+        # Running sums of the hit type probabilities, added in the same order as
+        # the original per-hit loop so every comparison comes out the same
+        self.hit_thresholds = tuple(tuple(itertools.accumulate(players[name].hit_probabilities[:4], initial=0))[1:]
+                                    for name in lineup)
+
 class BaseballSimulator:
-    def __init__(self, players: Dict[str, Player]):
+    def __init__(self, players: Dict[str, Player], track_metrics: bool = True, rng=None):
         self.players = players
-        self.metrics = MetricsTracker()
-        
-    def simulate_game(self, lineup: List[str]) -> Dict:
-        game_players = {name: Player(
-            name=self.players[name].name,
-            hit_chance=self.players[name].hit_chance,
-            hit_probabilities=self.players[name].hit_probabilities.copy(),
-            current_base=0,
-            is_batting=False
-        ) for name in lineup}
-        
-        game_players[lineup[0]].is_batting = True
+        # Anything with random(); the module-level generator unless one is given
+        self.rng = rng if rng is not None else random
+        # Optimizers skip metrics in their hot path by passing track_metrics=False
+        self.metrics = MetricsTracker() if track_metrics else None
+        
+    def compile_lineup(self, lineup: List[str]) -> "CompiledLineup":
+        return CompiledLineup(self.players, lineup)
+    
+    def simulate_game(self, lineup, uniforms=None, rng=None) -> Dict:
+        # lineup may be a list of names or a CompiledLineup reused across games;
+        # rng overrides the simulator's generator for this game
+        if not isinstance(lineup, CompiledLineup):
+            lineup = self.compile_lineup(lineup)
+        hit_chances = lineup.hit_chances
+        hit_thresholds = lineup.hit_thresholds
+        lineup_size = lineup.size
+        if uniforms is not None:
+            next_draw = uniforms.__next__
+        else:
+            next_draw = (rng if rng is not None else self.rng).random
+        
+        batter = 0
         sumRuns = 0
         inning_stats = []
         
         for inning in range(1, 7):
             currentOuts = 0
             inningRuns = 0
+            # Occupied bases as bits 1-3, and the slot (plus one) on each base
+            # packed a byte per base, since short lineups can bring up a batter
+            # who is still on base
+            bases = 0
+            runners = 0
             
-            while currentOuts < 3 and inningRuns < 5:
-                current_batter = next(player for player in game_players.values() if player.is_batting)
-                
-                if random.random() < current_batter.hit_chance:
-                    typeOfHit = random.random()
-                    cumulative_prob = 0
+            while currentOuts < 3:
+                # A supplied stream gives one draw per plate appearance, reused
+                # (rescaled) for the hit type
+                draw = next_draw()
+                hit_chance = hit_chances[batter]
+                if draw < hit_chance:
+                    typeOfHit = draw / hit_chance if uniforms is not None else next_draw()
+                    runner = batter + 1
+                    on_base = 0
+                    if bases:
+                        if (runners >> 8) & 0xFF == runner:
+                            on_base = 1
+                        elif (runners >> 16) & 0xFF == runner:
+                            on_base = 2
+                        elif (runners >> 24) & 0xFF == runner:
+                            on_base = 3
                     
-                    for base in range(4):
-                        cumulative_prob += current_batter.hit_probabilities[base]
-                        if typeOfHit < cumulative_prob:
-                            current_batter.current_base = base + 1
-                            break
+                    # A draw past every cumulative probability leaves the batter
+                    # where they stand
+                    thresholds = hit_thresholds[batter]
+                    if typeOfHit < thresholds[0]:
+                        new_base = 1
+                    elif typeOfHit < thresholds[1]:
+                        new_base = 2
+                    elif typeOfHit < thresholds[2]:
+                        new_base = 3
+                    elif typeOfHit < thresholds[3]:
+                        new_base = 4
+                    else:
+                        new_base = on_base
                     
-                    # Handle home run
-                    if current_batter.current_base == 4:
-                        inningRuns += 1
-                        sumRuns += 1
-                        current_batter.current_base = 0
+                    if on_base:
+                        bases &= ~(1 << on_base)
+                        runners &= ~(0xFF << (8 * on_base))
                     
-                    # Advance runners
-                    for runner in game_players.values():
-                        if runner.current_base > 0 and runner != current_batter:
-                            runner.current_base += current_batter.current_base
-                            if runner.current_base >= 4:
-                                inningRuns += 1
-                                sumRuns += 1
-                                runner.current_base = 0
-                                if inningRuns >= 5:
-                                    break
+                    if new_base == 4:
+                        # The batter's base resets before runners move, so a home
+                        # run only scores the batter
+                        inningRuns += 1
+                    elif new_base:
+                        # Advance runners
+                        bases <<= new_base
+                        runners <<= 8 * new_base
+                        inningRuns += (bases >> 4).bit_count()
+                        bases = (bases & 0b1110) | (1 << new_base)
+                        runners = (runners & 0xFFFFFF00) | (runner << (8 * new_base))
                     
                     if inningRuns >= 5:
+                        # The fifth run ends the inning with the same batter up next
+                        inningRuns = 5
                         break
                 else:
                     currentOuts += 1
                 
                 # Update batting order
-                current_idx = lineup.index(current_batter.name)
-                next_idx = (current_idx + 1) % len(lineup)
-                current_batter.is_batting = False
-                game_players[lineup[next_idx]].is_batting = True
-            
-            # Reset bases after inning
-            for player in game_players.values():
-                player.current_base = 0
+                batter += 1
+                if batter == lineup_size:
+                    batter = 0
             
+            sumRuns += inningRuns
             inning_stats.append({
                 'runs': inningRuns,
                 'five_run_inning': inningRuns == 5
@@ -287,147 +443,2585 @@ class BaseballSimulator:
             'inning_stats': inning_stats
         }
         
-        self.metrics.update_game_metrics(game_result)
+        if self.metrics is not None:
+            self.metrics.update_game_metrics(game_result)
         return game_result
+    
+    def lineup_arrays(self, lineup: List[str], players: Optional[Dict[str, Player]] = None):
+        # Per-slot cumulative thresholds on a single uniform draw: below the k-th
+        # threshold is a single/double/triple/HR/unclassified hit, past the last an out.
+        # Hit types use the same running sums as simulate_game. players overrides
+        # the simulator's roster.
+        players = players if players is not None else self.players
+        thresholds = []
+        for name in lineup:
+            player = players[name]
+            cumulative = [min(total, 1.0) for total in itertools.accumulate(player.hit_probabilities)]
+            thresholds.append([player.hit_chance * total for total in cumulative] + [player.hit_chance])
+        return np.array(thresholds, dtype=np.float64)
+    
+    def simulate_games(self, lineup: List[str], n_games: int, rng=None, streams=None, first_game=0) -> Dict:
+        if np is None:
+            raise ImportError("simulate_games requires numpy")
+        if rng is None:
+            rng = np.random.default_rng()
+        
+        lineup_size = len(lineup)
+        thresholds = self.lineup_arrays(lineup)
+        outcome_lookup = _outcome_lookup(thresholds)
+        machine = _batch_state_machine(lineup_size)
+        
+        # Per-game state for the games still in progress; game_ids maps rows back
+        # to their slot in the results
+        game_ids = np.arange(n_games)
+        state = np.full(n_games, machine['start'][0], dtype=np.int64)
+        inning = np.zeros(n_games, dtype=np.int64)
+        runs_by_inning = np.zeros((n_games, 6), dtype=np.int64)
+        
+        # Every game takes one plate appearance per step, so with common random
+        # numbers step t uses draw t of each game's stream
+        stream_draws = streams.matrix(first_game, n_games) if streams is not None else None
+        step = 0
+        
+        while game_ids.size:
+            if stream_draws is None:
+                draws = rng.random(game_ids.size)
+            else:
+                if step >= stream_draws.shape[1]:
+                    stream_draws = streams.matrix(first_game, n_games, stream_draws.shape[1] * 2)
+                draws = stream_draws[game_ids, step]
+                step += 1
+            
+            # Bucket the draw per batter; buckets straddling a threshold come back
+            # as -1 and are resolved with exact comparisons
+            bucket = (draws * LOOKUP_RESOLUTION).astype(np.int64)
+            bucket += np.take(machine['bucket_offset'], state)
+            outcome = np.take(outcome_lookup, bucket)
+            straddling = np.flatnonzero(outcome < 0)
+            if straddling.size:
+                batter = np.take(machine['batter'], state[straddling])
+                outcome[straddling] = (draws[straddling, None] >= thresholds[batter]).sum(axis=1)
+            
+            transition = state * 6
+            transition += outcome
+            state = np.take(machine['next_state'], transition)
+            inning_end_runs = np.take(machine['inning_end_runs'], transition)
+            
+            finished = np.flatnonzero(inning_end_runs >= 0)
+            if finished.size:
+                runs_by_inning[game_ids[finished], inning[finished]] = inning_end_runs[finished]
+                inning[finished] += 1
+                
+                in_progress = inning < 6
+                if not in_progress.all():
+                    game_ids = game_ids[in_progress]
+                    state = state[in_progress]
+                    inning = inning[in_progress]
+        
+        batch_result = {
+            'runs': runs_by_inning.sum(axis=1),
+            'inning_runs': runs_by_inning
+        }
+        
+        if self.metrics is not None:
+            self.metrics.update_batch_metrics(batch_result)
+        return batch_result
+    
+    def simulate_grid(self, lineups: List[List[str]], variants: List[Dict[str, Player]], n_games: int,
+                      rng=None) -> "np.ndarray":
+        # Runs of every lineup under every variant roster (the same names with
+        # different stats), shaped (variants, lineups, games). Every pair plays the
+        # same games: plate appearance t of game g uses draw (g, t) whatever the
+        # stats, so differences between variants come from the stats rather than
+        # the luck. All pairs step through the state machine together.
+        if np is None:
+            raise ImportError("simulate_grid requires numpy")
+        if rng is None:
+            rng = np.random.default_rng()
+        lineup_size = len(lineups[0])
+        if any(len(lineup) != lineup_size for lineup in lineups):
+            raise ValueError("simulate_grid needs lineups of one length")
+        machine = _batch_state_machine(lineup_size)
+        
+        # One (slots, thresholds) table per distinct (variant, lineup) pair - a
+        # variant that leaves a lineup's batters alone reuses its games - and a
+        # row per pair and game for the games still in progress
+        unique_pairs = {}
+        pair_index = []
+        for variant in variants:
+            for lineup in lineups:
+                thresholds = self.lineup_arrays(lineup, variant)
+                pair_index.append(unique_pairs.setdefault(thresholds.tobytes(), (len(unique_pairs), thresholds))[0])
+        pair_thresholds = np.array([thresholds for _, thresholds in unique_pairs.values()])
+        n_pairs = len(pair_thresholds)
+        # Outcome lookups are built once per distinct batter (a grid mostly repeats
+        # the same ones); pair_batters maps each pair's slots to them
+        batter_rows = {}
+        for thresholds in pair_thresholds.reshape(-1, pair_thresholds.shape[2]):
+            batter_rows.setdefault(thresholds.tobytes(), (len(batter_rows), thresholds))
+        pair_batters = np.array([batter_rows[thresholds.tobytes()][0]
+                                 for thresholds in pair_thresholds.reshape(-1, pair_thresholds.shape[2])])
+        outcome_lookup = _outcome_lookup(np.array([thresholds for _, thresholds in batter_rows.values()]))
+        row_ids = np.arange(n_pairs * n_games)
+        pair_ids = row_ids // n_games
+        games = row_ids % n_games
+        state = np.full(row_ids.size, machine['start'][0], dtype=np.int64)
+        inning = np.zeros(row_ids.size, dtype=np.int64)
+        runs = np.zeros(row_ids.size, dtype=np.int64)
+        draws = rng.random((n_games, CommonRandomNumbers.DRAWS_PER_GAME))
+        step = 0
+        
+        while row_ids.size:
+            if step >= draws.shape[1]:
+                draws = np.hstack([draws, rng.random((n_games, draws.shape[1]))])
+            draw = draws[games, step]
+            step += 1
+            
+            # Bucketed like simulate_games, in the lookup of the batter's stats
+            slot = np.take(machine['batter'], state)
+            slot += pair_ids * lineup_size
+            bucket = np.take(pair_batters, slot) * LOOKUP_RESOLUTION
+            bucket += (draw * LOOKUP_RESOLUTION).astype(np.int64)
+            outcome = np.take(outcome_lookup, bucket)
+            straddling = np.flatnonzero(outcome < 0)
+            if straddling.size:
+                outcome[straddling] = (draw[straddling, None] >=
+                                       pair_thresholds.reshape(-1, 5)[slot[straddling]]).sum(axis=1)
+            transition = state * 6
+            transition += outcome
+            state = np.take(machine['next_state'], transition)
+            inning_end_runs = np.take(machine['inning_end_runs'], transition)
+            
+            finished = np.flatnonzero(inning_end_runs >= 0)
+            if finished.size:
+                runs[row_ids[finished]] += inning_end_runs[finished]
+                inning[finished] += 1
+                
+                in_progress = inning < 6
+                if not in_progress.all():
+                    row_ids = row_ids[in_progress]
+                    pair_ids = pair_ids[in_progress]
+                    games = games[in_progress]
+                    state = state[in_progress]
+                    inning = inning[in_progress]
+        
+        return runs.reshape(n_pairs, n_games)[pair_index].reshape(len(variants), len(lineups), n_games)
 
 class MetricsTracker:
+    # Streaming game statistics: Welford running mean/variance of runs per game
+    # and a count of each inning score (0-5, innings stop at five runs), so the
+    # state stays fixed however many games are recorded
+    INNINGS = 6
+    MAX_INNING_RUNS = 5
+    
     def __init__(self):
         self.reset()
     
     def reset(self):
-        self.runs_by_inning = [[] for _ in range(6)]
-        self.five_run_innings = 0
-        self.total_runs = 0
         self.games_played = 0
+        self.total_runs = 0
+        self.mean_runs = 0.0
+        self.runs_m2 = 0.0
+        self.max_runs = 0
+        self.inning_histograms = [[0] * (self.MAX_INNING_RUNS + 1) for _ in range(self.INNINGS)]
     
     def update_game_metrics(self, game_result):
-        self.total_runs += game_result['runs']
+        runs = game_result['runs']
         self.games_played += 1
+        self.total_runs += runs
+        delta = runs - self.mean_runs
+        self.mean_runs += delta / self.games_played
+        self.runs_m2 += delta * (runs - self.mean_runs)
+        if runs > self.max_runs:
+            self.max_runs = runs
+        
+        for histogram, inning in zip(self.inning_histograms, game_result['inning_stats']):
+            histogram[inning['runs']] += 1
+    
+    def update_batch_metrics(self, batch_result):
+        runs = batch_result['runs']
+        if not len(runs):
+            return
+        self._combine(len(runs), int(runs.sum()), float(runs.mean()), float(((runs - runs.mean()) ** 2).sum()),
+                      int(runs.max()))
         
-        for i, inning in enumerate(game_result['inning_stats']):
-            self.runs_by_inning[i].append(inning['runs'])
-            if inning['five_run_inning']:
-                self.five_run_innings += 1
+        inning_runs = batch_result['inning_runs']
+        for histogram, column in zip(self.inning_histograms, inning_runs.T):
+            counts = np.bincount(column, minlength=self.MAX_INNING_RUNS + 1)
+            for inning_score, count in enumerate(counts.tolist()):
+                histogram[inning_score] += count
+    
+    def merge(self, other: "MetricsTracker") -> "MetricsTracker":
+        # Folds in a tracker filled elsewhere (another worker or shard)
+        if other.games_played:
+            self._combine(other.games_played, other.total_runs, other.mean_runs, other.runs_m2, other.max_runs)
+            for histogram, other_histogram in zip(self.inning_histograms, other.inning_histograms):
+                for inning_score, count in enumerate(other_histogram):
+                    histogram[inning_score] += count
+        return self
+    
+    def _combine(self, games, total_runs, mean_runs, runs_m2, max_runs):
+        # Chan et al.'s pairwise update of the running mean and sum of squares
+        combined = self.games_played + games
+        delta = mean_runs - self.mean_runs
+        self.runs_m2 += runs_m2 + delta * delta * self.games_played * games / combined
+        self.mean_runs += delta * games / combined
+        self.games_played = combined
+        self.total_runs += total_runs
+        self.max_runs = max(self.max_runs, max_runs)
     
     def get_game_metrics(self):
         if self.games_played == 0:
             return None
-            
+        
+        five_run_innings = sum(histogram[self.MAX_INNING_RUNS] for histogram in self.inning_histograms)
+        runs_by_inning = []
+        for histogram in self.inning_histograms:
+            innings = sum(histogram)
+            avg = sum(runs * count for runs, count in enumerate(histogram)) / innings if innings else 0
+            variance = sum(count * (runs - avg) ** 2 for runs, count in enumerate(histogram)) / innings if innings else 0
+            runs_by_inning.append({
+                'avg': avg,
+                'std': math.sqrt(variance),
+                'max': max((runs for runs, count in enumerate(histogram) if count), default=0),
+                'zero_run_pct': histogram[0] / innings if innings else 0,
+                'distribution': [count / innings if innings else 0 for count in histogram]
+            })
+        
         return {
             'avg_runs': self.total_runs / self.games_played,
-            'five_run_innings': self.five_run_innings,
-            'five_run_inning_pct': self.five_run_innings / (self.games_played * 6),
-            'runs_by_inning': [
-                {
-                    'avg': sum(runs) / len(runs) if runs else 0,
-                    'max': max(runs) if runs else 0,
-                    'zero_run_pct': runs.count(0) / len(runs) if runs else 0
-                }
-                for runs in self.runs_by_inning
-            ]
+            'runs_std': math.sqrt(self.runs_m2 / (self.games_played - 1)) if self.games_played > 1 else 0.0,
+            'max_runs': self.max_runs,
+            'five_run_innings': five_run_innings,
+            'five_run_inning_pct': five_run_innings / (self.games_played * self.INNINGS),
+            'runs_by_inning': runs_by_inning
+        }
+
+# Runner markers used by the exact engine's base tuples
+EMPTY_BASE = -1
+ANONYMOUS_RUNNER = -2
+
+def _tracks_runners(lineup_size: int) -> bool:
+    # An inning still in play has at most 2 outs, 4 runs and 3 runners behind it,
+    # so only lineups of 9 or fewer can bring a batter up while still on base.
+    # Longer lineups can treat runners as anonymous.
+    return lineup_size <= 9
+
+@lru_cache(maxsize=None)
+def _advance_runners(bases: Tuple[int, int, int], batter: int, new_base: int) -> Tuple[Tuple[int, int, int], int]:
+    # Mirrors the hit handling in BaseballSimulator.simulate_game. A batter who is
+    # still on base keeps that base when the hit type draw falls past the
+    # cumulative probabilities (new_base == 0), and on a home run the batter's
+    # base is reset before the other runners move, so nobody else advances.
+    on_base = bases.index(batter) + 1 if batter >= 0 and batter in bases else 0
+    if new_base == 0:
+        new_base = on_base
+    runs = 0
+    if new_base == 4:
+        runs += 1
+        step = 0
+    else:
+        step = new_base
+    
+    occupied = [EMPTY_BASE, EMPTY_BASE, EMPTY_BASE]
+    for base, runner in enumerate(bases, 1):
+        if runner == EMPTY_BASE or (batter >= 0 and runner == batter):
+            continue
+        if base + step >= 4:
+            runs += 1
+        else:
+            occupied[base + step - 1] = runner
+    if 1 <= new_base <= 3:
+        occupied[new_base - 1] = batter if batter >= 0 else ANONYMOUS_RUNNER
+    return tuple(occupied), runs
+
+class ExactSimulator:
+    INNINGS = 6
+    MAX_OUTS = 3
+    MAX_INNING_RUNS = 5
+    # Stop following an inning once the probability still in play drops below this
+    MIN_STATE_MASS = 1e-12
+    INNING_START = {(0, 0, (EMPTY_BASE, EMPTY_BASE, EMPTY_BASE)): 1.0}
+    
+    def __init__(self, players: Dict[str, Player]):
+        self.players = players
+    
+    def plate_appearance_outcomes(self, player: Player) -> List[Tuple[float, int]]:
+        # (probability, base reached) pairs; None is an out and 0 a hit whose type
+        # draw lands beyond the cumulative hit probabilities
+        outcomes = [(1 - player.hit_chance, None)]
+        cumulative = 0
+        previous = 0
+        for base in range(4):
+            cumulative += player.hit_probabilities[base]
+            reached = min(cumulative, 1.0)
+            if reached > previous:
+                outcomes.append((player.hit_chance * (reached - previous), base + 1))
+                previous = reached
+        if previous < 1.0:
+            outcomes.append((player.hit_chance * (1.0 - previous), 0))
+        return [(p, base) for p, base in outcomes if p > 0]
+    
+    def inning_distribution(self, outcomes: List[List[Tuple[float, int]]], start: int,
+                            states=None, result=None) -> Dict[Tuple[int, int], float]:
+        # Maps (runs scored, next inning's leadoff slot) to its probability. An
+        # inning already part-played (see extend_prefix) passes in its states and
+        # partial result, with start the slot now due up.
+        lineup_size = len(outcomes)
+        track_runners = _tracks_runners(lineup_size)
+        
+        if states is None:
+            states = self.INNING_START
+        result = defaultdict(float, result or {})
+        batter = start
+        
+        while states and sum(states.values()) > self.MIN_STATE_MASS:
+            next_batter = (batter + 1) % lineup_size
+            runner_id = batter if track_runners else ANONYMOUS_RUNNER
+            states = self.inning_step(states, result, outcomes[batter], batter, next_batter, runner_id)
+            batter = next_batter
+        
+        return dict(result)
+    
+    def inning_step(self, states: Dict, result: Dict, outcomes: List[Tuple[float, int]], batter: int,
+                    next_batter: int, runner_id: int) -> Dict:
+        # One plate appearance by `batter` from every in-play state; finished
+        # innings are added to result and the states still in play returned
+        next_states = defaultdict(float)
+        for (outs, runs, bases), state_prob in states.items():
+            for prob, new_base in outcomes:
+                p = state_prob * prob
+                if new_base is None:
+                    if outs + 1 >= self.MAX_OUTS:
+                        result[(runs, next_batter)] += p
+                    else:
+                        next_states[(outs + 1, runs, bases)] += p
+                    continue
+                
+                new_bases, scored = _advance_runners(bases, runner_id, new_base)
+                if runs + scored >= self.MAX_INNING_RUNS:
+                    # The inning ends before the batting order moves on
+                    result[(self.MAX_INNING_RUNS, batter)] += p
+                else:
+                    next_states[(outs, runs + scored, new_bases)] += p
+        return next_states
+    
+    def extend_prefix(self, progress: List, name: str, slot: int, lineup_size: int) -> List:
+        # Batting-order prefixes share their innings' opening plate appearances:
+        # progress holds, for each slot of the prefix, the (states, partial result)
+        # of an inning led off there, played up to the end of the prefix. Adding
+        # the batter in `slot` plays one more plate appearance in each, plus the
+        # inning they lead off. evaluate_rotations completes them once the lineup is full.
+        outcomes = self.plate_appearance_outcomes(self.players[name])
+        next_batter = (slot + 1) % lineup_size
+        runner_id = slot if _tracks_runners(lineup_size) else ANONYMOUS_RUNNER
+        extended = []
+        for states, result in progress + [(self.INNING_START, {})]:
+            if states and sum(states.values()) > self.MIN_STATE_MASS:
+                result = defaultdict(float, result)
+                states = self.inning_step(states, result, outcomes, slot, next_batter, runner_id)
+            extended.append((states, result))
+        return extended
+    
+    def evaluate_rotations(self, lineup: List[str], progress: Optional[List] = None) -> List[Tuple[List[str], Dict]]:
+        # evaluate() for every distinct rotation of lineup. A rotation sees the same
+        # innings, led off from other slots, so one inning distribution per slot
+        # serves them all. With progress from extend_prefix, the innings carry on
+        # from the end of the prefix around to the top of the order.
+        lineup_size = len(lineup)
+        outcomes = [self.plate_appearance_outcomes(self.players[name]) for name in lineup]
+        if progress is None:
+            innings = [self.inning_distribution(outcomes, start) for start in range(lineup_size)]
+        else:
+            innings = [self.inning_distribution(outcomes, 0, *progress[start]) for start in range(lineup_size)]
+        
+        def shifted(shift):
+            return lambda start: {(runs, (leadoff - shift) % lineup_size): p
+                                  for (runs, leadoff), p in innings[(start + shift) % lineup_size].items()}
+        
+        evaluations = []
+        seen = set()
+        for shift in range(lineup_size):
+            rotated = lineup[shift:] + lineup[:shift]
+            if tuple(rotated) not in seen:
+                seen.add(tuple(rotated))
+                evaluations.append((rotated, self.evaluate(rotated, shifted(shift))))
+        return evaluations
+    
+    def evaluate(self, lineup: List[str], inning_for=None) -> Dict:
+        outcomes = [self.plate_appearance_outcomes(self.players[name]) for name in lineup]
+        if inning_for is None:
+            inning_for = lambda start: self.inning_distribution(outcomes, start)
+        innings = {}
+        
+        # Distribution over (leadoff slot, total runs) entering each inning
+        game_states = {(0, 0): 1.0}
+        runs_by_inning = []
+        
+        for inning in range(self.INNINGS):
+            inning_runs = defaultdict(float)
+            next_states = defaultdict(float)
+            for (start, total), state_prob in game_states.items():
+                if start not in innings:
+                    innings[start] = inning_for(start)
+                for (runs, next_start), prob in innings[start].items():
+                    p = state_prob * prob
+                    inning_runs[runs] += p
+                    next_states[(next_start, total + runs)] += p
+            game_states = next_states
+            
+            distribution = [inning_runs.get(runs, 0.0) for runs in range(self.MAX_INNING_RUNS + 1)]
+            runs_by_inning.append({
+                'avg': sum(runs * p for runs, p in enumerate(distribution)),
+                'max': max((runs for runs, p in enumerate(distribution) if p > 0), default=0),
+                'zero_run_pct': distribution[0],
+                'distribution': distribution
+            })
+        
+        run_distribution = [0.0] * (self.INNINGS * self.MAX_INNING_RUNS + 1)
+        for (_, total), p in game_states.items():
+            run_distribution[total] += p
+        
+        return {
+            'avg_runs': sum(runs * p for runs, p in enumerate(run_distribution)),
+            'run_distribution': run_distribution,
+            'five_run_inning_pct': sum(inning['distribution'][self.MAX_INNING_RUNS] for inning in runs_by_inning) / self.INNINGS,
+            'runs_by_inning': runs_by_inning
+        }
+    
+    def expected_runs(self, lineup: List[str]) -> float:
+        return self.evaluate(lineup)['avg_runs']
+    
+    def upper_bound(self, lineup: List[Optional[str]], pool: List[str]) -> float:
+        # Optimistic expected runs for a partial lineup whose open (None) slots are
+        # filled from pool. The open slot's batter is picked afresh at every plate
+        # appearance to suit the game state; with a small pool each player may only
+        # be picked once per trip through the order. Any completed lineup is one
+        # such policy, so this never falls below its expected runs. Solved by value
+        # iteration over the batch engine's in-inning states, inning by inning from
+        # the last.
+        if np is None:
+            raise ImportError("upper_bound requires numpy")
+        
+        lineup_size = len(lineup)
+        machine = _batch_state_machine(lineup_size)
+        batter = machine['batter']
+        next_state = machine['next_state'].reshape(-1, len(BATCH_OUTCOME_BASES))
+        inning_end_runs = machine['inning_end_runs'].reshape(next_state.shape)
+        inning_over = inning_end_runs >= 0
+        next_leadoff = batter[next_state]
+        
+        def outcome_probs(name):
+            probs = np.zeros(len(BATCH_OUTCOME_BASES))
+            for prob, new_base in self.plate_appearance_outcomes(self.players[name]):
+                probs[BATCH_OUTCOME_BASES.index(new_base)] += prob
+            return probs
+        
+        # Used-pool bitmasks for the current trip through the order; one shared
+        # set (no tracking) once the pool is too large to enumerate
+        tracked = len(pool) <= BOUND_TRACKED_POOL
+        used_sets = np.arange(1 << len(pool) if tracked else 1)
+        moves_on = ~(inning_over & (inning_end_runs == self.MAX_INNING_RUNS))
+        new_trip = moves_on & (batter[:, None] == lineup_size - 1)
+        
+        def transitions(states, bit):
+            # Flat index of each (state, outcome, used set)'s successor in the
+            # value table, or in the finished-inning block after it; a fifth-run
+            # ending sends the same slot up again, so it doesn't count as used yet
+            used_after = np.where(moves_on[states][:, :, None], used_sets | bit, used_sets)
+            used_after = np.where(new_trip[states][:, :, None], 0, used_after)
+            finished = (len(batter) + inning_end_runs[states] * lineup_size + next_leadoff[states])[:, :, None]
+            following = np.where(inning_over[states][:, :, None], finished, next_state[states][:, :, None])
+            return following * len(used_sets) + used_after
+        
+        is_open = np.array([name is None for name in lineup])[batter]
+        fixed_states = np.flatnonzero(~is_open)
+        open_states = np.flatnonzero(is_open)
+        fixed_probs = np.array([outcome_probs(name) if name is not None else np.zeros(len(BATCH_OUTCOME_BASES))
+                                for name in lineup])[batter[fixed_states]]
+        fixed_moves = transitions(fixed_states, 0)
+        pool_moves = [(outcome_probs(name), transitions(open_states, 1 << row if tracked else 0),
+                       (used_sets >> row) & 1 == 1 if tracked else np.zeros(len(used_sets), dtype=bool))
+                      for row, name in enumerate(pool)]
+        
+        future = np.zeros((lineup_size, len(used_sets)))
+        for _ in range(self.INNINGS):
+            # Finished innings score their runs plus the rest of the game from the next leadoff
+            finished = (np.arange(self.MAX_INNING_RUNS + 1)[:, None, None] + future[None]).ravel()
+            values = np.zeros((len(batter), len(used_sets)))
+            for _ in range(BOUND_MAX_SWEEPS):
+                table = np.concatenate([values.ravel(), finished])
+                updated = np.empty_like(values)
+                updated[fixed_states] = np.einsum('sou,so->su', np.take(table, fixed_moves), fixed_probs)
+                # Exhausted pools only arise in unreachable states; they score zero
+                best = np.zeros((len(open_states), len(used_sets)))
+                for probs, moves, already_used in pool_moves:
+                    choice = np.einsum('sou,o->su', np.take(table, moves), probs)
+                    best = np.maximum(best, np.where(already_used, 0.0, choice))
+                updated[open_states] = best
+                converged = np.abs(updated - values).max() < BOUND_CONVERGENCE
+                values = updated
+                if converged:
+                    break
+            future = values[machine['start']]
+        
+        return float(future[0, 0])
+
+# Value iteration limits for ExactSimulator.upper_bound; only hits whose type draw
+# misses every threshold loop back, so a few sweeps past the longest inning suffice
+BOUND_MAX_SWEEPS = 200
+BOUND_CONVERGENCE = 1e-13
+# Largest pool of unplaced players whose per-trip usage the bound tracks (the
+# state space doubles with each one)
+BOUND_TRACKED_POOL = 4
+# Branch-and-bound only prunes subtrees whose bound is clearly below the k-th best,
+# and only bounds subtrees with BOUND_MIN_POOL to BOUND_TRACKED_POOL open slots:
+# with more, the untracked bound is far too loose to prune anything (17-29 runs
+# against a best of about 10.5 on the default roster), and a single lineup is
+# scored outright. Lineups shorter than BOUND_MIN_LINEUP (those that track
+# runners) are never bounded, since their state space makes one bound cost more
+# than scoring dozens of lineups.
+BOUND_TOLERANCE = 1e-9
+BOUND_MIN_POOL = 2
+BOUND_MIN_LINEUP = 10
+
+# Buckets per unit interval in the batch engine's outcome lookup (a power of two
+# so bucketing a draw is exact)
+LOOKUP_RESOLUTION = 4096
+
+def _outcome_lookup(thresholds) -> "np.ndarray":
+    # Plate appearance outcome (0-3 single to HR, 4 unclassified hit, 5 out) for each
+    # (slot, bucket) pair, or -1 where a threshold falls inside the bucket
+    edges = np.arange(LOOKUP_RESOLUTION + 1) / LOOKUP_RESOLUTION
+    low = (edges[None, :-1, None] >= thresholds[:, None, :]).sum(axis=2)
+    high = (np.nextafter(edges[None, 1:, None], 0) >= thresholds[:, None, :]).sum(axis=2)
+    return np.where(low == high, low, -1).ravel()
+
+# Base reached for each batch outcome code; None is an out
+BATCH_OUTCOME_BASES = (1, 2, 3, 4, 0, None)
+
+@lru_cache(maxsize=None)
+def _batch_state_machine(lineup_size: int) -> Dict:
+    # Numbers every reachable in-inning state (outs, runs, bases, batter) and tabulates,
+    # per (state, outcome), the next state and the inning's final runs (-1 while
+    # the inning continues). A finished inning moves to the next leadoff's start
+    # state, using the exact engine's runner rules throughout.
+    track_runners = _tracks_runners(lineup_size)
+    empty = (EMPTY_BASE, EMPTY_BASE, EMPTY_BASE)
+    index = {}
+    states = []
+    
+    def state_id(state):
+        if state not in index:
+            index[state] = len(states)
+            states.append(state)
+        return index[state]
+    
+    start = [state_id((0, 0, empty, batter)) for batter in range(lineup_size)]
+    next_state = []
+    inning_end_runs = []
+    
+    position = 0
+    while position < len(states):
+        outs, runs, bases, batter = states[position]
+        next_batter = (batter + 1) % lineup_size
+        runner_id = batter if track_runners else ANONYMOUS_RUNNER
+        
+        for new_base in BATCH_OUTCOME_BASES:
+            if new_base is None:
+                if outs + 1 >= 3:
+                    next_state.append(start[next_batter])
+                    inning_end_runs.append(runs)
+                else:
+                    next_state.append(state_id((outs + 1, runs, bases, next_batter)))
+                    inning_end_runs.append(-1)
+                continue
+            
+            new_bases, scored = _advance_runners(bases, runner_id, new_base)
+            if runs + scored >= 5:
+                # The fifth run ends the inning without moving on to the next batter
+                next_state.append(start[batter])
+                inning_end_runs.append(5)
+            else:
+                next_state.append(state_id((outs, runs + scored, new_bases, next_batter)))
+                inning_end_runs.append(-1)
+        position += 1
+    
+    batters = np.array([state[3] for state in states], dtype=np.int64)
+    return {
+        'start': start,
+        'batter': batters,
+        'bucket_offset': batters * LOOKUP_RESOLUTION,
+        'next_state': np.array(next_state, dtype=np.int64),
+        'inning_end_runs': np.array(inning_end_runs, dtype=np.int64)
+    }
+
+def unrank_permutation(items: List, rank: int) -> List:
+    # Rank-th permutation in itertools.permutations (lexicographic by position) order
+    pool = list(items)
+    result = []
+    for remaining in range(len(pool), 0, -1):
+        index, rank = divmod(rank, math.factorial(remaining - 1))
+        result.append(pool.pop(index))
+    return result
+
+def multiset_permutation_count(values: List) -> int:
+    count = math.factorial(len(values))
+    for value in set(values):
+        count //= math.factorial(values.count(value))
+    return count
+
+def unrank_multiset_permutation(values: List, rank: int) -> List:
+    # Rank-th distinct arrangement of values in lexicographic order
+    counts = {value: list(values).count(value) for value in sorted(set(values))}
+    remaining = len(values)
+    result = []
+    while remaining:
+        for value in counts:
+            if not counts[value]:
+                continue
+            counts[value] -= 1
+            block = math.factorial(remaining - 1)
+            for count in counts.values():
+                block //= math.factorial(count)
+            if rank < block:
+                result.append(value)
+                break
+            rank -= block
+            counts[value] += 1
+        remaining -= 1
+    return result
+
+def rank_multiset_permutation(arrangement: List) -> int:
+    # Inverse of unrank_multiset_permutation
+    counts = {value: list(arrangement).count(value) for value in sorted(set(arrangement))}
+    rank = 0
+    for value in arrangement:
+        for smaller in counts:
+            if smaller == value:
+                break
+            if not counts[smaller]:
+                continue
+            counts[smaller] -= 1
+            rank += multiset_permutation_count([v for v, count in counts.items() for _ in range(count)])
+            counts[smaller] += 1
+        counts[value] -= 1
+    return rank
+
+def multiset_permutations_from_rank(values: List, start: int, stop: int):
+    # Yields distinct arrangements start..stop-1 without materializing the ones before them
+    size = len(values)
+    current = unrank_multiset_permutation(values, start)
+    for _ in range(start, stop):
+        yield list(current)
+        
+        # Step to the next arrangement in lexicographic order
+        pivot = size - 2
+        while pivot >= 0 and current[pivot] >= current[pivot + 1]:
+            pivot -= 1
+        if pivot < 0:
+            return
+        successor = size - 1
+        while current[successor] <= current[pivot]:
+            successor -= 1
+        current[pivot], current[successor] = current[successor], current[pivot]
+        current[pivot + 1:] = reversed(current[pivot + 1:])
+
+def permutations_from_rank(items: List, start: int, stop: int):
+    # Permutations start..stop-1 in itertools.permutations order
+    for indices in multiset_permutations_from_rank(list(range(len(items))), start, stop):
+        yield [items[i] for i in indices]
+
+def expand_lineup(classes: List[List[str]], class_ids: List[int]) -> List[str]:
+    # Turns a sequence of equivalence classes back into named players, handing out
+    # each class's names in roster order
+    positions = [0] * len(classes)
+    lineup = []
+    for class_id in class_ids:
+        lineup.append(classes[class_id][positions[class_id]])
+        positions[class_id] += 1
+    return lineup
+
+def _reach_profile(player: Player) -> Tuple[float, ...]:
+    # Per plate appearance: the chance of not making an out, of a hit reaching at
+    # least first, second and third without leaving the park, and of a home run
+    # (rounded, so .6 + .3 + .1 counts as reaching first for sure)
+    probabilities = player.hit_probabilities
+    return (player.hit_chance,) + tuple(round(player.hit_chance * min(1.0, sum(probabilities[base:3])), 12)
+                                        for base in range(3)) + (round(player.hit_chance * probabilities[3], 12),)
+
+def _dominates(profile: Tuple[float, ...], other: Tuple[float, ...]) -> bool:
+    # At least as likely to reach every base, more likely in something, and with
+    # the same home run chance: a home run scores only the batter and leaves the
+    # runners where they are, so it doesn't always beat a triple
+    return (all(a >= b for a, b in zip(profile[:-1], other[:-1])) and profile[-1] == other[-1]
+            and profile != other)
+
+def _lineup_sort_key(entry):
+    # (avg_runs, rank, lineup) entries: higher runs first, lower rank breaks ties
+    return entry[0], -entry[1]
+
+def _push_top_k(heap: List, entry: Tuple, top_k: int):
+    # Bounded min-heap of (avg_runs, -rank, lineup) entries holding the best top_k
+    if len(heap) < top_k:
+        heapq.heappush(heap, entry)
+    elif entry[:2] > heap[0][:2]:
+        heapq.heapreplace(heap, entry)
+
+def _merge_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged = []
+    for start, stop in sorted(ranges):
+        if start >= stop:
+            continue
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], stop))
+        else:
+            merged.append((start, stop))
+    return merged
+
+def _missing_ranges(completed: List[Tuple[int, int]], total: int, chunk_size: int):
+    # Rank ranges of at most chunk_size that are not covered by the completed ranges
+    position = 0
+    for start, stop in completed + [(total, total)]:
+        for chunk_start in range(position, min(start, total), chunk_size):
+            yield chunk_start, min(chunk_start + chunk_size, start, total)
+        position = max(position, stop)
+
+def _ranked_lineups(heap: List) -> List[Tuple[List[str], float]]:
+    return [(lineup, avg_runs) for avg_runs, _, lineup in sorted(heap, key=lambda entry: entry[:2], reverse=True)]
+
+def _describe_interval(interval: Optional[Dict], confidence: float) -> str:
+    # " (95% CI 8.10-8.70 over 100 games)" for a LineupOptimizer.score_interval;
+    # nothing for exact scores
+    if not interval or not interval['std_error']:
+        return ""
+    return (f" ({confidence * 100:.0f}% CI {interval['ci_low']:.2f}-{interval['ci_high']:.2f}"
+            f" over {interval['games']} games)")
+
+# Set in each deep search worker process so the parent can stop running shards
+_shard_stop_event = None
+
+def _init_shard_worker(stop_event):
+    global _shard_stop_event
+    _shard_stop_event = stop_event
+
+def _search_rank_range(players: Dict[str, Player], worker_options: Dict, games_per_lineup: int, top_k: int,
+                       start: int, stop: int):
+    optimizer = LineupOptimizer(players, mode='deep', **worker_options)
+    return optimizer.search_rank_range(start, stop, games_per_lineup, top_k)
+
+class SearchBudgetExhausted(Exception):
+    pass
+
+class SearchBudget:
+    # Scores lineups for the metaheuristic modes: caches repeat visits, stops after
+    # max_evaluations distinct lineups (or every lineup, on rosters with fewer),
+    # keeps the top-k and a (evaluations, best) convergence trace
+    # A search that only revisits scored lineups this many times in a row is stuck
+    # (e.g. annealing at a local optimum of a small roster) and is stopped too
+    STALL_LIMIT = 10000
+    
+    def __init__(self, optimizer, games_per_lineup: int):
+        self.optimizer = optimizer
+        self.games_per_lineup = optimizer.games_per_lineup = games_per_lineup
+        self.scores = {}
+        # Small rosters have fewer lineups than the budget; once all are scored
+        # only cached revisits would be left
+        self.limit = min(optimizer.max_evaluations, math.factorial(len(optimizer.players)))
+        self.repeats = 0
+        self.best_lineups = []
+        self.best_score = -math.inf
+        self.trace = []
+    
+    @property
+    def evaluations(self) -> int:
+        return len(self.scores)
+    
+    def score(self, lineup: List[str]) -> float:
+        key = tuple(lineup)
+        if self.evaluations >= self.limit or not self.optimizer.running:
+            raise SearchBudgetExhausted()
+        if key in self.scores:
+            self.repeats += 1
+            if self.repeats > self.STALL_LIMIT:
+                raise SearchBudgetExhausted()
+            return self.scores[key]
+        
+        self.repeats = 0
+        avg_runs = self.optimizer.evaluate_lineup(list(lineup), self.games_per_lineup)
+        self.scores[key] = avg_runs
+        _push_top_k(self.best_lineups, (avg_runs, -self.evaluations, list(lineup)), self.optimizer.top_k)
+        if avg_runs > self.best_score:
+            self.best_score = avg_runs
+            self.trace.append((self.evaluations, avg_runs))
+        
+        self.optimizer.report_progress((self.evaluations / self.limit) * 100,
+                                       games=self.games_per_lineup, score=avg_runs, leaders=self.best_lineups)
+        return avg_runs
+    
+    def results(self, **stats) -> List[Tuple[List[str], float]]:
+        self.trace.append((self.evaluations, self.best_score))
+        self.optimizer.search_stats = dict(evaluations=self.evaluations, trace=self.trace, **stats)
+        return _ranked_lineups(self.best_lineups)
+
+def _swap_neighbor(lineup: List[str], rng=random) -> List[str]:
+    first, second = rng.sample(range(len(lineup)), 2)
+    neighbor = list(lineup)
+    neighbor[first], neighbor[second] = neighbor[second], neighbor[first]
+    return neighbor
+
+def _insert_neighbor(lineup: List[str], rng=random) -> List[str]:
+    source, target = rng.sample(range(len(lineup)), 2)
+    neighbor = list(lineup)
+    neighbor.insert(target, neighbor.pop(source))
+    return neighbor
+
+def _neighborhood(lineup: List[str]):
+    # Every swap of two slots, then every move of one batter to a non-adjacent slot
+    # (adjacent moves are already swaps)
+    size = len(lineup)
+    for first in range(size):
+        for second in range(first + 1, size):
+            swapped = list(lineup)
+            swapped[first], swapped[second] = swapped[second], swapped[first]
+            yield swapped
+    for source in range(size):
+        for target in range(size):
+            if abs(source - target) > 1:
+                moved = list(lineup)
+                moved.insert(target, moved.pop(source))
+                yield moved
+
+def _order_crossover(first: List[str], second: List[str], rng=random) -> List[str]:
+    # OX1: copy a slice from the first parent, fill the rest in the second parent's order
+    start, stop = sorted(rng.sample(range(len(first) + 1), 2))
+    child = [None] * len(first)
+    child[start:stop] = first[start:stop]
+    kept = set(first[start:stop])
+    fill = (name for name in second if name not in kept)
+    for position in list(range(stop, len(first))) + list(range(start)):
+        child[position] = next(fill)
+    return child
+
+class EvaluationCache:
+    # Accumulated (games, sum of runs, sum of squares) per lineup, so later
+    # requests refine an entry with extra games instead of starting over. Keys
+    # come from LineupOptimizer.evaluation_key. Holds at most max_entries in
+    # memory, or as many as fit in max_bytes, evicting the least recently used;
+    # with a path, evicted entries are written to an SQLite file in batches and
+    # read back on a miss. Shared by the quick and deep threads: `lock` guards the
+    # in-memory entries and `db_lock` the file, so memory hits never wait on disk.
+    # Measured size of one entry (16-byte key, tuple and OrderedDict slot)
+    ENTRY_BYTES = 300
+    EVICTION_BATCH = 10000
+    
+    def __init__(self, max_entries: int = 200000, path: Optional[str] = None, max_bytes: Optional[int] = None):
+        if max_bytes is not None:
+            max_entries = max(1, max_bytes // self.ENTRY_BYTES)
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()
+        # Evicted entries not yet committed to the file
+        self.evicted = {}
+        self.lock = threading.Lock()
+        self.db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.db = None
+        if path is not None:
+            self.db = sqlite3.connect(path, check_same_thread=False)
+            self.db.execute("CREATE TABLE IF NOT EXISTS evaluations "
+                            "(key BLOB PRIMARY KEY, games INTEGER, total REAL, squares REAL)")
+    
+    def get(self, key: bytes) -> Optional[Tuple[int, float, float]]:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            else:
+                entry = self.evicted.get(key)
+                if entry is not None:
+                    self._store(key, entry)
+            if entry is not None or self.db is None:
+                self._count(entry)
+                return entry
+        
+        with self.db_lock:
+            row = self.db.execute("SELECT games, total, squares FROM evaluations WHERE key = ?", (key,)).fetchone()
+        with self.lock:
+            # Another thread may have stored a newer entry while the file was read
+            entry = self.entries.get(key) or (tuple(row) if row is not None else None)
+            if entry is not None:
+                self._store(key, entry)
+            self._count(entry)
+        return entry
+    
+    def _count(self, entry):
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+    
+    def put(self, key: bytes, entry: Tuple[int, float, float]):
+        with self.lock:
+            self._store(key, entry)
+            full = len(self.evicted) >= self.EVICTION_BATCH
+        if full:
+            self.write(include_entries=False)
+    
+    def _store(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            evicted_key, evicted = self.entries.popitem(last=False)
+            if self.db is not None:
+                self.evicted[evicted_key] = evicted
+    
+    def write(self, include_entries: bool):
+        # Commits the evicted entries (and, for a flush, the in-memory ones) in one
+        # executemany. Evicted entries stay readable from memory until committed.
+        if self.db is None:
+            return
+        with self.db_lock:
+            with self.lock:
+                written = dict(self.evicted)
+                rows = [(key, *entry) for key, entry in written.items()]
+                if include_entries:
+                    rows.extend((key, *entry) for key, entry in self.entries.items())
+            self.db.executemany("INSERT OR REPLACE INTO evaluations VALUES (?, ?, ?, ?)", rows)
+            self.db.commit()
+            with self.lock:
+                for key, entry in written.items():
+                    if self.evicted.get(key) is entry:
+                        del self.evicted[key]
+    
+    def flush(self):
+        self.write(include_entries=True)
+    
+    def close(self):
+        self.flush()
+        with self.db_lock:
+            if self.db is not None:
+                self.db.close()
+                self.db = None
+    
+    def __len__(self):
+        return len(self.entries)
+
+class ScoreTable:
+    # Every deep-search lineup's mean runs and game count (NaN mean until scored),
+    # stored as float32/uint32 pairs indexed by lineup rank in a file opened with
+    # mmap. The JSON header holds the equivalence classes the ranks refer to, so a
+    # table can be queried on its own after the run.
+    MAGIC = b"LINEUPSC"
+    SCAN_CHUNK = 1 << 20
+    
+    def __init__(self, path: str, writable: bool = False):
+        if np is None:
+            raise ImportError("ScoreTable requires numpy")
+        with open(path, 'rb') as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError(f"{path} is not a lineup score table")
+            header_size = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_size))
+        self.path = path
+        self.classes = header['classes']
+        self.class_ids = header['class_ids']
+        self.total_lineups = header['total_lineups']
+        self.roster = header.get('roster')
+        self.class_of = {name: class_id for class_id, names in enumerate(self.classes) for name in names}
+        self.records = np.memmap(path, dtype=self.record_dtype(), mode='r+' if writable else 'r',
+                                 offset=self.data_offset(header_size), shape=(self.total_lineups,))
+    
+    @staticmethod
+    def record_dtype():
+        return np.dtype([('mean', '<f4'), ('games', '<u4')])
+    
+    @classmethod
+    def data_offset(cls, header_size: int) -> int:
+        # Records start 8-byte aligned after the magic, size and header
+        return -(-(len(cls.MAGIC) + 8 + header_size) // 8) * 8
+    
+    @classmethod
+    def create(cls, path: str, classes: List[List[str]], class_ids: List[int], roster=None) -> "ScoreTable":
+        if np is None:
+            raise ImportError("ScoreTable requires numpy")
+        total_lineups = multiset_permutation_count(class_ids)
+        header = json.dumps({'classes': classes, 'class_ids': class_ids, 'total_lineups': total_lineups,
+                             'roster': roster}).encode()
+        offset = cls.data_offset(len(header))
+        with open(path, 'wb') as f:
+            f.write(cls.MAGIC + len(header).to_bytes(8, 'little') + header)
+            f.truncate(offset + total_lineups * cls.record_dtype().itemsize)
+        
+        table = cls(path, writable=True)
+        for start in range(0, total_lineups, cls.SCAN_CHUNK):
+            table.records['mean'][start:start + cls.SCAN_CHUNK] = np.nan
+        table.flush()
+        return table
+    
+    @classmethod
+    def matches(cls, path: str, classes: List[List[str]], class_ids: List[int], roster=None) -> bool:
+        try:
+            table = cls(path)
+        except (OSError, ValueError):
+            return False
+        return (table.classes == classes and table.class_ids == class_ids and
+                table.roster == json.loads(json.dumps(roster)))
+    
+    def record(self, rank: int, avg_runs: float, games: int):
+        self.records[rank] = (avg_runs, games)
+    
+    def flush(self):
+        if self.records.mode != 'r':
+            self.records.flush()
+    
+    def scored(self) -> int:
+        return sum(int(np.count_nonzero(~np.isnan(self.records['mean'][start:start + self.SCAN_CHUNK])))
+                   for start in range(0, self.total_lineups, self.SCAN_CHUNK))
+    
+    def lookup(self, lineup: List[str]) -> Optional[Tuple[float, int]]:
+        # (mean runs, games) for a lineup, or None if it hasn't been scored
+        mean, games = self.records[rank_multiset_permutation([self.class_of[name] for name in lineup])]
+        return None if np.isnan(mean) else (float(mean), int(games))
+    
+    def query(self, fixed: Optional[Dict[int, str]] = None, excluded: Optional[Dict[int, List[str]]] = None,
+              top_k: int = 3) -> List[Tuple[List[str], float, int]]:
+        # Best scored lineups with fixed[slot] batting in that slot and none of
+        # excluded[slot] batting there (slots numbered from 1). Walks only the run
+        # of constrained slots at the top of the order, which narrows the table to
+        # contiguous rank blocks, and scans each block a chunk at a time so the
+        # table is never read into memory whole. Constraints further down are
+        # checked on a chunk's best candidates as names are assigned.
+        fixed = {slot - 1: name for slot, name in (fixed or {}).items()}
+        excluded = {slot - 1: set(names) for slot, names in (excluded or {}).items()}
+        if len(set(fixed.values())) < len(fixed):
+            raise ValueError("A player can only be fixed to one slot")
+        lineup_size = len(self.class_ids)
+        constrained = bool(fixed or excluded)
+        allowed = []
+        for slot in range(lineup_size):
+            if slot in fixed:
+                allowed.append({self.class_of[fixed[slot]]})
+            else:
+                # A class is only ruled out if every one of its players not fixed
+                # elsewhere is excluded
+                allowed.append({class_id for class_id, names in enumerate(self.classes)
+                                if not set(names) - set(fixed.values()) <= excluded.get(slot, set())})
+        leading = 0
+        while leading < lineup_size and (leading in fixed or leading in excluded):
+            leading += 1
+        remaining = [self.class_ids.count(class_id) for class_id in range(len(self.classes))]
+        best = []
+        
+        def subtree_size():
+            return multiset_permutation_count([c for c, count in enumerate(remaining) for _ in range(count)])
+        
+        def scan(start, stop):
+            for chunk_start in range(start, stop, self.SCAN_CHUNK):
+                means = np.array(self.records['mean'][chunk_start:min(stop, chunk_start + self.SCAN_CHUNK)])
+                means[np.isnan(means)] = -np.inf
+                if not constrained:
+                    count = min(top_k, len(means))
+                    for offset in np.argpartition(-means, count - 1)[:count]:
+                        if means[offset] > -np.inf:
+                            _push_top_k(best, (float(means[offset]), -(chunk_start + int(offset)), None), top_k)
+                    continue
+                # Best first, until top_k of them have a valid naming or the rest
+                # can't make the list
+                found = 0
+                for offset in np.argsort(-means, kind='stable'):
+                    entry = (float(means[offset]), -(chunk_start + int(offset)))
+                    if entry[0] == -np.inf or (len(best) == top_k and entry <= best[0][:2]):
+                        break
+                    lineup = self.assign_names(unrank_multiset_permutation(self.class_ids, -entry[1]), fixed, excluded)
+                    if lineup is not None:
+                        _push_top_k(best, entry + (lineup,), top_k)
+                        found += 1
+                        if found == top_k:
+                            break
+        
+        def visit(slot, rank):
+            if slot == leading:
+                scan(rank, rank + subtree_size())
+                return
+            for class_id in range(len(self.classes)):
+                if not remaining[class_id]:
+                    continue
+                remaining[class_id] -= 1
+                size = subtree_size()
+                if class_id in allowed[slot]:
+                    visit(slot + 1, rank)
+                remaining[class_id] += 1
+                rank += size
+        
+        if top_k > 0:
+            visit(0, 0)
+        results = []
+        for avg_runs, neg_rank, lineup in sorted(best, key=lambda entry: entry[:2], reverse=True):
+            if lineup is None:
+                lineup = self.assign_names(unrank_multiset_permutation(self.class_ids, -neg_rank), fixed, excluded)
+            results.append((lineup, avg_runs, int(self.records['games'][-neg_rank])))
+        return results
+    
+    def assign_names(self, arrangement: List[int], fixed: Dict[int, str],
+                     excluded: Dict[int, set]) -> Optional[List[str]]:
+        # Hands out each class's interchangeable players to its slots so that fixed
+        # and excluded slots are respected, by bipartite matching within the class
+        # (Kuhn's augmenting paths); None when no naming of the arrangement does
+        lineup = [fixed.get(slot) for slot in range(len(arrangement))]
+        if any(arrangement[slot] != self.class_of[name] for slot, name in fixed.items()):
+            return None
+        for class_id, names in enumerate(self.classes):
+            names = [name for name in names if name not in fixed.values()]
+            slots = [slot for slot, slot_class in enumerate(arrangement) if slot_class == class_id and lineup[slot] is None]
+            slot_of = {}
+            
+            def augment(slot, seen):
+                candidates = [name for name in names if name not in seen and name not in excluded.get(slot, ())]
+                # A free player first, so unconstrained slots get names in roster order
+                for name in sorted(candidates, key=lambda name: name in slot_of):
+                    seen.add(name)
+                    if name not in slot_of or augment(slot_of[name], seen):
+                        slot_of[name] = slot
+                        return True
+                return False
+            
+            for slot in slots:
+                if not augment(slot, set()):
+                    return None
+            for name, slot in slot_of.items():
+                lineup[slot] = name
+        return lineup
+
+def perturbation_grid(players: Dict[str, Player], hit_chance_deltas=(-0.05, 0.05),
+                      split_shifts=(-0.05, 0.05)) -> List[Dict]:
+    # One-at-a-time stat changes for sensitivity analysis: each player's
+    # hit_chance moved by each delta (clamped to 0-1), and each split shift moving
+    # that share of their hits from singles to doubles (negative: back). Every
+    # entry carries the whole roster with the one player changed.
+    grid = []
+    for name, player in players.items():
+        for delta in hit_chance_deltas:
+            hit_chance = min(1.0, max(0.0, player.hit_chance + delta))
+            changed = Player(name, hit_chance, list(player.hit_probabilities))
+            grid.append({'player': name, 'stat': 'hit_chance', 'delta': delta,
+                         'value': hit_chance, 'players': dict(players, **{name: changed})})
+        for shift in split_shifts:
+            probabilities = list(player.hit_probabilities)
+            moved = min(shift, probabilities[0]) if shift > 0 else -min(-shift, probabilities[1])
+            probabilities[0] -= moved
+            probabilities[1] += moved
+            changed = Player(name, player.hit_chance, probabilities)
+            grid.append({'player': name, 'stat': 'single_double_split', 'delta': shift,
+                         'value': probabilities[:2], 'players': dict(players, **{name: changed})})
+    return grid
+
+class Telemetry:
+    # Progress and throughput of one run. The searching thread counts every
+    # lineup, but only every `every` lineups (or, by default, every `interval`
+    # seconds) builds a new snapshot and calls the progress callback. Readers
+    # take .snapshot as-is: it is replaced whole, never modified, so no lock.
+    def __init__(self, callback=None, interval: float = 0.5, every: Optional[int] = None):
+        self.callback = callback
+        self.interval = interval
+        self.every = every
+        self.started = time.monotonic()
+        self.last_published = self.started
+        self.progress = 0.0
+        self.lineups = 0
+        self.games = 0
+        self.best_score = None
+        self.leaders = None
+        self.pending = 0
+        self.snapshot = self.build_snapshot(self.started, finished=False)
+    
+    def update(self, progress: float, lineups: int = 1, games: int = 0, score: Optional[float] = None,
+               leaders: Optional[List] = None):
+        # leaders is the search's top-k heap of (avg_runs, -rank, lineup) entries,
+        # only read when a snapshot is built
+        self.progress = progress
+        if leaders is not None:
+            self.leaders = leaders
+        self.lineups += lineups
+        self.games += games
+        if score is not None and (self.best_score is None or score > self.best_score):
+            self.best_score = score
+        self.pending += 1
+        if self.every is not None:
+            if self.pending >= self.every:
+                self.publish()
+        elif time.monotonic() - self.last_published >= self.interval:
+            self.publish()
+    
+    def publish(self, finished: bool = False):
+        now = time.monotonic()
+        self.snapshot = self.build_snapshot(now, finished)
+        self.last_published = now
+        self.pending = 0
+        if self.callback:
+            self.callback(self.progress)
+    
+    def finish(self):
+        # Final snapshot; the callback only hears about updates it hasn't seen
+        if self.pending:
+            self.publish(finished=True)
+        else:
+            self.snapshot = self.build_snapshot(time.monotonic(), finished=True)
+    
+    def build_snapshot(self, now: float, finished: bool) -> Dict:
+        elapsed = now - self.started
+        eta = None
+        if 0 < self.progress < 100:
+            eta = elapsed * (100 - self.progress) / self.progress
+        return {
+            'progress': self.progress,
+            'lineups': self.lineups,
+            'games': self.games,
+            'elapsed_seconds': elapsed,
+            'lineups_per_second': self.lineups / elapsed if elapsed > 0 else 0.0,
+            'games_per_second': self.games / elapsed if elapsed > 0 else 0.0,
+            'eta_seconds': eta,
+            'best_score': self.best_score,
+            'top_lineups': _ranked_lineups(self.leaders) if self.leaders is not None else [],
+            'finished': finished
         }
 
 class LineupOptimizer:
-    def __init__(self, players: Dict[str, Player], mode='quick', progress_callback=None):
+    def __init__(self, players: Dict[str, Player], mode='quick', progress_callback=None, engine='monte_carlo',
+                 workers=1, chunk_size=10000, top_k=3, checkpoint_path=None, checkpoint_interval=60.0,
+                 resume=False, initial_games=5, max_games=100, confidence=0.95, common_random_numbers=False,
+                 seed=None, collapse_duplicates=True, max_evaluations=2000, population_size=30, track_metrics=False,
+                 cache=None, previous_results=None, changed_player=None, score_table_path=None,
+                 progress_interval=0.5, progress_every=None, cancel_event=None, refine_games=0,
+                 lineup_size=None, cluster_address=None, lease_seconds=60.0, cluster_token=None):
+        if engine not in ('monte_carlo', 'exact', 'batch'):
+            raise ValueError(f"Unknown simulation engine: {engine}")
+        if top_k < 1:
+            raise ValueError(f"top_k must be at least 1, got {top_k}")
         self.players = players
         self.mode = mode
-        self.simulator = BaseballSimulator(players)
+        self.engine = engine
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.top_k = top_k
+        self.checkpoint_path = checkpoint_path
+        self.checkpoint_interval = checkpoint_interval
+        self.resume = resume
+        self.initial_games = initial_games
+        self.max_games = max_games
+        self.confidence = confidence
+        # Above 0, Monte Carlo leaders get more games (up to this many each) until
+        # the top-k ranking is separated at `confidence` (see refine_leaders)
+        self.refine_games = refine_games
+        # Subset mode bats this many of the players (all of them when None)
+        self.lineup_size = lineup_size
+        # Deep mode serves its rank ranges to run_deep_worker processes on this
+        # (host, port) when set, leasing each for lease_seconds (see DeepCoordinator)
+        # to workers that present cluster_token
+        self.cluster_address = cluster_address
+        self.lease_seconds = lease_seconds
+        self.cluster_token = cluster_token
+        self.coordinator = None
+        self.set_seed(seed if seed is not None else random.randrange(2 ** 32), common_random_numbers)
+        self.collapse_duplicates = collapse_duplicates
+        self.max_evaluations = max_evaluations
+        self.population_size = population_size
+        self.simulator = BaseballSimulator(players, track_metrics=track_metrics)
+        # Optional EvaluationCache; process-pool workers run without one
+        self.cache = cache
+        # Incremental mode's starting point: an earlier result list and whose stats changed
+        self.previous_results = previous_results
+        self.changed_player = changed_player
+        # Deep modes record every lineup's score here when set (see ScoreTable)
+        self.score_table_path = score_table_path
+        self.exact_simulator = ExactSimulator(players) if engine == 'exact' else None
         self.best_lineups = []
         self.progress = 0.0
-        self.running = True
         self.progress_callback = progress_callback
+        self.progress_interval = progress_interval
+        self.progress_every = progress_every
+        self.telemetry = Telemetry(progress_callback, progress_interval, progress_every)
+        # Setting this (or running = False) stops the search; pass one event to
+        # several optimizers to cancel them together
+        self.cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        # Mode-specific details of the last run (games played, pruning, ...)
+        self.search_stats = {}
+        # (games, sum of runs, sum of squares) behind reported scores, by lineup
+        self.tallies = {}
+        self.games_per_lineup = 1
+    
+    @property
+    def running(self) -> bool:
+        return not self.cancel_event.is_set()
+    
+    @running.setter
+    def running(self, value: bool):
+        if value:
+            self.cancel_event.clear()
+        else:
+            self.cancel_event.set()
     
     def optimize(self):
+        self.telemetry = Telemetry(self.progress_callback, self.progress_interval, self.progress_every)
+        self.search_stats = {}
+        self.tallies = {}
         if self.mode == 'quick':
-            return self.quick_optimize()
+            results = self.quick_optimize()
+        elif self.mode == 'racing':
+            results = self.racing_optimize()
+        elif self.mode == 'anneal':
+            results = self.anneal_optimize()
+        elif self.mode == 'genetic':
+            results = self.genetic_optimize()
+        elif self.mode == 'local':
+            results = self.local_search_optimize()
+        elif self.mode == 'branch_and_bound':
+            results = self.branch_and_bound_optimize()
+        elif self.mode == 'incremental':
+            results = self.incremental_optimize()
+        elif self.mode == 'subset':
+            results = self.subset_optimize()
+        elif self.cluster_address is not None:
+            results = self.cluster_deep_optimize()
+        elif self.workers > 1:
+            results = self.parallel_deep_optimize()
+        else:
+            results = self.deep_optimize()
+        if self.refine_games and results:
+            results = self.refine_leaders(results)
+        self.search_stats['intervals'] = [self.score_interval(lineup) for lineup, _ in results]
+        self.telemetry.finish()
+        return results
+    
+    def sensitivity_analysis(self, lineups: List[List[str]], games: int = 2000, hit_chance_deltas=(-0.05, 0.05),
+                             split_shifts=(-0.05, 0.05)) -> Dict:
+        # Scores the lineups (e.g. this run's top-k) under every perturbation_grid
+        # change in one batched simulate_grid pass with shared draws, and reports
+        # which changes reorder them. Margins are paired over the same games, so
+        # their standard errors are far smaller than the scores' own; a change
+        # only counts as beating the leader when its margin is below zero at
+        # `confidence`, since near-tied lineups reorder on noise alone.
+        z = statistics.NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        grid = perturbation_grid(self.players, hit_chance_deltas, split_shifts)
+        runs = self.simulator.simulate_grid(lineups, [self.players] + [entry['players'] for entry in grid], games,
+                                            self.rng_streams.generator('sensitivity'))
+        scores = runs.mean(axis=2)
+        # Stable sorts, so exact ties keep the order the lineups came in
+        baseline_order = np.argsort(-scores[0], kind='stable').tolist()
+        leader = baseline_order[0]
+        
+        perturbations = []
+        for variant, entry in enumerate(grid, 1):
+            order = np.argsort(-scores[variant], kind='stable').tolist()
+            # Baseline leader's lead over the best of the rest under this change
+            margin = None
+            std_error = None
+            if len(lineups) > 1:
+                runner_up = max((index for index in order if index != leader), key=lambda index: scores[variant][index])
+                differences = runs[variant, leader] - runs[variant, runner_up]
+                margin = float(differences.mean())
+                std_error = float(differences.std(ddof=1) / math.sqrt(games)) if games > 1 else 0.0
+            perturbations.append({
+                'player': entry['player'],
+                'stat': entry['stat'],
+                'delta': entry['delta'],
+                'value': entry['value'],
+                'scores': scores[variant].tolist(),
+                'ranking': order,
+                'flips_ranking': order != baseline_order,
+                'changes_leader': order[0] != leader,
+                'leader_margin': margin,
+                'margin_std_error': std_error,
+                'leader_beaten': margin is not None and margin + z * std_error < 0
+            })
+        
+        return {
+            'games': games,
+            'lineups': [list(lineup) for lineup in lineups],
+            'baseline_scores': scores[0].tolist(),
+            'baseline_ranking': baseline_order,
+            'perturbations': perturbations,
+            'flips': [entry for entry in perturbations if entry['flips_ranking']],
+            'leader_beaten_by': [entry for entry in perturbations if entry['leader_beaten']]
+        }
+    
+    def report_progress(self, progress: float, lineups: int = 1, games: int = 0, score: Optional[float] = None,
+                        leaders: Optional[List] = None):
+        self.progress = progress
+        self.telemetry.update(progress, lineups, games, score, leaders)
+    
+    def set_seed(self, seed: int, common_random_numbers: bool):
+        # Every random choice and game descends from this root seed: self.rng drives
+        # the search, and each lineup's games get their own child stream
+        self.seed = seed
+        self.rng_streams = RandomStreams(seed)
+        self.rng = self.rng_streams.child('search')
+        self.random_streams = CommonRandomNumbers(seed) if common_random_numbers else None
+    
+    def worker_options(self) -> Dict:
+        # Settings a worker process needs to search and score lineups the same way
+        return {
+            'engine': self.engine,
+            'common_random_numbers': self.random_streams is not None,
+            'seed': self.seed,
+            'collapse_duplicates': self.collapse_duplicates,
+            'track_metrics': self.simulator.metrics is not None,
+            'score_table_path': self.score_table_path
+        }
+    
+    def lineup_space(self) -> Tuple[List[List[str]], List[int]]:
+        # Deep mode searches arrangements of equivalence classes. With
+        # collapse_duplicates, players with the same hit_chance and hit_probabilities
+        # share a class since swapping them cannot change a game.
+        classes = []
+        class_index = {}
+        for name, player in self.players.items():
+            key = (player.hit_chance, tuple(player.hit_probabilities)) if self.collapse_duplicates else name
+            if key not in class_index:
+                class_index[key] = len(classes)
+                classes.append([])
+            classes[class_index[key]].append(name)
+        class_ids = [class_id for class_id, names in enumerate(classes) for _ in names]
+        return classes, class_ids
+    
+    def record_lineup_space(self, classes: List[List[str]], class_ids: List[int]):
+        self.search_stats = {
+            'full_space': math.factorial(len(class_ids)),
+            'lineup_space': multiset_permutation_count(class_ids),
+            'equivalence_classes': len(classes),
+            'duplicate_groups': [names for names in classes if len(names) > 1]
+        }
+    
+    def open_score_table(self, classes: List[List[str]], class_ids: List[int]) -> Optional[ScoreTable]:
+        # Keeps an existing table for the same roster and lineup space (so a resumed
+        # run fills in the rest), otherwise starts an empty one
+        if self.score_table_path is None:
+            return None
+        roster = self.roster_fingerprint()
+        if os.path.exists(self.score_table_path) and ScoreTable.matches(self.score_table_path, classes, class_ids, roster):
+            return ScoreTable(self.score_table_path, writable=True)
+        return ScoreTable.create(self.score_table_path, classes, class_ids, roster)
+    
+    def recorded_games(self, games_per_lineup: int) -> int:
+        # Game count stored with each score; exact scores aren't sampled
+        return 0 if self.engine == 'exact' else games_per_lineup
+    
+    def evaluate_lineup(self, lineup: List[str], games: int, first_game: int = 0) -> float:
+        # Exact scoring is deterministic, so the game count only applies to Monte Carlo.
+        # With a cache, a lineup scored before is topped up to games and averaged
+        # over everything accumulated (possibly more than games).
+        if self.cache is not None and first_game == 0:
+            return self.cached_evaluation(lineup, games)
+        if self.engine == 'exact':
+            return self.exact_simulator.expected_runs(lineup)
+        return self.run_totals(lineup, games, first_game)[0] / games
+    
+    def evaluation_key(self, lineup: List[str]) -> bytes:
+        # Hash of each slot's stats in batting order plus how games are drawn:
+        # exact scores and independent samples never depend on the seed, common
+        # random number games do. Names are left out so identical players share entries.
+        if self.engine == 'exact':
+            source = ('exact',)
         else:
-            return self.deep_optimize()
+            source = ('sampled', self.seed if self.random_streams is not None else None)
+        slots = tuple((self.players[name].hit_chance, tuple(self.players[name].hit_probabilities)) for name in lineup)
+        return hashlib.blake2b(repr((source, slots)).encode(), digest_size=16).digest()
+    
+    def cached_evaluation(self, lineup: List[str], games: int) -> float:
+        cached_games, total, _ = self.cached_tally(lineup, games)
+        return total / cached_games
+    
+    def cached_tally(self, lineup: List[str], games: int) -> Tuple[int, float, float]:
+        key = self.evaluation_key(lineup)
+        cached_games, total, squares = self.cache.get(key) or (0, 0.0, 0.0)
+        # One "game" of an exact score is the expected value itself
+        needed = 1 if self.engine == 'exact' else games
+        if cached_games < needed:
+            extra_total, extra_squares = self.run_totals(lineup, needed - cached_games, cached_games)
+            cached_games, total, squares = needed, total + extra_total, squares + extra_squares
+            self.cache.put(key, (cached_games, total, squares))
+        return cached_games, total, squares
+    
+    def exact_scores(self) -> bool:
+        return self.engine == 'exact' or self.mode == 'branch_and_bound'
+    
+    def tally(self, lineup: List[str], games: int = 0) -> Tuple[int, float, float]:
+        # (games, sum of runs, sum of squares) behind a reported score, topped up
+        # to at least `games`. Modes that score lineups in one go are replayed from
+        # the lineup's own game streams (or read from the cache) rather than kept
+        # for every lineup searched; racing and branch-and-bound fill in their own.
+        key = tuple(lineup)
+        games = 1 if self.exact_scores() else max(games, self.games_per_lineup)
+        if self.cache is not None and self.mode not in ('racing', 'branch_and_bound'):
+            self.tallies[key] = self.cached_tally(lineup, games)
+            return self.tallies[key]
+        played, total, squares = self.tallies.get(key, (0, 0.0, 0.0))
+        if played < games:
+            extra_total, extra_squares = self.run_totals(lineup, games - played, played)
+            played, total, squares = games, total + extra_total, squares + extra_squares
+            self.tallies[key] = (played, total, squares)
+        return played, total, squares
+    
+    def score_interval(self, lineup: List[str]) -> Dict:
+        # Mean, standard error and normal confidence interval at self.confidence;
+        # exact scores have no sampling error
+        games, total, squares = self.tally(lineup)
+        mean = total / games
+        std_error = 0.0
+        if games > 1 and not self.exact_scores():
+            variance = max(0.0, (squares - total * mean) / (games - 1))
+            std_error = math.sqrt(variance / games)
+        half_width = statistics.NormalDist().inv_cdf(0.5 + self.confidence / 2) * std_error
+        return {'games': games, 'mean': mean, 'std_error': std_error,
+                'ci_low': mean - half_width, 'ci_high': mean + half_width}
+    
+    def refine_leaders(self, results: List[Tuple[List[str], float]]) -> List[Tuple[List[str], float]]:
+        # Sequential stopping on the reported top-k: while two neighbours in the
+        # ranking have overlapping confidence intervals, double both lineups' games
+        # (capped at refine_games), then re-rank. Stops once every neighbouring pair
+        # is separated, the tied lineups hit refine_games, or the run is cancelled.
+        leaders = [list(lineup) for lineup, _ in results]
+        games_before = sum(self.tally(lineup)[0] for lineup in leaders)
+        while True:
+            intervals = {tuple(lineup): self.score_interval(lineup) for lineup in leaders}
+            leaders.sort(key=lambda lineup: intervals[tuple(lineup)]['mean'], reverse=True)
+            tied = set()
+            for upper, lower in zip(leaders, leaders[1:]):
+                if intervals[tuple(upper)]['ci_low'] <= intervals[tuple(lower)]['ci_high']:
+                    tied.update((tuple(upper), tuple(lower)))
+            
+            if not tied:
+                stop_reason = 'separated'
+                break
+            if self.exact_scores():
+                # Equal exact scores are genuine ties; more games can't split them
+                stop_reason = 'exact_tie'
+                break
+            if not self.running:
+                stop_reason = 'cancelled'
+                break
+            short = [key for key in tied if intervals[key]['games'] < self.refine_games]
+            if not short:
+                stop_reason = 'budget'
+                break
+            for key in sorted(short):
+                games = min(self.refine_games, 2 * intervals[key]['games'])
+                self.tally(list(key), games)
+                self.report_progress(self.progress, lineups=0, games=games - intervals[key]['games'])
+        
+        self.search_stats.update(stop_reason=stop_reason,
+                                 refine_games_played=sum(self.tally(lineup)[0] for lineup in leaders) - games_before)
+        return [(lineup, intervals[tuple(lineup)]['mean']) for lineup in leaders]
+    
+    def run_totals(self, lineup: List[str], games: int, first_game: int = 0) -> Tuple[float, float]:
+        # Sum and sum of squares of runs over games first_game.., for running mean/variance.
+        # With common random numbers the game index picks the draw stream.
+        if self.engine == 'exact':
+            expected = self.exact_simulator.expected_runs(lineup)
+            return games * expected, games * expected ** 2
+        # Without common random numbers the games come from a stream keyed by the
+        # lineup and first game, so a score doesn't depend on which worker plays it
+        if self.engine == 'batch':
+            rng = self.rng_streams.generator('games', tuple(lineup), first_game)
+            runs = self.simulator.simulate_games(lineup, games, rng, streams=self.random_streams,
+                                                 first_game=first_game)['runs']
+            return float(runs.sum()), float((runs ** 2).sum())
+        
+        compiled = self.simulator.compile_lineup(lineup)
+        rng = self.rng_streams.child('games', tuple(lineup), first_game) if self.random_streams is None else None
+        total_runs = 0
+        total_squares = 0
+        for game in range(first_game, first_game + games):
+            uniforms = self.random_streams.game_stream(game) if self.random_streams is not None else None
+            runs = self.simulator.simulate_game(compiled, uniforms, rng)['runs']
+            total_runs += runs
+            total_squares += runs * runs
+        return total_runs, total_squares
     
     def quick_optimize(self):
-        games_per_lineup = 10
+        games_per_lineup = self.games_per_lineup = 10
         sample_size = min(100000, math.factorial(len(self.players)))
         player_names = list(self.players.keys())
         
         best_lineups = []
         total_evaluated = 0
         
-        for _ in range(sample_size):
+        for sample in range(sample_size):
             if not self.running:
                 print("\nQuick optimization interrupted...")
                 break
                 
-            lineup = list(random.sample(player_names, len(player_names)))
-            total_runs = 0
+            lineup = list(self.rng.sample(player_names, len(player_names)))
+            avg_runs = self.evaluate_lineup(lineup, games_per_lineup)
+            _push_top_k(best_lineups, (avg_runs, -sample, lineup), self.top_k)
             
-            for _ in range(games_per_lineup):
-                result = self.simulator.simulate_game(lineup)
-                total_runs += result['runs']
+            total_evaluated += 1
+            self.report_progress((total_evaluated / sample_size) * 100, games=games_per_lineup, score=avg_runs,
+                                 leaders=best_lineups)
+        
+        return _ranked_lineups(best_lineups)
+    
+    def racing_optimize(self):
+        # Successive halving: every candidate starts on initial_games, and after each
+        # round lineups whose upper confidence bound falls below the k-th best lower
+        # bound are dropped while the survivors' game counts double up to max_games
+        player_names = list(self.players.keys())
+        total_lineups = math.factorial(len(player_names))
+        sample_size = min(100000, total_lineups)
+        
+        if sample_size == total_lineups:
+            candidates = [list(lineup) for lineup in itertools.permutations(player_names)]
+        else:
+            sampled = set()
+            while len(sampled) < sample_size:
+                sampled.add(tuple(self.rng.sample(player_names, len(player_names))))
+            candidates = [list(lineup) for lineup in sampled]
+        
+        z = statistics.NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        games = [0] * len(candidates)
+        totals = [0.0] * len(candidates)
+        squares = [0.0] * len(candidates)
+        alive = list(range(len(candidates)))
+        games_target = min(self.initial_games, self.max_games)
+        max_rounds = 1 + max(0, math.ceil(math.log2(self.max_games / games_target)))
+        games_played = 0
+        rounds = 0
+        
+        def bounds(index):
+            mean = totals[index] / games[index]
+            if games[index] < 2:
+                return mean, mean, mean
+            variance = max(0.0, (squares[index] - totals[index] * mean) / (games[index] - 1))
+            half_width = z * math.sqrt(variance / games[index])
+            return mean, mean - half_width, mean + half_width
+        
+        while self.running:
+            for position, index in enumerate(alive):
+                if not self.running:
+                    print("\nRacing optimization interrupted...")
+                    break
+                
+                extra_games = games_target - games[index]
+                if extra_games > 0:
+                    total, square = self.run_totals(candidates[index], extra_games, games[index])
+                    games[index] += extra_games
+                    totals[index] += total
+                    squares[index] += square
+                    games_played += extra_games
+                
+                self.report_progress(((rounds + (position + 1) / len(alive)) / max_rounds) * 100, games=extra_games,
+                                     score=totals[index] / games[index] if games[index] else None)
             
-            avg_runs = total_runs / games_per_lineup
-            best_lineups.append((lineup, avg_runs))
+            # An interrupted round ends the race with whatever it has scored so far,
+            # which may be nothing yet
+            if not self.running:
+                break
+            rounds += 1
+            if games_target >= self.max_games or len(alive) <= self.top_k:
+                break
             
-            total_evaluated += 1
-            self.progress = (total_evaluated / sample_size) * 100
-            if self.progress_callback:
-                self.progress_callback(self.progress)
+            # Drop lineups that are clearly below the current top-k
+            alive_bounds = {index: bounds(index) for index in alive if games[index]}
+            lower_bounds = sorted((low for _, low, _ in alive_bounds.values()), reverse=True)
+            cutoff = lower_bounds[min(self.top_k, len(lower_bounds)) - 1]
+            alive = [index for index in alive if index in alive_bounds and alive_bounds[index][2] >= cutoff]
+            games_target = min(games_target * 2, self.max_games)
+        
+        best_lineups = []
+        for index in alive:
+            if games[index]:
+                _push_top_k(best_lineups, (totals[index] / games[index], -index, candidates[index]), self.top_k)
+                self.tallies[tuple(candidates[index])] = (games[index], totals[index], squares[index])
         
-        best_lineups.sort(key=lambda x: x[1], reverse=True)
-        return best_lineups[:3]
+        fixed_budget = len(candidates) * self.max_games
+        self.search_stats = {
+            'candidates': len(candidates),
+            'rounds': rounds,
+            'survivors': len(alive),
+            'games_played': games_played,
+            'fixed_budget_games': fixed_budget,
+            'games_saved': fixed_budget - games_played
+        }
+        return _ranked_lineups(best_lineups)
     
-    def deep_optimize(self):
-        games_per_lineup = 100
+    def random_lineup(self) -> List[str]:
         player_names = list(self.players.keys())
-        all_lineups = list(itertools.permutations(player_names))
-        total_lineups = len(all_lineups)
+        return self.rng.sample(player_names, len(player_names))
+    
+    def anneal_optimize(self):
+        # Simulated annealing over swap/insert moves, cooling geometrically from
+        # 0.5 to 0.005 runs over the evaluation budget
+        initial_temperature, final_temperature = 0.5, 0.005
+        budget = SearchBudget(self, games_per_lineup=100)
+        accepted = 0
+        
+        try:
+            current = self.random_lineup()
+            current_score = budget.score(current)
+            while True:
+                neighbor = (_swap_neighbor(current, self.rng) if self.rng.random() < 0.5
+                            else _insert_neighbor(current, self.rng))
+                neighbor_score = budget.score(neighbor)
+                fraction = budget.evaluations / self.max_evaluations
+                temperature = initial_temperature * (final_temperature / initial_temperature) ** fraction
+                delta = neighbor_score - current_score
+                if delta >= 0 or self.rng.random() < math.exp(delta / temperature):
+                    current, current_score = neighbor, neighbor_score
+                    accepted += 1
+        except SearchBudgetExhausted:
+            pass
+        
+        return budget.results(accepted_moves=accepted)
+    
+    def genetic_optimize(self):
+        # Generational GA: tournament selection, order crossover, swap mutation and
+        # two elites carried over each generation
+        budget = SearchBudget(self, games_per_lineup=100)
+        mutation_rate = 0.2
+        generations = 0
+        
+        def tournament(scored):
+            return max(self.rng.sample(scored, min(3, len(scored))), key=lambda entry: entry[0])[1]
+        
+        try:
+            population = [self.random_lineup() for _ in range(self.population_size)]
+            scored = [(budget.score(lineup), lineup) for lineup in population]
+            while True:
+                scored.sort(key=lambda entry: entry[0], reverse=True)
+                next_population = scored[:2]
+                while len(next_population) < self.population_size:
+                    child = _order_crossover(tournament(scored), tournament(scored), self.rng)
+                    if self.rng.random() < mutation_rate:
+                        child = _swap_neighbor(child, self.rng)
+                    next_population.append((budget.score(child), child))
+                scored = next_population
+                generations += 1
+        except SearchBudgetExhausted:
+            pass
+        
+        return budget.results(generations=generations)
+    
+    def local_search_optimize(self):
+        # Steepest ascent over all swap and insert neighbors, restarting from a random
+        # lineup whenever no neighbor improves
+        budget = SearchBudget(self, games_per_lineup=100)
+        restarts = 0
+        
+        try:
+            while True:
+                self.hill_climb(budget, self.random_lineup())
+                restarts += 1
+        except SearchBudgetExhausted:
+            pass
+        
+        return budget.results(restarts=restarts)
+    
+    def hill_climb(self, budget: SearchBudget, current: List[str]) -> List[str]:
+        # Steepest ascent over _neighborhood until no neighbor improves
+        current_score = budget.score(current)
+        while True:
+            best_neighbor, best_score = None, current_score
+            for neighbor in _neighborhood(current):
+                neighbor_score = budget.score(neighbor)
+                if neighbor_score > best_score:
+                    best_neighbor, best_score = neighbor, neighbor_score
+            if best_neighbor is None:
+                return current
+            current, current_score = best_neighbor, best_score
+    
+    def incremental_optimize(self):
+        # Re-search after one player's stats change, starting from previous_results
+        # rather than from scratch: rescore the old top lineups, try the changed
+        # player in every slot of each, then hill-climb from the best lineups found
+        # until max_evaluations is spent
+        budget = SearchBudget(self, games_per_lineup=100)
+        roster = sorted(self.players)
+        previous = [list(lineup) for lineup, _ in self.previous_results or [] if sorted(lineup) == roster]
+        if not previous:
+            previous = [self.random_lineup()]
+        slot_scores = {}
+        
+        try:
+            for lineup in previous:
+                budget.score(lineup)
+            
+            if self.changed_player in self.players:
+                for lineup in previous:
+                    others = [name for name in lineup if name != self.changed_player]
+                    for slot in range(len(lineup)):
+                        placed = budget.score(others[:slot] + [self.changed_player] + others[slot:])
+                        slot_scores[slot] = max(slot_scores.get(slot, -math.inf), placed)
+            
+            climbed = set()
+            while True:
+                starts = [lineup for lineup, _ in _ranked_lineups(budget.best_lineups) if tuple(lineup) not in climbed]
+                if not starts:
+                    break
+                climbed.add(tuple(starts[0]))
+                climbed.add(tuple(self.hill_climb(budget, starts[0])))
+        except SearchBudgetExhausted:
+            pass
+        
+        best_slot = max(slot_scores, key=slot_scores.get) + 1 if slot_scores else None
+        return budget.results(previous_lineups=len(previous), changed_player=self.changed_player,
+                              best_slot=best_slot)
+    
+    def branch_and_bound_optimize(self):
+        # Fixes batting slots from the top down, bounding each partial lineup with
+        # ExactSimulator.upper_bound (open slots may use any unplaced player) and
+        # skipping subtrees that cannot reach the current top-k. Only subtrees near
+        # the leaves are bounded, and only in lineups of at least BOUND_MIN_LINEUP;
+        # shorter ones are searched exhaustively. Complete lineups are scored exactly, so the result
+        # matches an exhaustive exact search.
+        exact = self.exact_simulator or ExactSimulator(self.players)
+        classes, class_ids = self.lineup_space()
+        total_lineups = multiset_permutation_count(class_ids)
+        lineup_size = len(class_ids)
+        remaining = [class_ids.count(class_id) for class_id in range(len(classes))]
+        bounded = lineup_size >= BOUND_MIN_LINEUP
         
         best_lineups = []
-        total_evaluated = 0
+        stats = {'nodes_bounded': 0, 'subtrees_pruned': 0, 'lineups_pruned': 0, 'lineups_evaluated': 0}
+        
+        def arrangements_left():
+            count = math.factorial(sum(remaining))
+            for class_count in remaining:
+                count //= math.factorial(class_count)
+            return count
         
+        def report_progress(lineups=1, score=None):
+            self.report_progress(((stats['lineups_pruned'] + stats['lineups_evaluated']) / total_lineups) * 100,
+                                 lineups=lineups, score=score, leaders=best_lineups)
+        
+        def visit(prefix, rank):
+            if not self.running:
+                return
+            
+            if len(prefix) == lineup_size:
+                lineup = expand_lineup(classes, prefix)
+                expected_runs = exact.expected_runs(lineup)
+                _push_top_k(best_lineups, (expected_runs, -rank, lineup), self.top_k)
+                stats['lineups_evaluated'] += 1
+                report_progress(score=expected_runs)
+                return
+            
+            # Children in rank order, then searched best bound first
+            children = []
+            for class_id in range(len(classes)):
+                if not remaining[class_id]:
+                    continue
+                remaining[class_id] -= 1
+                subtree_size = arrangements_left()
+                if bounded and BOUND_MIN_POOL <= sum(remaining) <= BOUND_TRACKED_POOL:
+                    placed = prefix + [class_id]
+                    pool = expand_lineup(classes, placed + [other for other, count in enumerate(remaining)
+                                                            for _ in range(count)])[len(placed):]
+                    bound = exact.upper_bound(expand_lineup(classes, placed) + [None] * len(pool), pool)
+                else:
+                    bound = math.inf
+                stats['nodes_bounded'] += bound != math.inf
+                remaining[class_id] += 1
+                children.append((bound, class_id, rank, subtree_size))
+                rank += subtree_size
+            
+            for bound, class_id, child_rank, subtree_size in sorted(children, key=lambda child: child[0], reverse=True):
+                if len(best_lineups) == self.top_k and bound < best_lineups[0][0] - BOUND_TOLERANCE:
+                    stats['subtrees_pruned'] += 1
+                    stats['lineups_pruned'] += subtree_size
+                    report_progress(lineups=0)
+                    continue
+                remaining[class_id] -= 1
+                visit(prefix + [class_id], child_rank)
+                remaining[class_id] += 1
+        
+        visit([], 0)
+        if not self.running:
+            print("\nBranch-and-bound optimization interrupted...")
+        
+        self.record_lineup_space(classes, class_ids)
+        self.search_stats.update(stats)
+        for expected_runs, _, lineup in best_lineups:
+            self.tallies[tuple(lineup)] = (1, expected_runs, expected_runs ** 2)
+        return _ranked_lineups(best_lineups)
+    
+    def subset_optimize(self):
+        # Picks which lineup_size players bat as well as their order. A subset that
+        # leaves out a player who dominates one it includes (_dominates) is never
+        # built: lineups grow slot by slot from the whole roster, and a prefix is
+        # dropped once the players its batters require no longer fit, so lineups
+        # that share a prefix share that pruning. Only the exact engine shares
+        # scoring work: it carries the opening plate appearances of every inning
+        # down the prefix (ExactSimulator.extend_prefix), and only completes one
+        # order of each rotation, scoring all its rotations together. Monte Carlo
+        # plays every lineup's games on their own.
+        size = self.lineup_size or len(self.players)
+        if not 0 < size <= len(self.players):
+            raise ValueError(f"Lineup size {size} needs between 1 and {len(self.players)} players")
+        games_per_lineup = self.games_per_lineup = 100
+        recorded_games = self.recorded_games(games_per_lineup)
+        classes, _ = self.lineup_space()
+        profiles = [_reach_profile(self.players[names[0]]) for names in classes]
+        required_by = [{other for other in range(len(classes)) if _dominates(profiles[other], profile)}
+                       for profile in profiles]
+        subsets = self.undominated_subsets(classes, required_by, size)
+        total_lineups = sum(multiset_permutation_count([class_id for class_id, count in enumerate(counts)
+                                                        for _ in range(count)]) for counts in subsets)
+        exact = self.exact_simulator
+        class_of = {name: class_id for class_id, names in enumerate(classes) for name in names}
+        remaining = [len(names) for names in classes]
+        best_lineups = []
+        stats = {'prefixes': 0, 'prefixes_pruned': 0, 'lineups_evaluated': 0, 'rotation_groups': 0}
+        
+        def visit(prefix, required, progress):
+            if not self.running:
+                return
+            
+            if len(prefix) == size:
+                lineup = expand_lineup(classes, prefix)
+                if exact is None:
+                    scored = [(prefix, self.evaluate_lineup(lineup, games_per_lineup))]
+                elif min(prefix[shift:] + prefix[:shift] for shift in range(size)) == prefix:
+                    stats['rotation_groups'] += 1
+                    scored = [([class_of[name] for name in rotated], evaluation['avg_runs'])
+                              for rotated, evaluation in exact.evaluate_rotations(lineup, progress)]
+                else:
+                    # Scored along with the rotation that comes first
+                    return
+                for arrangement, avg_runs in scored:
+                    _push_top_k(best_lineups, (avg_runs, -stats['lineups_evaluated'],
+                                               expand_lineup(classes, arrangement)), self.top_k)
+                    stats['lineups_evaluated'] += 1
+                    self.report_progress((stats['lineups_evaluated'] / total_lineups) * 100, games=recorded_games,
+                                         score=avg_runs, leaders=best_lineups)
+                return
+            
+            open_slots = size - len(prefix) - 1
+            for class_id in range(len(classes)):
+                if not remaining[class_id]:
+                    continue
+                remaining[class_id] -= 1
+                needed = required | required_by[class_id]
+                if sum(remaining[other] for other in needed) <= open_slots:
+                    stats['prefixes'] += 1
+                    child_progress = None
+                    if exact is not None:
+                        name = classes[class_id][len(classes[class_id]) - remaining[class_id] - 1]
+                        child_progress = exact.extend_prefix(progress, name, len(prefix), size)
+                    visit(prefix + [class_id], needed, child_progress)
+                else:
+                    stats['prefixes_pruned'] += 1
+                remaining[class_id] += 1
+        
+        visit([], set(), [])
+        if not self.running:
+            print("\nSubset optimization interrupted...")
+        
+        self.search_stats = {
+            'lineup_size': size,
+            'subsets': math.comb(len(self.players), size),
+            'undominated_subsets': sum(math.prod(math.comb(len(classes[class_id]), count)
+                                                 for class_id, count in enumerate(counts)) for counts in subsets),
+            'lineup_space': total_lineups,
+            'dominated_by': {names[0]: sorted(classes[other][0] for other in required_by[class_id])
+                             for class_id, names in enumerate(classes) if required_by[class_id]},
+            **stats
+        }
+        return _ranked_lineups(best_lineups)
+    
+    def undominated_subsets(self, classes: List[List[str]], required_by: List[set], size: int) -> List[List[int]]:
+        # Players to take from each class, over every way to fill size slots in
+        # which a class is only used if every class dominating it is used in full
+        subsets = []
+        
+        def choose(class_id, left, counts):
+            if class_id == len(classes):
+                if left == 0 and all(counts[other] == len(classes[other])
+                                     for used, count in enumerate(counts) if count for other in required_by[used]):
+                    subsets.append(list(counts))
+                return
+            for count in range(min(left, len(classes[class_id])) + 1):
+                counts.append(count)
+                choose(class_id + 1, left - count, counts)
+                counts.pop()
+        
+        choose(0, size, [])
+        return subsets
+    
+    def roster_fingerprint(self):
+        return [(name, player.hit_chance, list(player.hit_probabilities)) for name, player in self.players.items()]
+    
+    def save_checkpoint(self, completed_ranges: List[Tuple[int, int]], top_entries: List, total_lineups: int):
+        # top_entries are (avg_runs, rank, lineup); best_lineups keeps the original
+        # checkpoint layout. Written to a temp file first so a crash mid-write
+        # leaves the previous checkpoint intact.
+        completed_ranges = _merge_ranges(completed_ranges)
+        top_entries = sorted(top_entries, key=_lineup_sort_key, reverse=True)
+        completed = sum(stop - start for start, stop in completed_ranges)
+        checkpoint = {
+            'progress': (completed / total_lineups) * 100,
+            'best_lineups': [(lineup, avg_runs) for avg_runs, _, lineup in top_entries],
+            'timestamp': time.time(),
+            'next_rank': completed_ranges[0][1] if completed_ranges and completed_ranges[0][0] == 0 else 0,
+            'completed_ranges': completed_ranges,
+            'top_entries': top_entries,
+            'seed': self.seed,
+            'roster': self.roster_fingerprint(),
+            'engine': self.engine,
+            'lineup_space': self.lineup_space()[0]
+        }
+        
+        temp_path = f"{self.checkpoint_path}.tmp"
+        with open(temp_path, 'wb') as f:
+            pickle.dump(checkpoint, f)
+        os.replace(temp_path, self.checkpoint_path)
+    
+    def load_checkpoint(self):
+        # Returns (completed_ranges, top_entries) to resume from, or empty state
+        if not (self.resume and self.checkpoint_path and os.path.exists(self.checkpoint_path)):
+            return [], []
+        
+        with open(self.checkpoint_path, 'rb') as f:
+            checkpoint = pickle.load(f)
+        
+        if 'completed_ranges' not in checkpoint:
+            print("\nCheckpoint has no permutation ranks - starting from the beginning")
+            return [], []
+        if (checkpoint['roster'] != self.roster_fingerprint() or checkpoint['engine'] != self.engine
+                or checkpoint.get('lineup_space') != self.lineup_space()[0]):
+            print("\nCheckpoint was written for a different roster - starting from the beginning")
+            return [], []
+        
+        # Scores are drawn from streams of the run's root seed, so keep using it
+        if 'seed' in checkpoint:
+            self.set_seed(checkpoint['seed'], self.random_streams is not None)
+        top_entries = heapq.nlargest(self.top_k, checkpoint['top_entries'], key=_lineup_sort_key)
+        print(f"\nResuming deep optimization at {checkpoint['progress']:.2f}%")
+        return checkpoint['completed_ranges'], top_entries
+    
+    def deep_optimize(self):
+        games_per_lineup = self.games_per_lineup = 100
+        classes, class_ids = self.lineup_space()
+        total_lineups = multiset_permutation_count(class_ids)
+        self.record_lineup_space(classes, class_ids)
+        score_table = self.open_score_table(classes, class_ids)
+        recorded_games = self.recorded_games(games_per_lineup)
+        
+        # Lineups are generated lazily and only the best top_k are kept, so memory
+        # does not grow with the roster
+        completed_ranges, top_entries = self.load_checkpoint()
+        best_lineups = [(avg_runs, -rank, lineup) for avg_runs, rank, lineup in top_entries]
+        heapq.heapify(best_lineups)
+        total_evaluated = sum(stop - start for start, stop in completed_ranges)
+        last_checkpoint = time.monotonic()
+        
+        def checkpoint(current_range):
+            if score_table is not None:
+                score_table.flush()
+            self.save_checkpoint(completed_ranges + [current_range],
+                                 [(avg_runs, -neg_rank, lineup) for avg_runs, neg_rank, lineup in best_lineups],
+                                 total_lineups)
+        
+        current_range = (0, 0)
         try:
-            for lineup in all_lineups:
+            for start, stop in _missing_ranges(completed_ranges, total_lineups, total_lineups):
+                current_range = (start, start)
+                for rank, arrangement in enumerate(multiset_permutations_from_rank(class_ids, start, stop), start):
+                    if not self.running:
+                        break
+                    
+                    lineup = expand_lineup(classes, arrangement)
+                    avg_runs = self.evaluate_lineup(lineup, games_per_lineup)
+                    _push_top_k(best_lineups, (avg_runs, -rank, lineup), self.top_k)
+                    if score_table is not None:
+                        score_table.record(rank, avg_runs, recorded_games)
+                    current_range = (start, rank + 1)
+                    
+                    total_evaluated += 1
+                    self.report_progress((total_evaluated / total_lineups) * 100, games=recorded_games, score=avg_runs,
+                                         leaders=best_lineups)
+                    
+                    if self.checkpoint_path and time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                        checkpoint(current_range)
+                        last_checkpoint = time.monotonic()
+                
+                completed_ranges.append(current_range)
+                current_range = (0, 0)
                 if not self.running:
                     print("\nOptimization interrupted...")
                     break
                     
-                lineup = list(lineup)
-                total_runs = 0
+        except Exception as e:
+            print(f"\nError during optimization: {str(e)}")
+        
+        finally:
+            if self.checkpoint_path:
+                checkpoint(current_range)
+            if score_table is not None:
+                score_table.flush()
+            return _ranked_lineups(best_lineups)
+    
+    def search_rank_range(self, start: int, stop: int, games_per_lineup: int, top_k: int):
+        # Scores lineup ranks start..stop-1, keeping a local top-k heap of
+        # (avg_runs, rank, lineup) entries; also hands back the simulator's
+        # metrics (None unless tracked) for the caller to merge
+        classes, class_ids = self.lineup_space()
+        # The parent creates the table; shards write disjoint ranks into it
+        score_table = ScoreTable(self.score_table_path, writable=True) if self.score_table_path else None
+        recorded_games = self.recorded_games(games_per_lineup)
+        best_lineups = []
+        evaluated = 0
+        
+        for rank, arrangement in enumerate(multiset_permutations_from_rank(class_ids, start, stop), start):
+            if not self.running or (_shard_stop_event is not None and _shard_stop_event.is_set()):
+                break
+            
+            lineup = expand_lineup(classes, arrangement)
+            avg_runs = self.evaluate_lineup(lineup, games_per_lineup)
+            _push_top_k(best_lineups, (avg_runs, -rank, lineup), top_k)
+            if score_table is not None:
+                score_table.record(rank, avg_runs, recorded_games)
+            evaluated += 1
+        
+        if score_table is not None:
+            score_table.flush()
+        return evaluated, [(avg_runs, -neg_rank, lineup) for avg_runs, neg_rank, lineup in best_lineups], self.simulator.metrics
+    
+    def parallel_deep_optimize(self):
+        games_per_lineup = self.games_per_lineup = 100
+        top_k = self.top_k
+        classes, class_ids = self.lineup_space()
+        total_lineups = multiset_permutation_count(class_ids)
+        self.record_lineup_space(classes, class_ids)
+        self.open_score_table(classes, class_ids)
+        chunk_size = max(1, min(self.chunk_size, math.ceil(total_lineups / self.workers)))
+        
+        completed_ranges, best_lineups = self.load_checkpoint()
+        total_evaluated = sum(stop - start for start, stop in completed_ranges)
+        last_checkpoint = time.monotonic()
+        stop_event = multiprocessing.Event()
+        executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_shard_worker, initargs=(stop_event,))
+        pending = {}
+        
+        # Contiguous rank ranges, each searched by one worker with its own top-k.
+        # Only a couple of ranges per worker are queued at a time.
+        rank_ranges = _missing_ranges(completed_ranges, total_lineups, chunk_size)
+        
+        def submit_next():
+            rank_range = next(rank_ranges, None)
+            if rank_range is not None:
+                future = executor.submit(_search_rank_range, self.players, self.worker_options(),
+                                         games_per_lineup, top_k, *rank_range)
+                pending[future] = rank_range
+        
+        def merge(future):
+            nonlocal best_lineups, total_evaluated
+            start, _ = pending.pop(future)
+            evaluated, shard_best, shard_metrics = future.result()
+            if shard_metrics is not None:
+                self.simulator.metrics.merge(shard_metrics)
+            total_evaluated += evaluated
+            completed_ranges.append((start, start + evaluated))
+            best_lineups = heapq.nlargest(top_k, best_lineups + shard_best, key=_lineup_sort_key)
+        
+        try:
+            for _ in range(self.workers * 2):
+                submit_next()
+            
+            while pending:
+                done, _ = wait(list(pending), timeout=0.1, return_when=FIRST_COMPLETED)
+                if not done and self.running:
+                    continue
+                merged_before = total_evaluated
+                for future in done:
+                    merge(future)
+                    submit_next()
                 
-                for _ in range(games_per_lineup):
-                    result = self.simulator.simulate_game(lineup)
-                    total_runs += result['runs']
+                merged = total_evaluated - merged_before
+                self.report_progress((total_evaluated / total_lineups) * 100, lineups=merged,
+                                     games=merged * self.recorded_games(games_per_lineup),
+                                     score=best_lineups[0][0] if best_lineups else None,
+                                     leaders=[(avg_runs, -rank, lineup) for avg_runs, rank, lineup in best_lineups])
                 
-                avg_runs = total_runs / games_per_lineup
-                best_lineups.append((lineup, avg_runs))
+                if self.checkpoint_path and time.monotonic() - last_checkpoint >= self.checkpoint_interval:
+                    self.save_checkpoint(completed_ranges, best_lineups, total_lineups)
+                    last_checkpoint = time.monotonic()
                 
-                total_evaluated += 1
-                self.progress = (total_evaluated / total_lineups) * 100
-                if self.progress_callback:
-                    self.progress_callback(self.progress)
-                    
+                if not self.running:
+                    print("\nOptimization interrupted...")
+                    stop_event.set()
+                    break
+        
         except Exception as e:
             print(f"\nError during optimization: {str(e)}")
         
         finally:
-            # Sort and return best lineups
-            best_lineups.sort(key=lambda x: x[1], reverse=True)
-            return best_lineups[:3]
+            executor.shutdown(wait=True, cancel_futures=True)
+            # Keep whatever the interrupted shards finished
+            for future in list(pending):
+                if future.done() and not future.cancelled() and future.exception() is None:
+                    merge(future)
+            if self.checkpoint_path:
+                self.save_checkpoint(completed_ranges, best_lineups, total_lineups)
+        
+        return [(lineup, avg_runs) for avg_runs, _, lineup in best_lineups]
+    
+    def cluster_deep_optimize(self):
+        self.coordinator = DeepCoordinator(self, *self.cluster_address, lease_seconds=self.lease_seconds,
+                                           token=self.cluster_token)
+        host, port = self.coordinator.address
+        print(f"Coordinating deep search for workers on {host}:{port}", file=sys.stderr)
+        try:
+            return self.coordinator.run()
+        finally:
+            self.coordinator.close()
     
 
+def _send_message(stream, message: Dict):
+    # Coordinator protocol: one JSON object per line
+    stream.write(json.dumps(message).encode() + b"\n")
+    stream.flush()
+
+def _receive_message(stream) -> Optional[Dict]:
+    line = stream.readline()
+    return json.loads(line) if line else None
+
+class _CoordinatorHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        self.server.coordinator.serve_worker(self.rfile, self.wfile)
+
+class DeepCoordinator:
+    # Runs deep search across run_deep_worker processes (on this machine or others)
+    # that connect over TCP. Rank ranges are handed out as leases of lease_seconds,
+    # which workers renew while they search; a lease whose worker disconnects or
+    # stops renewing goes back in the queue, and the first result for a range
+    # wins. Every lineup's games come from streams of the run's seed, so the
+    # merged top-k is the same as a single-node run. With a token, workers must
+    # present it in their hello; results are checked against the lineup space
+    # before they touch any state, and a worker sending a bad one is dropped
+    # (its leases are reissued).
+    def __init__(self, optimizer, host: str = '127.0.0.1', port: int = 0, lease_seconds: float = 60.0,
+                 token: Optional[str] = None):
+        self.optimizer = optimizer
+        self.lease_seconds = lease_seconds
+        self.token = token
+        self.condition = threading.Condition()
+        self.unleased = deque()
+        # lease id -> (start, stop, expiry, connection id)
+        self.leases = {}
+        self.lease_ids = itertools.count(1)
+        self.connection_ids = itertools.count(1)
+        self.outstanding = set()
+        self.finished = False
+        self.server = socketserver.ThreadingTCPServer((host, port), _CoordinatorHandler, bind_and_activate=False)
+        self.server.daemon_threads = True
+        self.server.allow_reuse_address = True
+        self.server.server_bind()
+        self.server.server_activate()
+        self.server.coordinator = self
+        self.thread = None
+    
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.server.server_address[:2]
+    
+    def run(self) -> List[Tuple[List[str], float]]:
+        optimizer = self.optimizer
+        games_per_lineup = optimizer.games_per_lineup = 100
+        self.classes, self.class_ids = classes, class_ids = optimizer.lineup_space()
+        self.total_lineups = multiset_permutation_count(class_ids)
+        optimizer.record_lineup_space(classes, class_ids)
+        self.recorded_games = optimizer.recorded_games(games_per_lineup)
+        self.completed_ranges, self.best_lineups = optimizer.load_checkpoint()
+        self.total_evaluated = sum(stop - start for start, stop in self.completed_ranges)
+        self.last_checkpoint = time.monotonic()
+        self.unleased.extend(_missing_ranges(self.completed_ranges, self.total_lineups, optimizer.chunk_size))
+        self.outstanding = set(self.unleased)
+        stats = optimizer.search_stats
+        stats.update({'cluster_workers': 0, 'rejected_workers': 0, 'leases_issued': 0, 'leases_reissued': 0,
+                      'duplicate_results': 0, 'invalid_results': 0})
+        # Workers rebuild the optimizer from this; score tables and metrics stay on
+        # the node that wrote them, so neither is shared
+        self.job = {
+            'type': 'job',
+            'roster': {name: {'hit_chance': player.hit_chance, 'hit_probabilities': player.hit_probabilities}
+                       for name, player in optimizer.players.items()},
+            'options': dict(optimizer.worker_options(), score_table_path=None, track_metrics=False),
+            'games_per_lineup': games_per_lineup,
+            'top_k': optimizer.top_k
+        }
+        
+        self.thread = threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.1}, daemon=True)
+        self.thread.start()
+        with self.condition:
+            while self.outstanding and optimizer.running:
+                self.condition.wait(0.25)
+            self.finished = True
+            if not optimizer.running:
+                print("\nOptimization interrupted...")
+            if optimizer.checkpoint_path:
+                optimizer.save_checkpoint(self.completed_ranges, self.best_lineups, self.total_lineups)
+            return [(lineup, avg_runs) for avg_runs, _, lineup in self.best_lineups]
+    
+    def close(self):
+        if self.thread is not None:
+            self.server.shutdown()
+        self.server.server_close()
+    
+    def serve_worker(self, rfile, wfile):
+        connection_id = next(self.connection_ids)
+        try:
+            hello = _receive_message(rfile)
+            if hello is None:
+                return
+            if self.token is not None and not hmac.compare_digest(str(hello.get('token')).encode(),
+                                                                  self.token.encode()):
+                with self.condition:
+                    self.optimizer.search_stats['rejected_workers'] += 1
+                _send_message(wfile, {'type': 'rejected'})
+                return
+            with self.condition:
+                self.optimizer.search_stats['cluster_workers'] += 1
+            _send_message(wfile, self.job)
+            while True:
+                message = _receive_message(rfile)
+                if message is None:
+                    return
+                if message['type'] == 'lease':
+                    _send_message(wfile, self.grant(connection_id))
+                elif message['type'] == 'renew':
+                    self.renew(message['lease'], connection_id)
+                elif message['type'] == 'result':
+                    self.complete(message)
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            pass
+        finally:
+            self.release(connection_id)
+    
+    def grant(self, connection_id: int) -> Dict:
+        with self.condition:
+            if self.finished or not self.optimizer.running:
+                return {'type': 'done'}
+            now = time.monotonic()
+            for lease_id, (start, stop, expiry, _) in list(self.leases.items()):
+                if expiry <= now:
+                    self.requeue(lease_id)
+            if self.unleased:
+                start, stop = self.unleased.popleft()
+                lease_id = next(self.lease_ids)
+                self.leases[lease_id] = (start, stop, now + self.lease_seconds, connection_id)
+                self.optimizer.search_stats['leases_issued'] += 1
+                return {'type': 'lease', 'lease': lease_id, 'start': start, 'stop': stop,
+                        'lease_seconds': self.lease_seconds}
+            if self.leases:
+                # Everything is out; ask again in case a lease lapses
+                earliest = min(expiry for _, _, expiry, _ in self.leases.values())
+                return {'type': 'wait', 'seconds': min(1.0, max(0.05, earliest - now))}
+            return {'type': 'done'}
+    
+    def renew(self, lease_id: int, connection_id: int):
+        with self.condition:
+            lease = self.leases.get(lease_id)
+            if lease is not None and lease[3] == connection_id:
+                self.leases[lease_id] = lease[:2] + (time.monotonic() + self.lease_seconds, connection_id)
+    
+    def requeue(self, lease_id: int):
+        start, stop, _, _ = self.leases.pop(lease_id)
+        if (start, stop) in self.outstanding:
+            self.unleased.appendleft((start, stop))
+            self.optimizer.search_stats['leases_reissued'] += 1
+    
+    def release(self, connection_id: int):
+        # A disconnected worker's leases can be reissued straight away
+        with self.condition:
+            for lease_id, (_, _, _, owner) in list(self.leases.items()):
+                if owner == connection_id:
+                    self.requeue(lease_id)
+    
+    def validate_result(self, message: Dict) -> Tuple[Tuple[int, int], int, List]:
+        # A result must cover a whole range of the lineup space, and each top-k
+        # entry must be the lineup at its rank with a finite score
+        start, stop, evaluated, top = message['start'], message['stop'], message['evaluated'], message['top']
+        if (not all(type(value) is int for value in (start, stop, evaluated))
+                or not 0 <= start < stop <= self.total_lineups or evaluated != stop - start):
+            raise ValueError(f"Result for ranks {start}-{stop} is not a whole range")
+        if not isinstance(top, list) or len(top) > min(self.optimizer.top_k, evaluated):
+            raise ValueError("Result has a malformed top-k")
+        shard_best = []
+        for avg_runs, rank, lineup in top:
+            if (type(rank) is not int or not start <= rank < stop
+                    or lineup != expand_lineup(self.classes, unrank_multiset_permutation(self.class_ids, rank))
+                    or type(avg_runs) not in (int, float) or not math.isfinite(avg_runs) or avg_runs < 0):
+                raise ValueError(f"Result has an invalid entry for rank {rank}")
+            shard_best.append((float(avg_runs), rank, lineup))
+        return (start, stop), evaluated, shard_best
+    
+    def complete(self, message: Dict):
+        optimizer = self.optimizer
+        try:
+            rank_range, evaluated, shard_best = self.validate_result(message)
+        except (KeyError, TypeError, ValueError):
+            with self.condition:
+                optimizer.search_stats['invalid_results'] += 1
+            raise ValueError("Invalid result")
+        with self.condition:
+            if rank_range not in self.outstanding or self.finished:
+                optimizer.search_stats['duplicate_results'] += 1
+                return
+            self.outstanding.remove(rank_range)
+            for lease_id, (start, stop, _, _) in list(self.leases.items()):
+                if (start, stop) == rank_range:
+                    del self.leases[lease_id]
+            if rank_range in self.unleased:
+                self.unleased.remove(rank_range)
+            
+            self.completed_ranges.append(rank_range)
+            self.total_evaluated += evaluated
+            self.best_lineups = heapq.nlargest(optimizer.top_k, self.best_lineups + shard_best, key=_lineup_sort_key)
+            optimizer.report_progress((self.total_evaluated / self.total_lineups) * 100, lineups=evaluated,
+                                      games=evaluated * self.recorded_games,
+                                      score=self.best_lineups[0][0] if self.best_lineups else None,
+                                      leaders=[(avg_runs, -rank, lineup) for avg_runs, rank, lineup in self.best_lineups])
+            if optimizer.checkpoint_path and time.monotonic() - self.last_checkpoint >= optimizer.checkpoint_interval:
+                optimizer.save_checkpoint(self.completed_ranges, self.best_lineups, self.total_lineups)
+                self.last_checkpoint = time.monotonic()
+            self.condition.notify_all()
+
+def run_deep_worker(host: str, port: int, connect_timeout: float = 30.0, token: Optional[str] = None) -> int:
+    # Searches rank ranges leased from a DeepCoordinator until it has none left;
+    # returns how many ranges this worker completed. Waits up to connect_timeout
+    # for the coordinator to start listening; raises PermissionError if it
+    # refuses the token.
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            connection = socket.create_connection((host, port), timeout=connect_timeout)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.25)
+    connection.settimeout(None)
+    stream = connection.makefile('rwb')
+    completed = 0
+    # The main thread searches while this one renews its lease, so writes share a lock
+    lock = threading.Lock()
+    current_lease = None
+    stopped = threading.Event()
+    
+    def send(message: Dict):
+        with lock:
+            _send_message(stream, message)
+    
+    def renew_leases(interval: float):
+        while not stopped.wait(interval):
+            lease_id = current_lease
+            if lease_id is not None:
+                try:
+                    send({'type': 'renew', 'lease': lease_id})
+                except (OSError, ValueError):
+                    return
+    
+    try:
+        send({'type': 'hello', 'host': socket.gethostname(), 'pid': os.getpid(), 'token': token})
+        job = _receive_message(stream)
+        if job is None:
+            return completed
+        if job['type'] == 'rejected':
+            raise PermissionError(f"Coordinator at {host}:{port} rejected this worker's token")
+        optimizer = LineupOptimizer(parse_roster(job['roster']), mode='deep', **job['options'])
+        renewer = None
+        while True:
+            send({'type': 'lease'})
+            lease = _receive_message(stream)
+            if lease is None or lease['type'] == 'done':
+                break
+            if lease['type'] == 'wait':
+                time.sleep(lease['seconds'])
+                continue
+            if renewer is None:
+                renewer = threading.Thread(target=renew_leases, args=(lease['lease_seconds'] / 3,), daemon=True)
+                renewer.start()
+            current_lease = lease['lease']
+            evaluated, top, _ = optimizer.search_rank_range(lease['start'], lease['stop'],
+                                                            job['games_per_lineup'], job['top_k'])
+            current_lease = None
+            send({'type': 'result', 'lease': lease['lease'], 'start': lease['start'],
+                  'stop': lease['stop'], 'evaluated': evaluated, 'top': top})
+            completed += 1
+    except PermissionError:
+        raise
+    except OSError:
+        # The coordinator finished (or went away) while this worker was searching
+        pass
+    finally:
+        stopped.set()
+        stream.close()
+        connection.close()
+    return completed
+
+def user_cache_path(filename: str) -> str:
+    # Under $XDG_CACHE_HOME (or ~/.cache), not the working directory
+    directory = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'baseball_optimizer')
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, filename)
+
 class ParallelOptimizer:
-    def __init__(self, players: Dict[str, Player]):
+    def __init__(self, players: Dict[str, Player], deep_workers=1, checkpoint_path="lineup_optimization_deep.checkpoint",
+                 cache_path=None, seed=None, resume=False):
         self.players = players
+        # Root seed for both analyses (each optimizer spawns its own streams from it),
+        # drawn once here when not given so the quick and deep runs share it
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.deep_workers = deep_workers
+        self.checkpoint_path = checkpoint_path
+        # Only pick up an interrupted deep run when asked to; a finished run's
+        # checkpoint is removed, so it can't hand back old results
+        self.resume = resume
+        # Shared by the quick and deep runs; with a cache_path it is kept on disk
+        # across restarts, so lineups whose players' stats are unchanged aren't
+        # simulated again
+        self.cache = EvaluationCache(path=cache_path)
         self.quick_results = None
         self.deep_results = None
-        self.progress = {'quick': 0.0, 'deep': 0.0}
-        self.lock = threading.Lock()
-        self.running = True
+        # One event cancels everything: the stop word, Ctrl+C and both optimizers share it
+        self.cancel_event = threading.Event()
+        self.optimizers = {}
         self.quick_results_displayed = False
         self.deep_results_displayed = False
-        self.keyboard_monitor = KeyboardMonitor()
+        self.keyboard_monitor = KeyboardMonitor(stop_event=self.cancel_event)
+    
+    @property
+    def running(self) -> bool:
+        return not self.cancel_event.is_set()
+    
+    @running.setter
+    def running(self, value: bool):
+        if value:
+            self.cancel_event.clear()
+        else:
+            self.cancel_event.set()
+    
+    def snapshot(self, analysis: str) -> Dict:
+        # Latest published telemetry of the 'quick' or 'deep' run
+        optimizer = self.optimizers.get(analysis)
+        if optimizer is None:
+            return {'progress': 0.0, 'eta_seconds': None, 'lineups_per_second': 0.0, 'finished': False}
+        return optimizer.telemetry.snapshot
+    
+    def saved_deep_progress(self) -> Optional[float]:
+        # Percent done of an interrupted deep run at checkpoint_path, if any
+        if not (self.checkpoint_path and os.path.exists(self.checkpoint_path)):
+            return None
+        try:
+            with open(self.checkpoint_path, 'rb') as f:
+                return pickle.load(f)['progress']
+        except Exception:
+            return None
     
     def run_parallel_analysis(self):
         # Reset progress tracking
-        self.progress = {'quick': 0.0, 'deep': 0.0}
+        self.optimizers = {}
         self.quick_results_displayed = False
         self.deep_results_displayed = False
         
@@ -444,89 +3038,65 @@ class ParallelOptimizer:
                 progress_thread.daemon = True
                 progress_thread.start()
                 
-                # Monitor for stop signal
+                # Wait for both analyses or the stop signal; the optimizers watch the
+                # same event, so there is nothing to forward to them
                 try:
-                    while True:
-                        if not self.keyboard_monitor.should_continue():
-                            print("\nStopping optimization...")
-                            self.running = False
-                            win32api.GenerateConsoleCtrlEvent(signal.CTRL_C_EVENT, 0)
-                            break
-                        
-                        if quick_future.done() and deep_future.done():
+                    while not self.cancel_event.is_set():
+                        _, not_done = wait([quick_future, deep_future], timeout=0.25)
+                        if not not_done:
                             break
-                            
-                        time.sleep(0.1)
+                    else:
+                        print("\nStopping optimization...")
+                        _send_console_interrupt()
                 except (KeyboardInterrupt, SystemExit):
                     print("\nInterrupt received. Stopping optimization...")
-                    self.running = False
                     self.keyboard_monitor.stop()
-                    win32api.GenerateConsoleCtrlEvent(signal.CTRL_C_EVENT, 0)
+                    _send_console_interrupt()
                 
                 return quick_future, deep_future
                 
         except KeyboardInterrupt:
             print("\nKeyboard interrupt detected. Stopping optimization...")
-            self.running = False
             self.keyboard_monitor.stop()
             raise
+        finally:
+            self.keyboard_monitor.close()
     
     def run_quick_analysis(self):
-        def update_quick_progress(progress):
-            with self.lock:
-                self.progress['quick'] = progress
-        
-        optimizer = LineupOptimizer(self.players, mode='quick', progress_callback=update_quick_progress)
-        
-        def check_stop():
-            if not self.running or not self.keyboard_monitor.should_continue():
-                optimizer.running = False
-        
-        # Start stop signal monitor
-        stop_monitor = threading.Thread(target=lambda: [check_stop() or time.sleep(0.1) for _ in iter(bool, True)])
-        stop_monitor.daemon = True
-        stop_monitor.start()
-        
+        optimizer = LineupOptimizer(self.players, mode='quick', cache=self.cache, seed=self.seed,
+                                    cancel_event=self.cancel_event)
+        self.optimizers['quick'] = optimizer
         self.quick_results = optimizer.optimize()
-        with self.lock:
-            self.progress['quick'] = 100.0
+        self.cache.flush()
         return self.quick_results
     
     def run_deep_analysis(self):
-        def update_deep_progress(progress):
-            with self.lock:
-                self.progress['deep'] = progress
-        
-        optimizer = LineupOptimizer(self.players, mode='deep', progress_callback=update_deep_progress)
-        
-        def check_stop():
-            if not self.running or not self.keyboard_monitor.should_continue():
-                optimizer.running = False
-        
-        # Start stop signal monitor
-        stop_monitor = threading.Thread(target=lambda: [check_stop() or time.sleep(0.1) for _ in iter(bool, True)])
-        stop_monitor.daemon = True
-        stop_monitor.start()
-        
+        optimizer = LineupOptimizer(self.players, mode='deep', workers=self.deep_workers,
+                                    checkpoint_path=self.checkpoint_path, resume=self.resume, cache=self.cache,
+                                    seed=self.seed, cancel_event=self.cancel_event)
+        self.optimizers['deep'] = optimizer
         try:
             self.deep_results = optimizer.optimize()
-            with self.lock:
-                self.progress['deep'] = 100.0
+            if (optimizer.telemetry.snapshot['progress'] >= 100 and self.checkpoint_path
+                    and os.path.exists(self.checkpoint_path)):
+                os.remove(self.checkpoint_path)
             return self.deep_results
         except KeyboardInterrupt:
             print("\nInterrupting deep analysis...")
-            optimizer.running = False
+            self.cancel_event.set()
             return None
+        finally:
+            self.cache.flush()
     
     def monitor_progress(self):
-        while self.running and self.keyboard_monitor.should_continue():
+        # Redraws from the telemetry snapshots; waiting on the cancel event
+        # means a stop is noticed at once rather than on the next poll
+        while not self.cancel_event.wait(0.25):
             try:
                 self.display_progress()
                 
-                if self.progress['quick'] >= 100 and self.progress['deep'] >= 100:
+                if self.snapshot('quick')['finished'] and self.snapshot('deep')['finished']:
                     break
-                    
-                time.sleep(0.05)  # Update display every 50ms for smooth progress bar
                 
             except Exception as e:
                 print(f"\nProgress monitoring error: {str(e)}")
@@ -548,8 +3118,11 @@ class ParallelOptimizer:
             self.deep_results_displayed = True
             
         # Create and print progress line that updates in place
-        sys.stdout.write(f"\rProgress - Quick: [{self.progress_bar(self.progress['quick'])}] {self.progress['quick']:.1f}% "
-                        f"Deep: [{self.progress_bar(self.progress['deep'])}] {self.progress['deep']:.1f}%")
+        quick, deep = self.snapshot('quick'), self.snapshot('deep')
+        eta = f" ETA {deep['eta_seconds']:.0f}s" if deep['eta_seconds'] is not None else ""
+        sys.stdout.write(f"\rProgress - Quick: [{self.progress_bar(quick['progress'])}] {quick['progress']:.1f}% "
+                        f"Deep: [{self.progress_bar(deep['progress'])}] {deep['progress']:.1f}% "
+                        f"({deep['lineups_per_second']:.0f} lineups/s{eta})")
         sys.stdout.flush()
     
     def progress_bar(self, percentage, width=50):
@@ -561,6 +3134,11 @@ class ParallelOptimizer:
             return
             
         print("\nTop 3 Lineups:")
+        optimizer = self.optimizers.get(analysis_type.lower())
+        intervals = optimizer.search_stats.get('intervals', []) if optimizer else []
+        
+        def describe(index):
+            return _describe_interval(intervals[index], optimizer.confidence) if index < len(intervals) else ""
         
         # Only run detailed analysis if these are newly displayed results
         should_analyze = (analysis_type == "Quick" and not self.quick_results_displayed) or \
@@ -569,7 +3147,8 @@ class ParallelOptimizer:
         if should_analyze:
             try:
                 # Create a single simulator and metrics tracker for all lineups
-                simulator = BaseballSimulator({name: self.players[name] for name in self.players})
+                simulator = BaseballSimulator({name: self.players[name] for name in self.players}, track_metrics=False,
+                                              rng=RandomStreams(self.seed).child('display', analysis_type))
                 total_stats = MetricsTracker()
                 
                 # Pre-calculate all metrics to avoid interruption
@@ -579,19 +3158,20 @@ class ParallelOptimizer:
                     total_stats.reset()
                     
                     # Run 100 games for detailed analysis
+                    compiled = simulator.compile_lineup(lineup)
                     for _ in range(100):
-                        result = simulator.simulate_game(lineup)
+                        result = simulator.simulate_game(compiled)
                         total_stats.update_game_metrics(result)
                     
                     metrics = total_stats.get_game_metrics()
                     if metrics:  # Only add if metrics were calculated
-                        lineup_metrics.append((lineup, avg_runs, metrics))
+                        lineup_metrics.append((lineup, avg_runs, metrics, describe(len(lineup_metrics))))
                 
                 # Buffer all output first
                 output_buffer = []
-                for i, (lineup, avg_runs, metrics) in enumerate(lineup_metrics, 1):
+                for i, (lineup, avg_runs, metrics, interval) in enumerate(lineup_metrics, 1):
                     output_buffer.extend([
-                        f"\n{i}. Average Runs: {avg_runs:.2f}",
+                        f"\n{i}. Average Runs: {avg_runs:.2f}{interval}",
                         f"   Lineup: {' -> '.join(lineup)}",
                         "\n   Detailed Statistics:",
                         f"   - Games Analyzed: 100",
@@ -620,7 +3200,7 @@ class ParallelOptimizer:
         else:
             # Just display basic info for already-shown results
             for i, (lineup, avg_runs) in enumerate(results, 1):
-                print(f"\n{i}. Average Runs: {avg_runs:.2f}")
+                print(f"\n{i}. Average Runs: {avg_runs:.2f}{describe(i - 1)}")
                 print(f"   Lineup: {' -> '.join(lineup)}")
 
 # Initialize with current player dictionary
@@ -636,7 +3216,320 @@ playerDictionary = {"Jeremiah":[1,.9,[.6,.3,.1,0],0],
                    "Matt":[0,.60,[1,0,0,0],0],
                    "Arnold":[0,.50,[1,0,0,0],0]}
 
+def load_roster(path: str) -> Dict[str, Player]:
+    # JSON roster, either in playerDictionary's layout ({name: [batting_first,
+    # hit_chance, [single, double, triple, HR], base]}) or as
+    # {name: {"hit_chance": ..., "hit_probabilities": [...]}}; "-" reads stdin
+    if path == "-":
+        return parse_roster(json.load(sys.stdin))
+    with open(path) as f:
+        return parse_roster(json.load(f))
+
+def parse_roster(roster: Dict) -> Dict[str, Player]:
+    # Players from an already-decoded roster in either of load_roster's layouts
+    players = {}
+    for name, stats in roster.items():
+        if isinstance(stats, dict):
+            players[name] = Player(name, float(stats['hit_chance']), [float(p) for p in stats['hit_probabilities']])
+        else:
+            players[name] = Player(name, float(stats[1]), [float(p) for p in stats[2]])
+    return players
+
+def results_report(optimizer: LineupOptimizer, results: List[Tuple[List[str], float]], elapsed: float) -> Dict:
+    # The JSON-ready summary of a finished run written by the CLI and the job server
+    return {
+        'mode': optimizer.mode,
+        'engine': optimizer.engine,
+        'seed': optimizer.seed,
+        'completed': optimizer.running,
+        'elapsed_seconds': elapsed,
+        'confidence': optimizer.confidence,
+        'results': [{'rank': rank, 'lineup': lineup, 'avg_runs': avg_runs, 'games': interval['games'],
+                     'std_error': interval['std_error'], 'ci_low': interval['ci_low'], 'ci_high': interval['ci_high']}
+                    for rank, ((lineup, avg_runs), interval)
+                    in enumerate(zip(results, optimizer.search_stats.get('intervals', [])), 1)],
+        'search_stats': {name: value for name, value in optimizer.search_stats.items() if name != 'intervals'}
+    }
+
+def _json_object_members(f, chunk_size: int = 1 << 16):
+    # (key, value) pairs of a top-level JSON object, decoded one member at a
+    # time so the whole file never has to be in memory
+    decoder = json.JSONDecoder()
+    buffer = ''
+    eof = False
+    
+    def fill() -> str:
+        # Next non-space character, reading more of the file as needed ('' at the end)
+        nonlocal buffer, eof
+        buffer = buffer.lstrip()
+        while not buffer and not eof:
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer = chunk.lstrip()
+        return buffer[:1]
+    
+    def punctuation(expected: str) -> str:
+        nonlocal buffer
+        char = fill()
+        if not char or char not in expected:
+            raise ValueError(f"League file: expected one of {expected!r}, found {char or 'end of file'!r}")
+        buffer = buffer[1:]
+        return char
+    
+    def value():
+        nonlocal buffer, eof
+        fill()
+        while True:
+            try:
+                decoded, end = decoder.raw_decode(buffer)
+                # A number cut off by the chunk boundary would still decode
+                if end < len(buffer) or eof:
+                    buffer = buffer[end:]
+                    return decoded
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            chunk = f.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+    
+    punctuation('{')
+    if fill() == '}':
+        return
+    while True:
+        key = value()
+        punctuation(':')
+        yield key, value()
+        if punctuation(',}') == '}':
+            return
+
+def read_league(path: str):
+    # (team, roster) pairs from a league file, read lazily:
+    #   .csv   - columns team, player, hit_chance, single, double, triple, home_run,
+    #            with each team's rows together
+    #   .jsonl - one {"team": ..., "roster": {...}} per line
+    #   other  - one JSON object of {team: roster}
+    # Rosters use either of load_roster's layouts
+    with open(path, newline='') as f:
+        if path.lower().endswith('.csv'):
+            for team, rows in itertools.groupby(csv.DictReader(f), key=lambda row: row['team']):
+                yield team, {row['player']: {'hit_chance': float(row['hit_chance']),
+                                             'hit_probabilities': [float(row['single']), float(row['double']),
+                                                                   float(row['triple']), float(row['home_run'])]}
+                             for row in rows}
+        elif path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    yield entry['team'], entry['roster']
+        else:
+            yield from _json_object_members(f)
+
+def estimated_cost(players: Dict[str, Player], options: Dict) -> int:
+    # Rough games simulated by a roster's run, for starting the longest first
+    mode = options.get('mode', 'quick')
+    size = len(players)
+    if mode == 'deep':
+        keys = [(player.hit_chance, tuple(player.hit_probabilities)) for player in players.values()]
+        return multiset_permutation_count(keys) * 100
+    if mode == 'subset':
+        return math.perm(size, options.get('lineup_size') or size) * 100
+    if mode == 'quick':
+        return min(100000, math.factorial(size)) * 10
+    if mode == 'branch_and_bound':
+        return math.factorial(size)
+    return min(options.get('max_evaluations', 2000), math.factorial(size)) * 100
+
+def _optimize_league_roster(team: str, roster: Dict, options: Dict) -> Dict:
+    # Runs in a league pool process; a failure is reported on the team's line
+    started = time.monotonic()
+    try:
+        optimizer = LineupOptimizer(parse_roster(roster), **options)
+        results = optimizer.optimize()
+        return dict(team=team, **results_report(optimizer, results, time.monotonic() - started))
+    except Exception as e:
+        return {'team': team, 'error': f"{type(e).__name__}: {e}", 'elapsed_seconds': time.monotonic() - started}
+
+def optimize_league(teams, output, options: Dict, jobs: int = 1, lookahead: Optional[int] = None,
+                    cancel_event=None, progress_callback=None) -> Dict:
+    # Optimizes each (team, roster) on a shared pool of `jobs` processes and writes
+    # one JSON line per team to `output` as it finishes. Teams are pulled from the
+    # iterator only `lookahead` at a time, and the costliest buffered roster starts
+    # next, so memory stays flat with league size and a long deep run starts early
+    # instead of holding up the end. Setting cancel_event stops new teams starting:
+    # buffered ones are counted as not_started, and the rest are never read.
+    lookahead = max(jobs, lookahead or jobs * 4)
+    teams = iter(teams)
+    buffered = []
+    order = itertools.count()
+    pending = set()
+    summary = {'teams': 0, 'failed': 0, 'not_started': 0, 'cancelled': False}
+    started = time.monotonic()
+    
+    def record(report: Dict):
+        output.write(json.dumps(report, default=str) + "\n")
+        output.flush()
+        summary['teams'] += 1
+        summary['failed'] += 'error' in report
+        if progress_callback:
+            progress_callback(report)
+    
+    def refill():
+        while len(buffered) < lookahead:
+            entry = next(teams, None)
+            if entry is None:
+                return
+            team, roster = entry
+            try:
+                cost = estimated_cost(parse_roster(roster), options)
+            except (KeyError, IndexError, TypeError, ValueError, AttributeError) as e:
+                record({'team': team, 'error': f"Invalid roster: {type(e).__name__}: {e}"})
+                continue
+            heapq.heappush(buffered, (-cost, next(order), team, roster))
+    
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        refill()
+        while buffered or pending:
+            stopping = cancel_event is not None and cancel_event.is_set()
+            while buffered and len(pending) < jobs and not stopping:
+                _, _, team, roster = heapq.heappop(buffered)
+                pending.add(executor.submit(_optimize_league_roster, team, roster, options))
+            if stopping:
+                summary['not_started'] += len(buffered)
+                summary['cancelled'] = True
+                buffered.clear()
+            else:
+                refill()
+            if not pending:
+                break
+            done, pending = wait(pending, timeout=0.25, return_when=FIRST_COMPLETED)
+            for future in done:
+                record(future.result())
+    summary['elapsed_seconds'] = time.monotonic() - started
+    return summary
+
+def cli(argv: Optional[List[str]] = None) -> int:
+    # Non-interactive entry point: optimize a roster file and write the results as JSON
+    parser = argparse.ArgumentParser(description="Optimize a batting lineup and write the results as JSON.")
+    parser.add_argument("--roster", help="roster JSON file, or - for stdin")
+    parser.add_argument("--league", help="optimize every team in a league file (.json, .jsonl or .csv) instead")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="league mode: how many rosters are optimized at once")
+    parser.add_argument("--mode", default="quick",
+                        choices=["quick", "deep", "racing", "anneal", "genetic", "local", "branch_and_bound", "subset"])
+    parser.add_argument("--engine", default="monte_carlo", choices=["monte_carlo", "exact", "batch"])
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--max-evaluations", type=int, default=2000)
+    parser.add_argument("--lineup-size", type=int, help="subset mode: how many of the roster bat")
+    parser.add_argument("--common-random-numbers", action="store_true")
+    parser.add_argument("--checkpoint", help="deep mode checkpoint file")
+    parser.add_argument("--resume", action="store_true", help="resume deep mode from --checkpoint")
+    parser.add_argument("--score-table", help="deep mode score table file")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level of the reported intervals")
+    parser.add_argument("--refine-games", type=int, default=0,
+                        help="simulate tied leaders up to this many games each until the ranking separates")
+    parser.add_argument("--sensitivity", type=int, default=0, metavar="GAMES",
+                        help="also score the results under +/- --sensitivity-delta stat changes over this many games")
+    parser.add_argument("--sensitivity-delta", type=float, default=0.05,
+                        help="hit chance change, and share of hits moved between singles and doubles")
+    parser.add_argument("--coordinator", metavar="HOST:PORT",
+                        help="deep mode: lease rank ranges to --worker processes connecting here")
+    parser.add_argument("--lease-seconds", type=float, default=60.0,
+                        help="how long a worker may go without checking in before its range is reissued")
+    parser.add_argument("--worker", metavar="HOST:PORT",
+                        help="search rank ranges for the coordinator at this address instead of a roster")
+    parser.add_argument("--coordinator-token",
+                        help="shared secret workers must present to the coordinator (required to listen "
+                             "beyond this machine)")
+    parser.add_argument("--output", default="-", help="results file, or - for stdout (JSON Lines for --league)")
+    args = parser.parse_args(argv)
+    if args.top_k < 1:
+        parser.error("--top-k must be at least 1")
+    
+    if args.worker:
+        host, _, port = args.worker.rpartition(':')
+        try:
+            completed = run_deep_worker(host or '127.0.0.1', int(port), token=args.coordinator_token)
+        except PermissionError as e:
+            print(e, file=sys.stderr)
+            return 1
+        print(f"Searched {completed} rank ranges", file=sys.stderr)
+        return 0
+    if args.league:
+        return league_cli(args)
+    if not args.roster:
+        parser.error("--roster or --league is required unless running as a --worker")
+    cluster_address = None
+    if args.coordinator:
+        host, _, port = args.coordinator.rpartition(':')
+        cluster_address = (host or '127.0.0.1', int(port))
+        if cluster_address[0] not in ('127.0.0.1', 'localhost', '::1') and not args.coordinator_token:
+            parser.error("--coordinator-token is required when --coordinator listens beyond this machine")
+    
+    players = load_roster(args.roster)
+    optimizer = LineupOptimizer(players, mode=args.mode, engine=args.engine, workers=args.workers,
+                                top_k=args.top_k, seed=args.seed, max_evaluations=args.max_evaluations,
+                                common_random_numbers=args.common_random_numbers,
+                                checkpoint_path=args.checkpoint, resume=args.resume,
+                                score_table_path=args.score_table, confidence=args.confidence,
+                                refine_games=args.refine_games, lineup_size=args.lineup_size,
+                                cluster_address=cluster_address, lease_seconds=args.lease_seconds,
+                                cluster_token=args.coordinator_token)
+    
+    # Ctrl+C stops the search early and still writes what was found
+    def stop(sig, frame):
+        optimizer.running = False
+    previous_handler = signal.signal(signal.SIGINT, stop)
+    started = time.monotonic()
+    try:
+        results = optimizer.optimize()
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+    
+    report = results_report(optimizer, results, time.monotonic() - started)
+    if args.sensitivity and results:
+        deltas = (-args.sensitivity_delta, args.sensitivity_delta)
+        report['sensitivity'] = optimizer.sensitivity_analysis([lineup for lineup, _ in results], args.sensitivity,
+                                                               hit_chance_deltas=deltas, split_shifts=deltas)
+    output = json.dumps(report, indent=2, default=str)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    return 0
+
+def league_cli(args: argparse.Namespace) -> int:
+    # cli's --league: one JSON line per team, written as each finishes
+    options = {'mode': args.mode, 'engine': args.engine, 'top_k': args.top_k, 'seed': args.seed,
+               'max_evaluations': args.max_evaluations, 'common_random_numbers': args.common_random_numbers,
+               'confidence': args.confidence, 'refine_games': args.refine_games, 'lineup_size': args.lineup_size}
+    cancel_event = threading.Event()
+    
+    # Ctrl+C lets the running rosters finish but starts no more
+    def stop(sig, frame):
+        cancel_event.set()
+    previous_handler = signal.signal(signal.SIGINT, stop)
+    output = sys.stdout if args.output == "-" else open(args.output, 'w')
+    try:
+        summary = optimize_league(read_league(args.league), output, options, jobs=args.jobs,
+                                  cancel_event=cancel_event,
+                                  progress_callback=lambda report: print(f"Finished {report['team']}", file=sys.stderr))
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        if output is not sys.stdout:
+            output.close()
+    print(f"{summary['teams']} teams optimized, {summary['failed']} failed in {summary['elapsed_seconds']:.1f}s",
+          file=sys.stderr)
+    if summary['cancelled']:
+        print(f"Cancelled: {summary['not_started']} teams read but not started; the rest of {args.league} was not read",
+              file=sys.stderr)
+    return 1 if summary['failed'] else 0
+
 def main():
+    install_interrupt_handler()
     try:
         # Initialize player manager
         manager = PlayerManager(playerDictionary)
@@ -645,7 +3538,14 @@ def main():
         manager.update_players()
         
         # Initialize parallel optimizer
-        optimizer = ParallelOptimizer(manager.players)
+        optimizer = ParallelOptimizer(manager.players, deep_workers=os.cpu_count() or 1,
+                                      cache_path=user_cache_path("lineup_evaluations.cache"))
+        saved_progress = optimizer.saved_deep_progress()
+        if saved_progress is not None and saved_progress < 100:
+            print(f"\nAn interrupted deep analysis was saved at {saved_progress:.2f}%. Resume it?")
+            print("1. Yes - Resume (if the roster is unchanged)")
+            print("2. No - Start over")
+            optimizer.resume = input("Enter choice (1-2): ") == "1"
         
         print("\nStarting lineup optimization...")
         quick_future, deep_future = optimizer.run_parallel_analysis()
@@ -658,6 +3558,28 @@ def main():
         deep_results = deep_future.result()
         print("\nDeep Analysis Complete!")
         
+        # Mid-game stat changes re-search around the latest recommendation
+        # instead of rerunning both analyses
+        latest_results = deep_results or quick_results
+        while latest_results:
+            print("\nWould you like to update a player's stats and re-optimize?")
+            print("1. Yes")
+            print("2. No - Exit")
+            if input("Enter choice (1-2): ") != "1":
+                break
+            changed_player = manager.update_player_stats()
+            if changed_player is None:
+                continue
+            
+            incremental = LineupOptimizer(manager.players, mode='incremental', previous_results=latest_results,
+                                          changed_player=changed_player, cache=optimizer.cache)
+            latest_results = incremental.optimize()
+            print(f"\nRe-optimized after updating {changed_player}:")
+            intervals = incremental.search_stats['intervals']
+            for i, (lineup, avg_runs) in enumerate(latest_results, 1):
+                print(f"\n{i}. Average Runs: {avg_runs:.2f}{_describe_interval(intervals[i - 1], incremental.confidence)}")
+                print(f"   Lineup: {' -> '.join(lineup)}")
+        
         return quick_results, deep_results
         
     except KeyboardInterrupt:
@@ -677,4 +3599,7 @@ def main():
         return None, None
 
 if __name__ == "__main__":
+    # Any arguments select the batch CLI; without them run interactively
+    if len(sys.argv) > 1:
+        sys.exit(cli())
     main()
@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+
+import baseball_optimizer as bo
+
+# Throughput and memory benchmarks with fixed seeds. Results are a flat
+# {metric: value} map so runs can be diffed against a stored baseline;
+# metrics ending in _bytes are better lower, everything else better higher.
+
+BENCHMARK_SEED = 20240601
+ROSTER_SIZES = (5, 9, 11, 15)
+MODES = ('quick', 'racing', 'anneal', 'genetic', 'local', 'branch_and_bound', 'deep')
+EXACT_ROSTER_SIZE = 5
+MEMORY_ROSTER_SIZES = (11, 15)
+WORKER_COUNTS = (1, 2, 4)
+# Parallel scaling is measured on a fixed rank range of a 9-player roster
+# (9! = 362,880 lineups), big enough that each worker's share dwarfs pool
+# start-up and per-shard overhead
+PARALLEL_ROSTER_SIZE = 9
+PARALLEL_LINEUPS = 100000
+
+def benchmark_roster(size: int) -> Dict[str, bo.Player]:
+    # The default roster, repeated with numbered names past its 11 players
+    base_names = list(bo.playerDictionary)
+    roster = {}
+    for index in range(size):
+        base_name = base_names[index % len(base_names)]
+        name = base_name if index < len(base_names) else f"{base_name} {index // len(base_names) + 1}"
+        stats = bo.playerDictionary[base_name]
+        roster[name] = bo.Player(name, stats[1], list(stats[2]))
+    return roster
+
+def best_of(repeats: int, run) -> float:
+    # Shortest wall time of several runs, to keep scheduler noise out of the rates
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+def benchmark_simulator(sizes=ROSTER_SIZES, games=2000, repeats=3) -> Dict[str, float]:
+    metrics = {}
+    for size in sizes:
+        players = benchmark_roster(size)
+        simulator = bo.BaseballSimulator(players, track_metrics=False)
+        compiled = simulator.compile_lineup(list(players))
+        
+        def run():
+            rng = random.Random(BENCHMARK_SEED)
+            for _ in range(games):
+                simulator.simulate_game(compiled, rng=rng)
+        
+        metrics[f"simulate_game.games_per_second.roster_{size}"] = games / best_of(repeats, run)
+    return metrics
+
+def benchmark_modes(modes=MODES, roster_size=6, max_evaluations=300) -> Dict[str, float]:
+    metrics = {}
+    for mode in modes:
+        # Branch-and-bound scores lineups exactly, which is far slower per lineup,
+        # so it gets the smallest roster
+        engine = 'exact' if mode == 'branch_and_bound' else 'monte_carlo'
+        players = benchmark_roster(min(roster_size, EXACT_ROSTER_SIZE) if engine == 'exact' else roster_size)
+        optimizer = bo.LineupOptimizer(players, mode=mode, engine=engine, seed=BENCHMARK_SEED,
+                                       max_evaluations=max_evaluations)
+        try:
+            optimizer.optimize()
+        except ImportError as e:
+            print(f"Skipping {mode}: {e}", file=sys.stderr)
+            continue
+        metrics[f"optimizer.lineups_per_second.{mode}"] = optimizer.telemetry.snapshot['lineups_per_second']
+    return metrics
+
+def benchmark_deep_memory(sizes=MEMORY_ROSTER_SIZES, lineups=500) -> Dict[str, float]:
+    # Deep search over the first `lineups` ranks only; memory should not grow
+    # with the size of the permutation space. (No rates here: tracemalloc
+    # slows every allocation down.)
+    metrics = {}
+    for size in sizes:
+        optimizer = bo.LineupOptimizer(benchmark_roster(size), mode='deep', seed=BENCHMARK_SEED)
+        tracemalloc.start()
+        try:
+            optimizer.search_rank_range(0, lineups, 100, optimizer.top_k)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        metrics[f"deep.peak_memory_bytes.roster_{size}"] = peak
+    return metrics
+
+def benchmark_parallel(worker_counts=WORKER_COUNTS, roster_size=PARALLEL_ROSTER_SIZE, lineups=PARALLEL_LINEUPS,
+                       games_per_lineup=10, chunk_size=5000) -> Dict[str, float]:
+    # Deep search over ranks 0..lineups-1 in chunk_size shards, the same work
+    # split the same way for every worker count
+    players = benchmark_roster(roster_size)
+    options = bo.LineupOptimizer(players, mode='deep', seed=BENCHMARK_SEED, track_metrics=False).worker_options()
+    shards = [(start, min(start + chunk_size, lineups)) for start in range(0, lineups, chunk_size)]
+    metrics = {}
+    rates = {}
+    for workers in worker_counts:
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(bo._search_rank_range, players, options, games_per_lineup, 1, start, stop)
+                       for start, stop in shards]
+            evaluated = sum(future.result()[0] for future in futures)
+        rates[workers] = evaluated / (time.perf_counter() - started)
+        metrics[f"parallel.lineups_per_second.workers_{workers}"] = rates[workers]
+    for workers in worker_counts:
+        if workers != worker_counts[0]:
+            metrics[f"parallel.speedup.workers_{workers}"] = rates[workers] / rates[worker_counts[0]]
+    return metrics
+
+def run_benchmarks(quick: bool = False) -> Dict:
+    if quick:
+        metrics = benchmark_simulator(sizes=(5, 11), games=500, repeats=1)
+        metrics.update(benchmark_modes(modes=('quick', 'anneal', 'deep'), roster_size=5, max_evaluations=100))
+        metrics.update(benchmark_deep_memory(sizes=(11,), lineups=200))
+        metrics.update(benchmark_parallel(worker_counts=(1, 2), games_per_lineup=2))
+    else:
+        metrics = benchmark_simulator()
+        metrics.update(benchmark_modes())
+        metrics.update(benchmark_deep_memory())
+        metrics.update(benchmark_parallel())
+    return {
+        'seed': BENCHMARK_SEED,
+        'quick': quick,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': bo.np is not None,
+        'metrics': metrics
+    }
+
+def compare(results: Dict, baseline: Dict, tolerance: float = 0.2) -> List[Dict]:
+    # Metrics present in both runs that got worse by more than `tolerance`
+    regressions = []
+    for name, value in sorted(results['metrics'].items()):
+        previous = baseline['metrics'].get(name)
+        if not previous:
+            continue
+        change = (value - previous) / previous
+        worse = change > tolerance if name.endswith('_bytes') else change < -tolerance
+        if worse:
+            regressions.append({'metric': name, 'baseline': previous, 'current': value, 'change': change})
+    return regressions
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark simulator and optimizer throughput")
+    parser.add_argument("--output", default="-", help="where to write the results JSON ('-' for stdout)")
+    parser.add_argument("--baseline", help="earlier results JSON to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative slowdown (or memory growth) allowed before flagging a regression")
+    parser.add_argument("--quick", action="store_true", help="smaller rosters and budgets, for a smoke run")
+    args = parser.parse_args(argv)
+    
+    results = run_benchmarks(quick=args.quick)
+    if args.baseline:
+        with open(args.baseline) as f:
+            results['regressions'] = compare(results, json.load(f), args.tolerance)
+    
+    output = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+    
+    for regression in results.get('regressions', []):
+        print(f"REGRESSION {regression['metric']}: {regression['baseline']:.6g} -> {regression['current']:.6g} "
+              f"({regression['change'] * 100:+.1f}%)", file=sys.stderr)
+    return 1 if results.get('regressions') else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,418 @@
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import baseball_optimizer as bo
+
+# A local HTTP service around LineupOptimizer so index.html (or anything else
+# on this machine) can hand heavy runs to the multi-core Python engine.
+#
+#   POST   /jobs               {"roster": {...}, "mode": "deep", ...} -> 202 {"id": ...}
+#   GET    /jobs               every job's status
+#   GET    /jobs/<id>          one job's status, latest progress and results
+#   GET    /jobs/<id>/events   Server-Sent Events: queued, started, progress, done,
+#                              cancelled or failed; the stream ends after the last three
+#   DELETE /jobs/<id>          cancel; a running job finishes with its best lineups so far
+#
+# Jobs run one per process in a process pool. Their progress comes back over a
+# multiprocessing.Manager queue as Telemetry snapshots, which include the
+# current top-k lineups. Browsers may only call the server from the allowed
+# origins (by default "null", i.e. index.html opened as a file); at most
+# max_queued jobs wait at once, and finished jobs are forgotten after job_ttl
+# seconds.
+
+JOB_MODES = ('quick', 'deep', 'racing', 'anneal', 'genetic', 'local', 'branch_and_bound', 'subset')
+JOB_ENGINES = ('monte_carlo', 'exact', 'batch')
+# Option name -> type; anything else in a job request is ignored
+JOB_OPTIONS = {
+    'mode': str,
+    'engine': str,
+    'top_k': int,
+    'seed': int,
+    'max_evaluations': int,
+    'workers': int,
+    'chunk_size': int,
+    'common_random_numbers': bool,
+    'lineup_size': int,
+    'refine_games': int,
+    'confidence': float
+}
+# Smallest accepted value of the numeric options; confidence must lie strictly
+# between 0 and 1
+JOB_OPTION_MINIMUMS = {
+    'top_k': 1,
+    'max_evaluations': 1,
+    'workers': 1,
+    'chunk_size': 1,
+    'lineup_size': 1,
+    'refine_games': 0
+}
+TERMINAL_EVENTS = ('done', 'cancelled', 'failed')
+MAX_BODY_BYTES = 1024 * 1024
+KEEPALIVE_SECONDS = 15.0
+# Parallel deep jobs report progress as ranges complete, so a server default
+# smaller than LineupOptimizer's keeps the top-k stream moving
+JOB_CHUNK_SIZE = 1000
+REASONS = {200: 'OK', 202: 'Accepted', 204: 'No Content', 400: 'Bad Request', 403: 'Forbidden', 404: 'Not Found',
+           405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 429: 'Too Many Requests'}
+
+class JobError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+def job_options(request: Dict, deep_workers: int) -> Dict:
+    # The optimizer keyword arguments of a job request, type- and range-checked
+    options = {'mode': 'deep'}
+    for name, kind in JOB_OPTIONS.items():
+        if request.get(name) is None:
+            continue
+        value = request[name]
+        if kind is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise JobError(400, f"{name} must be {kind.__name__}")
+        if name in JOB_OPTION_MINIMUMS and value < JOB_OPTION_MINIMUMS[name]:
+            raise JobError(400, f"{name} must be at least {JOB_OPTION_MINIMUMS[name]}")
+        options[name] = value
+    if options['mode'] not in JOB_MODES:
+        raise JobError(400, f"Unknown mode: {options['mode']}")
+    if options.get('engine', 'monte_carlo') not in JOB_ENGINES:
+        raise JobError(400, f"Unknown engine: {options['engine']}")
+    if not 0 < options.get('confidence', 0.95) < 1:
+        raise JobError(400, "confidence must be between 0 and 1")
+    # Deep mode defaults to the server's worker count, and never exceeds it
+    options['workers'] = max(1, min(options.get('workers', deep_workers), deep_workers))
+    options.setdefault('chunk_size', JOB_CHUNK_SIZE)
+    return options
+
+def run_job(job_id: int, options: Dict, roster: Dict, events, cancel_event, progress_interval: float) -> Optional[Dict]:
+    # Runs in a pool process; None means the job was cancelled before it started
+    if cancel_event.is_set():
+        return None
+    players = bo.parse_roster(roster)
+    optimizer = None
+    
+    def publish(progress: float):
+        # Cancellation is checked here rather than handed to the optimizer,
+        # since every is_set() on a manager Event is a round trip
+        if cancel_event.is_set():
+            optimizer.running = False
+        snapshot = optimizer.telemetry.snapshot
+        events.put((job_id, 'progress', dict(snapshot, top_lineups=[
+            {'rank': rank, 'lineup': lineup, 'avg_runs': avg_runs}
+            for rank, (lineup, avg_runs) in enumerate(snapshot['top_lineups'], 1)])))
+    
+    optimizer = bo.LineupOptimizer(players, progress_callback=publish, progress_interval=progress_interval, **options)
+    events.put((job_id, 'started', {'pid': os.getpid()}))
+    started = time.monotonic()
+    results = optimizer.optimize()
+    return bo.results_report(optimizer, results, time.monotonic() - started)
+
+class Job:
+    def __init__(self, job_id: int, options: Dict, cancel_event):
+        self.id = job_id
+        self.options = options
+        self.cancel_event = cancel_event
+        self.status = 'queued'
+        self.created = time.time()
+        self.progress = None
+        self.report = None
+        self.error = None
+        self.future = None
+        # asyncio.Queue per open event stream
+        self.subscribers = []
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_EVENTS
+    
+    def final_payload(self) -> Dict:
+        # Data of the terminal event, the same for live and late subscribers
+        if self.status == 'failed':
+            return {'error': self.error}
+        return self.report or {'completed': False, 'results': []}
+    
+    def describe(self) -> Dict:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'options': self.options,
+            'created': self.created,
+            'progress': self.progress,
+            'report': self.report,
+            'error': self.error
+        }
+
+class JobServer:
+    def __init__(self, host='127.0.0.1', port=8765, max_jobs=1, progress_interval=0.25, deep_workers=None,
+                 allowed_origins=('null',), max_queued=16, job_ttl=3600.0):
+        self.host = host
+        self.requested_port = port
+        self.max_jobs = max_jobs
+        self.allowed_origins = set(allowed_origins)
+        self.max_queued = max_queued
+        self.job_ttl = job_ttl
+        self.progress_interval = progress_interval
+        self.deep_workers = deep_workers or os.cpu_count() or 1
+        self.jobs = {}
+        self.job_ids = itertools.count(1)
+        self.server = None
+        self.pool = None
+        self.manager = None
+        self.events = None
+        self.relay = None
+        self.loop = None
+    
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+    
+    async def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.manager = multiprocessing.Manager()
+        self.events = self.manager.Queue()
+        self.pool = ProcessPoolExecutor(max_workers=self.max_jobs)
+        self.relay = asyncio.create_task(self.relay_events())
+        self.server = await asyncio.start_server(self.handle_connection, self.host, self.requested_port)
+    
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+    
+    async def close(self):
+        self.server.close()
+        await self.server.wait_closed()
+        for job in self.jobs.values():
+            if not job.finished:
+                job.cancel_event.set()
+        await self.loop.run_in_executor(None, self.pool.shutdown, True)
+        self.events.put(None)
+        await self.relay
+        self.manager.shutdown()
+    
+    async def relay_events(self):
+        # Moves worker events from the manager queue onto the loop; None stops it
+        while True:
+            item = await self.loop.run_in_executor(None, self.events.get)
+            if item is None:
+                return
+            job_id, event, data = item
+            job = self.jobs.get(job_id)
+            # Anything still queued behind a job's terminal event is stale
+            if job is None or job.finished:
+                continue
+            if event == 'started':
+                job.status = 'running'
+            elif event == 'progress':
+                job.progress = data
+            self.broadcast(job, event, data)
+    
+    def broadcast(self, job: Job, event: str, data: Dict):
+        for subscriber in job.subscribers:
+            subscriber.put_nowait((event, data))
+    
+    def submit(self, request: Dict) -> Job:
+        if not isinstance(request.get('roster'), dict) or not request['roster']:
+            raise JobError(400, "roster must be a non-empty object")
+        options = job_options(request, self.deep_workers)
+        try:
+            players = bo.parse_roster(request['roster'])
+        except (TypeError, ValueError, KeyError, IndexError) as e:
+            raise JobError(400, f"Invalid roster: {e}")
+        if options.get('lineup_size', 1) > len(players):
+            raise JobError(400, f"lineup_size must be at most the roster's {len(players)} players")
+        if sum(job.status == 'queued' for job in self.jobs.values()) >= self.max_queued:
+            raise JobError(429, f"{self.max_queued} jobs are already waiting")
+        job = Job(next(self.job_ids), options, self.manager.Event())
+        self.jobs[job.id] = job
+        job.future = self.pool.submit(run_job, job.id, options, request['roster'], self.events,
+                                      job.cancel_event, self.progress_interval)
+        job.future.add_done_callback(lambda future: self.loop.call_soon_threadsafe(self.finish, job))
+        return job
+    
+    def finish(self, job: Job):
+        try:
+            job.report = job.future.result()
+            job.status = 'cancelled' if job.report is None or not job.report['completed'] else 'done'
+        except CancelledError:
+            job.status = 'cancelled'
+        except Exception as e:
+            job.status = 'failed'
+            job.error = f"{type(e).__name__}: {e}"
+        self.broadcast(job, job.status, job.final_payload())
+        self.loop.call_later(self.job_ttl, self.jobs.pop, job.id, None)
+    
+    def cancel(self, job: Job):
+        if job.finished:
+            return
+        job.cancel_event.set()
+        # Only still-queued jobs can be dropped outright; running ones stop at
+        # their next progress report
+        job.future.cancel()
+    
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # origin is the caller's Origin header once it has been allowed; responses
+        # only carry CORS headers for an allowed origin
+        origin = None
+        try:
+            method, path, headers, body = await self.read_request(reader)
+            if 'origin' in headers:
+                if headers['origin'] not in self.allowed_origins and '*' not in self.allowed_origins:
+                    raise JobError(403, f"Origin {headers['origin']} is not allowed")
+                origin = headers['origin']
+            response = await self.route(method, path, body, writer, origin)
+            if response is not None:
+                await self.respond(writer, *response, origin=origin)
+        except JobError as e:
+            await self.respond(writer, e.status, {'error': str(e)}, origin=origin)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) != 3:
+            raise JobError(400, "Malformed request line")
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        length = int(headers.get('content-length', 0) or 0)
+        if length > MAX_BODY_BYTES:
+            raise JobError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b''
+        return request_line[0].upper(), request_line[1].split('?', 1)[0].rstrip('/') or '/', headers, body
+    
+    async def route(self, method: str, path: str, body: bytes, writer: asyncio.StreamWriter,
+                    origin: Optional[str]) -> Optional[Tuple[int, Optional[Dict]]]:
+        # The (status, payload) to respond with, or None once an event stream ends
+        parts = path.strip('/').split('/')
+        if method == 'OPTIONS':
+            return 204, None
+        elif path == '/health':
+            return 200, {'status': 'ok', 'jobs': len(self.jobs), 'max_jobs': self.max_jobs,
+                         'deep_workers': self.deep_workers}
+        elif path == '/jobs' and method == 'GET':
+            return 200, {'jobs': [job.describe() for job in self.jobs.values()]}
+        elif path == '/jobs' and method == 'POST':
+            try:
+                request = json.loads(body or b'{}')
+            except ValueError:
+                raise JobError(400, "Body must be JSON")
+            if not isinstance(request, dict):
+                raise JobError(400, "Body must be a JSON object")
+            job = self.submit(request)
+            return 202, {'id': job.id, 'status': job.status, 'options': job.options}
+        elif parts[0] == 'jobs' and len(parts) in (2, 3):
+            job = self.find_job(parts[1])
+            if len(parts) == 3 and parts[2] == 'events' and method == 'GET':
+                await self.stream_events(job, writer, origin)
+                return None
+            elif len(parts) == 2 and method == 'GET':
+                return 200, job.describe()
+            elif len(parts) == 2 and method == 'DELETE':
+                self.cancel(job)
+                return 200, {'id': job.id, 'status': job.status}
+            else:
+                raise JobError(405, f"{method} not allowed on {path}")
+        else:
+            raise JobError(404, f"No route for {method} {path}")
+    
+    def find_job(self, job_id: str) -> Job:
+        job = self.jobs.get(int(job_id)) if job_id.isdigit() else None
+        if job is None:
+            raise JobError(404, f"No job {job_id}")
+        return job
+    
+    async def stream_events(self, job: Job, writer: asyncio.StreamWriter, origin: Optional[str]):
+        writer.write(self.head(200, origin, 'text/event-stream', ['Cache-Control: no-cache']))
+        # The current state first, so late subscribers start from where the job is
+        if job.finished:
+            await self.send_event(writer, job.status, job.final_payload())
+            return
+        await self.send_event(writer, job.status if job.status == 'queued' else 'started', {'id': job.id})
+        if job.progress is not None:
+            await self.send_event(writer, 'progress', job.progress)
+        subscriber = asyncio.Queue()
+        job.subscribers.append(subscriber)
+        try:
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(subscriber.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                    await writer.drain()
+                    continue
+                await self.send_event(writer, event, data)
+                if event in TERMINAL_EVENTS:
+                    return
+        finally:
+            job.subscribers.remove(subscriber)
+    
+    async def send_event(self, writer: asyncio.StreamWriter, event: str, data: Dict):
+        writer.write(f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n".encode())
+        await writer.drain()
+    
+    def head(self, status: int, origin: Optional[str] = None, content_type: Optional[str] = None,
+             extra: Optional[List[str]] = None) -> bytes:
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}"]
+        if origin is not None:
+            lines.extend([f"Access-Control-Allow-Origin: {origin}",
+                          "Access-Control-Allow-Methods: GET, POST, DELETE, OPTIONS",
+                          "Access-Control-Allow-Headers: Content-Type",
+                          "Vary: Origin"])
+        lines.append("Connection: close")
+        if content_type:
+            lines.append(f"Content-Type: {content_type}")
+        lines.extend(extra or [])
+        return ("\r\n".join(lines) + "\r\n\r\n").encode()
+    
+    async def respond(self, writer: asyncio.StreamWriter, status: int, payload: Optional[Dict] = None,
+                      origin: Optional[str] = None):
+        body = json.dumps(payload, default=str).encode() if payload is not None else b''
+        writer.write(self.head(status, origin, 'application/json' if payload is not None else None,
+                               [f"Content-Length: {len(body)}"]) + body)
+        await writer.drain()
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Serve lineup optimization jobs over local HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--jobs", type=int, default=1, help="how many jobs run at once; the rest wait in a queue")
+    parser.add_argument("--deep-workers", type=int, default=os.cpu_count(),
+                        help="worker processes per deep job (the most a job may ask for)")
+    parser.add_argument("--allow-origin", action="append", dest="allowed_origins",
+                        help="page origin allowed to call the server (repeatable; default null, for index.html "
+                             "opened as a file)")
+    parser.add_argument("--max-queued", type=int, default=16,
+                        help="jobs that may wait at once before new ones are refused")
+    parser.add_argument("--job-ttl", type=float, default=3600.0, help="seconds a finished job's results are kept")
+    args = parser.parse_args(argv)
+    
+    server = JobServer(args.host, args.port, max_jobs=args.jobs, deep_workers=args.deep_workers,
+                       allowed_origins=args.allowed_origins or ('null',), max_queued=args.max_queued,
+                       job_ttl=args.job_ttl)
+    print(f"Serving lineup optimization jobs on http://{args.host}:{args.port}", file=sys.stderr)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
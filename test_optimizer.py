@@ -1,5 +1,15 @@
 import baseball_optimizer as bo
 import random
+import itertools
+import os
+import json
+import pickle
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
 
 def test_player_manager():
     print("Testing Player Manager...")
@@ -49,9 +59,1064 @@ def test_quick_optimization():
     
     print("Quick Optimization test complete!")
 
+def test_exact_simulator():
+    print("\nTesting Exact Simulator...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    exact = bo.ExactSimulator(manager.players)
+    simulator = bo.BaseballSimulator(manager.players)
+    
+    lineup = list(manager.players.keys())
+    result = exact.evaluate(lineup)
+    print(f"Exact expected runs: {result['avg_runs']:.3f}")
+    assert abs(sum(result['run_distribution']) - 1) < 1e-9
+    
+    # Monte Carlo should agree with the exact value within sampling error
+    random.seed(7)
+    games = 5000
+    mc_runs = sum(simulator.simulate_game(lineup)['runs'] for _ in range(games)) / games
+    print(f"Monte Carlo average over {games} games: {mc_runs:.3f}")
+    assert abs(mc_runs - result['avg_runs']) < 0.2
+    
+    optimizer = bo.LineupOptimizer(manager.players, mode='quick', engine='exact')
+    assert optimizer.evaluate_lineup(lineup, 100) == result['avg_runs']
+    print("Exact Simulator test complete!")
+
+def test_batch_simulator():
+    print("\nTesting Batch Simulator...")
+    if bo.np is None:
+        print("numpy not installed - skipping batch simulator test")
+        return
+    manager = bo.PlayerManager(bo.playerDictionary)
+    simulator = bo.BaseballSimulator(manager.players)
+    exact = bo.ExactSimulator(manager.players)
+    
+    for lineup in (list(manager.players.keys()), list(manager.players.keys())[:4]):
+        result = simulator.simulate_games(lineup, 20000, bo.np.random.default_rng(3))
+        assert result['inning_runs'].shape == (20000, 6)
+        assert (result['inning_runs'].sum(axis=1) == result['runs']).all()
+        
+        expected = exact.expected_runs(lineup)
+        print(f"{len(lineup)} batters - batch average: {result['runs'].mean():.3f}, exact: {expected:.3f}")
+        assert abs(result['runs'].mean() - expected) < 0.1
+    
+    # Batch games feed the same metrics as single games
+    metrics = simulator.metrics.get_game_metrics()
+    assert simulator.metrics.games_played == 40000
+    assert sum(simulator.metrics.inning_histograms[0]) == 40000
+    print(f"Tracked five-run inning rate: {metrics['five_run_inning_pct']*100:.1f}%")
+    print("Batch Simulator test complete!")
+
+def test_parallel_deep_optimization():
+    print("\nTesting Parallel Deep Optimization...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    
+    # Ranks follow itertools.permutations order
+    names = list(players.keys())
+    assert [bo.unrank_permutation(names, rank) for rank in range(120)] == \
+        [list(lineup) for lineup in itertools.permutations(names)]
+    assert list(bo.permutations_from_rank(names, 37, 45)) == \
+        [list(lineup) for lineup in itertools.permutations(names)][37:45]
+    
+    serial = bo.LineupOptimizer(players, mode='deep', engine='exact').optimize()
+    parallel = bo.LineupOptimizer(players, mode='deep', engine='exact', workers=2, chunk_size=7).optimize()
+    for (lineup, avg_runs), (serial_lineup, serial_runs) in zip(parallel, serial):
+        print(f"Average Runs: {avg_runs:.3f} - {' -> '.join(lineup)}")
+        assert abs(avg_runs - serial_runs) < 1e-12
+    assert parallel[0][0] == serial[0][0]
+    print("Parallel Deep Optimization test complete!")
+
+def test_bounded_top_k():
+    print("\nTesting Bounded Top-K...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob"]}
+    
+    exact = bo.ExactSimulator(players)
+    all_scores = sorted((exact.expected_runs(list(lineup)) for lineup in itertools.permutations(players)),
+                        reverse=True)
+    
+    for top_k in (1, 5):
+        results = bo.LineupOptimizer(players, mode='deep', engine='exact', top_k=top_k).optimize()
+        assert len(results) == top_k
+        assert [avg_runs for _, avg_runs in results] == all_scores[:top_k]
+    
+    quick = bo.LineupOptimizer(players, mode='quick', engine='exact', top_k=2).optimize()
+    assert len(quick) == 2 and quick[0][1] >= quick[1][1]
+    
+    for top_k in (0, -1):
+        try:
+            bo.LineupOptimizer(players, mode='deep', engine='exact', top_k=top_k)
+            assert False, "top_k below 1 should be rejected"
+        except ValueError:
+            pass
+    try:
+        bo.cli(["--roster", "-", "--top-k", "0"])
+        assert False, "--top-k below 1 should be rejected"
+    except SystemExit as e:
+        assert e.code == 2
+    print("Bounded Top-K test complete!")
+
+def test_checkpoint_resume():
+    print("\nTesting Checkpoint Resume...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    expected = bo.LineupOptimizer(players, mode='deep', engine='exact').optimize()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "deep.checkpoint")
+        
+        def stop_early(progress):
+            if progress >= 25:
+                interrupted.running = False
+        
+        interrupted = bo.LineupOptimizer(players, mode='deep', engine='exact', progress_callback=stop_early,
+                                         progress_every=1, checkpoint_path=path, checkpoint_interval=0)
+        interrupted.optimize()
+        with open(path, 'rb') as f:
+            checkpoint = pickle.load(f)
+        print(f"Checkpoint written at {checkpoint['progress']:.1f}% (next rank {checkpoint['next_rank']})")
+        assert checkpoint['next_rank'] == 30
+        
+        evaluated = []
+        resumed = bo.LineupOptimizer(players, mode='deep', engine='exact', progress_callback=evaluated.append,
+                                     progress_every=1, checkpoint_path=path, resume=True)
+        results = resumed.optimize()
+        assert len(evaluated) == 90
+        assert results == expected
+        
+        # The interactive analysis leaves a finished checkpoint alone unless asked
+        # to resume, and removes it once its own deep run completes
+        parallel = bo.ParallelOptimizer(players, checkpoint_path=path, cache_path=None, seed=5)
+        assert parallel.saved_deep_progress() == 100
+        parallel.run_deep_analysis()
+        assert parallel.snapshot('deep')['lineups'] == 120
+        assert not os.path.exists(path) and parallel.saved_deep_progress() is None
+    
+    # Without a seed, the quick and deep analyses still share one drawn up front
+    parallel = bo.ParallelOptimizer(players, checkpoint_path=None, cache_path=None)
+    parallel.run_quick_analysis()
+    parallel.run_deep_analysis()
+    assert parallel.seed is not None
+    assert parallel.optimizers['quick'].seed == parallel.optimizers['deep'].seed == parallel.seed
+    print("Checkpoint Resume test complete!")
+
+def test_racing_optimization():
+    print("\nTesting Racing Optimization...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    
+    # Exact scores have no spread, so everything below the top-k is dropped after one round
+    expected = bo.LineupOptimizer(players, mode='deep', engine='exact').optimize()
+    exact = bo.LineupOptimizer(players, mode='racing', engine='exact')
+    assert exact.optimize() == expected
+    assert exact.search_stats['rounds'] == 2
+    
+    random.seed(11)
+    optimizer = bo.LineupOptimizer(players, mode='racing')
+    results = optimizer.optimize()
+    stats = optimizer.search_stats
+    print(f"Racing played {stats['games_played']} of {stats['fixed_budget_games']} games "
+          f"({stats['games_saved']} saved, {stats['survivors']} survivors)")
+    assert len(results) == 3
+    assert stats['games_played'] < stats['fixed_budget_games']
+    
+    # Cancelled before its first lineup is scored, the race returns no lineups
+    class CancelledAfterStart(threading.Event):
+        checks = 0
+        
+        def is_set(self):
+            self.checks += 1
+            return self.checks > 1
+    
+    cancelled = bo.LineupOptimizer(players, mode='racing', cancel_event=CancelledAfterStart())
+    assert cancelled.optimize() == []
+    assert cancelled.search_stats['games_played'] == 0
+    print("Racing Optimization test complete!")
+
+def test_common_random_numbers():
+    print("\nTesting Common Random Numbers...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    lineup = list(manager.players.keys())
+    
+    first = bo.LineupOptimizer(manager.players, common_random_numbers=True, seed=42)
+    second = bo.LineupOptimizer(manager.players, common_random_numbers=True, seed=42)
+    score = first.evaluate_lineup(lineup, 50)
+    print(f"Seeded score: {score:.2f}")
+    assert score == second.evaluate_lineup(lineup, 50)
+    assert score == first.evaluate_lineup(lineup, 50)
+    
+    # Game i always sees stream i, however the games are split up
+    totals = first.run_totals(lineup, 20)
+    split = [a + b for a, b in zip(first.run_totals(lineup, 12), first.run_totals(lineup, 8, first_game=12))]
+    assert list(totals) == split
+    
+    if bo.np is not None:
+        batch = bo.LineupOptimizer(manager.players, engine='batch', common_random_numbers=True, seed=42)
+        assert batch.evaluate_lineup(lineup, 50) == score
+    print("Common Random Numbers test complete!")
+
+def test_collapse_duplicate_players():
+    print("\nTesting Duplicate Player Collapse...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Calvin", "Ty", "Bob", "Joe"]}
+    
+    values = [0, 0, 1, 2, 2]
+    arrangements = sorted(set(itertools.permutations(values)))
+    assert bo.multiset_permutation_count(values) == len(arrangements) == 30
+    assert [tuple(bo.unrank_multiset_permutation(values, rank)) for rank in range(30)] == arrangements
+    assert [tuple(a) for a in bo.multiset_permutations_from_rank(values, 4, 30)] == arrangements[4:]
+    
+    # Jeremiah and Calvin share stats, so only half of the 5! orders are distinct
+    collapsed = bo.LineupOptimizer(players, mode='deep', engine='exact', top_k=1)
+    full = bo.LineupOptimizer(players, mode='deep', engine='exact', top_k=1, collapse_duplicates=False)
+    best = collapsed.optimize()
+    print(f"Reduced space: {collapsed.search_stats['lineup_space']} of {collapsed.search_stats['full_space']}")
+    assert collapsed.search_stats['lineup_space'] == 60
+    assert collapsed.search_stats['duplicate_groups'] == [["Jeremiah", "Calvin"]]
+    assert sorted(best[0][0]) == sorted(players)
+    assert best[0][1] == full.optimize()[0][1]
+    print("Duplicate Player Collapse test complete!")
+
+def test_metaheuristic_search():
+    print("\nTesting Metaheuristic Search...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    
+    for mode in ('anneal', 'genetic', 'local'):
+        random.seed(5)
+        optimizer = bo.LineupOptimizer(players, mode=mode, engine='exact', max_evaluations=40, population_size=10)
+        results = optimizer.optimize()
+        trace = optimizer.search_stats['trace']
+        print(f"{mode}: best {results[0][1]:.3f} after {optimizer.search_stats['evaluations']} evaluations")
+        assert optimizer.search_stats['evaluations'] == 40
+        assert len(results) == 3 and sorted(results[0][0]) == sorted(players)
+        assert [score for _, score in trace] == sorted(score for _, score in trace)
+        assert trace[-1][1] == results[0][1]
+    
+    # With fewer lineups (120) than the default budget, each mode stops once it
+    # has scored them all, without needing the stall guard
+    best = bo.LineupOptimizer(players, mode='deep', engine='exact', top_k=1).optimize()[0]
+    stall_limit = bo.SearchBudget.STALL_LIMIT
+    bo.SearchBudget.STALL_LIMIT = float('inf')
+    try:
+        for mode in ('anneal', 'genetic', 'local'):
+            optimizer = bo.LineupOptimizer(players, mode=mode, engine='exact', seed=3)
+            results = optimizer.optimize()
+            assert optimizer.search_stats['evaluations'] == 120 and results[0] == best
+    finally:
+        bo.SearchBudget.STALL_LIMIT = stall_limit
+    
+    child = bo._order_crossover(list("ABCDEFG"), list("GFEDCBA"))
+    assert sorted(child) == list("ABCDEFG")
+    print("Metaheuristic Search test complete!")
+
+def test_branch_and_bound():
+    print("\nTesting Branch and Bound...")
+    if bo.np is None:
+        print("numpy not installed, skipping")
+        return
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob"]}
+    exact = bo.ExactSimulator(players)
+    lineup = list(players)
+    assert abs(exact.upper_bound(lineup, []) - exact.expected_runs(lineup)) < 1e-9
+    for pool_size in (2, 3):
+        bound = exact.upper_bound(lineup[:-pool_size] + [None] * pool_size, lineup[-pool_size:])
+        completions = itertools.permutations(lineup[-pool_size:])
+        assert bound >= max(exact.expected_runs(lineup[:-pool_size] + list(rest)) for rest in completions) - 1e-9
+    
+    # Short lineups are searched exhaustively; bounded anyway, the pruned search
+    # still finds the same best lineup
+    expected = bo.LineupOptimizer(players, mode='deep', engine='exact', top_k=1).optimize()
+    optimizer = bo.LineupOptimizer(players, mode='branch_and_bound', top_k=1)
+    assert optimizer.optimize() == expected and optimizer.search_stats['nodes_bounded'] == 0
+    min_lineup = bo.BOUND_MIN_LINEUP
+    bo.BOUND_MIN_LINEUP = 1
+    try:
+        optimizer = bo.LineupOptimizer(players, mode='branch_and_bound', top_k=1)
+        results = optimizer.optimize()
+    finally:
+        bo.BOUND_MIN_LINEUP = min_lineup
+    stats = optimizer.search_stats
+    assert results == expected
+    assert stats['lineups_evaluated'] + stats['lineups_pruned'] == stats['lineup_space']
+    assert stats['lineups_pruned'] > 0
+    
+    # On the full default roster, pruning covers lineups faster than scoring them
+    # one by one
+    full = manager.players
+    names = list(full)
+    exact = bo.ExactSimulator(full)
+    exact.expected_runs(names)
+    started = time.perf_counter()
+    for shift in range(20):
+        exact.expected_runs(names[shift % len(names):] + names[:shift % len(names)])
+    exhaustive_rate = 20 / (time.perf_counter() - started)
+    
+    def stop_after(progress):
+        if time.perf_counter() - started > 8:
+            optimizer.running = False
+    
+    optimizer = bo.LineupOptimizer(full, mode='branch_and_bound', progress_callback=stop_after)
+    started = time.perf_counter()
+    optimizer.optimize()
+    stats = optimizer.search_stats
+    covered_rate = (stats['lineups_evaluated'] + stats['lineups_pruned']) / (time.perf_counter() - started)
+    print(f"Evaluated {stats['lineups_evaluated']} lineups, pruned {stats['lineups_pruned']} "
+          f"({covered_rate:.0f} covered/s vs {exhaustive_rate:.0f} scored/s)")
+    assert stats['lineups_pruned'] > 0 and covered_rate > 1.5 * exhaustive_rate
+    print("Branch and Bound test complete!")
+
+def test_compiled_lineup():
+    print("\nTesting Compiled Lineup...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    simulator = bo.BaseballSimulator(manager.players)
+    lineup = list(manager.players.keys())
+    compiled = simulator.compile_lineup(lineup)
+    assert not hasattr(compiled, '__dict__')
+    assert compiled.hit_thresholds[0] == (.6, .6 + .3, .6 + .3 + .1, .6 + .3 + .1 + 0)
+    
+    # Reusing the compiled lineup plays the same games for a given seed
+    random.seed(11)
+    expected = [simulator.simulate_game(lineup) for _ in range(200)]
+    random.seed(11)
+    assert [simulator.simulate_game(compiled) for _ in range(200)] == expected
+    
+    # Short lineups bring batters up while they're still on base
+    short = ["Jeremiah", "Bob", "Harrison"]
+    random.seed(12)
+    games = 5000
+    compiled = simulator.compile_lineup(short)
+    mc_runs = sum(simulator.simulate_game(compiled)['runs'] for _ in range(games)) / games
+    expected_runs = bo.ExactSimulator(manager.players).expected_runs(short)
+    print(f"{len(short)} batters - compiled average: {mc_runs:.3f}, exact: {expected_runs:.3f}")
+    assert abs(mc_runs - expected_runs) < 0.2
+    print("Compiled Lineup test complete!")
+
+def test_streaming_metrics():
+    print("\nTesting Streaming Metrics...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    simulator = bo.BaseballSimulator(manager.players)
+    lineup = simulator.compile_lineup(list(manager.players.keys()))
+    
+    random.seed(13)
+    results = [simulator.simulate_game(lineup) for _ in range(500)]
+    metrics = simulator.metrics.get_game_metrics()
+    runs = [result['runs'] for result in results]
+    mean = sum(runs) / len(runs)
+    assert metrics['avg_runs'] == mean
+    assert abs(metrics['runs_std'] - (sum((r - mean) ** 2 for r in runs) / (len(runs) - 1)) ** 0.5) < 1e-9
+    assert metrics['max_runs'] == max(runs)
+    first_inning = [result['inning_stats'][0]['runs'] for result in results]
+    assert abs(metrics['runs_by_inning'][0]['avg'] - sum(first_inning) / len(first_inning)) < 1e-12
+    assert metrics['runs_by_inning'][0]['max'] == max(first_inning)
+    assert metrics['runs_by_inning'][0]['zero_run_pct'] == first_inning.count(0) / len(first_inning)
+    
+    # Trackers filled separately merge into the same totals
+    first, second = bo.MetricsTracker(), bo.MetricsTracker()
+    for index, result in enumerate(results):
+        (first if index < 200 else second).update_game_metrics(result)
+    merged = first.merge(second).get_game_metrics()
+    assert merged['avg_runs'] == metrics['avg_runs']
+    assert abs(merged['runs_std'] - metrics['runs_std']) < 1e-9
+    assert merged['runs_by_inning'] == metrics['runs_by_inning']
+    
+    # Optimizers leave metrics off unless asked
+    assert bo.LineupOptimizer(manager.players).simulator.metrics is None
+    assert bo.LineupOptimizer(manager.players, track_metrics=True).simulator.metrics is not None
+    print("Streaming Metrics test complete!")
+
+def test_evaluation_cache():
+    print("\nTesting Evaluation Cache...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    lineup = list(manager.players.keys())
+    
+    # Cached entries are topped up with further common-random-number games
+    cache = bo.EvaluationCache()
+    cached = bo.LineupOptimizer(manager.players, common_random_numbers=True, seed=4, cache=cache)
+    uncached = bo.LineupOptimizer(manager.players, common_random_numbers=True, seed=4)
+    assert cached.evaluate_lineup(lineup, 10) == uncached.evaluate_lineup(lineup, 10)
+    assert cached.evaluate_lineup(lineup, 30) == uncached.evaluate_lineup(lineup, 30)
+    assert cached.evaluate_lineup(lineup, 5) == uncached.evaluate_lineup(lineup, 30)
+    assert cache.get(cached.evaluation_key(lineup))[0] == 30
+    
+    # Changing a player's stats changes the keys of lineups they're in
+    changed = dict(manager.players)
+    changed["Ty"] = bo.Player("Ty", 0.5, [0.9, 0.1, 0, 0])
+    other = bo.LineupOptimizer(changed, common_random_numbers=True, seed=4, cache=cache)
+    assert other.evaluation_key(lineup) != cached.evaluation_key(lineup)
+    assert other.evaluation_key(lineup[:2]) == cached.evaluation_key(lineup[:2])
+    
+    # Least recently used entries spill to the backing file and survive a restart
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "evaluations.cache")
+        disk_cache = bo.EvaluationCache(max_entries=2, path=path)
+        for index in range(3):
+            disk_cache.put(bytes([index]), (index + 1, float(index), float(index)))
+        assert len(disk_cache) == 2 and bytes([0]) not in disk_cache.entries
+        assert disk_cache.get(bytes([0])) == (1, 0.0, 0.0)
+        disk_cache.close()
+        
+        reopened = bo.EvaluationCache(path=path)
+        assert reopened.get(bytes([2])) == (3, 2.0, 2.0)
+        reopened.close()
+        
+        # Evictions are committed a batch at a time, and read from memory until then
+        batched = bo.EvaluationCache(max_entries=1, path=os.path.join(directory, "batched.cache"))
+        batched.EVICTION_BATCH = 3
+        rows = lambda: batched.db.execute("SELECT COUNT(*) FROM evaluations").fetchone()[0]
+        for index in range(3):
+            batched.put(bytes([10 + index]), (1, 0.0, 0.0))
+        assert len(batched.evicted) == 2 and rows() == 0
+        assert batched.get(bytes([10])) == (1, 0.0, 0.0)
+        batched.put(bytes([20]), (1, 0.0, 0.0))
+        assert not batched.evicted and rows() == 3
+        batched.close()
+    
+    assert bo.EvaluationCache(max_bytes=10 * bo.EvaluationCache.ENTRY_BYTES).max_entries == 10
+    print("Evaluation Cache test complete!")
+
+def test_incremental_optimization():
+    print("\nTesting Incremental Optimization...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    names = ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]
+    players = {name: manager.players[name] for name in names}
+    previous = bo.LineupOptimizer(players, mode='deep', engine='exact').optimize()
+    
+    # Harrison turns into the best hitter on the team
+    updated = dict(players)
+    updated["Harrison"] = bo.Player("Harrison", 0.95, [0.2, 0.3, 0.2, 0.3])
+    expected = bo.LineupOptimizer(updated, mode='deep', engine='exact').optimize()
+    
+    optimizer = bo.LineupOptimizer(updated, mode='incremental', engine='exact', previous_results=previous,
+                                   changed_player="Harrison", max_evaluations=60)
+    results = optimizer.optimize()
+    stats = optimizer.search_stats
+    print(f"Best after {stats['evaluations']} evaluations: {results[0][1]:.3f} "
+          f"(exhaustive {expected[0][1]:.3f}), Harrison best in slot {stats['best_slot']}")
+    assert stats['evaluations'] <= 60
+    assert results[0] == expected[0]
+    print("Incremental Optimization test complete!")
+
+def test_score_table():
+    print("\nTesting Score Table...")
+    if bo.np is None:
+        print("numpy not installed - skipping score table test")
+        return
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Calvin", "Ty", "Harrison", "Bob"]}
+    exact = bo.ExactSimulator(players)
+    scores = {lineup: exact.expected_runs(list(lineup)) for lineup in itertools.permutations(players)}
+    
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "deep.scores")
+        results = bo.LineupOptimizer(players, mode='deep', engine='exact', score_table_path=path).optimize()
+        table = bo.ScoreTable(path)
+        # Jeremiah and Calvin are interchangeable, so half the orders are stored
+        assert table.total_lineups == 60 and table.scored() == 60
+        for lineup, score in scores.items():
+            stored, games = table.lookup(list(lineup))
+            assert abs(stored - score) < 1e-5 and games == 0
+        assert [lineup for lineup, _, _ in table.query()] == [lineup for lineup, _ in results]
+        
+        def best(allowed):
+            return max(scores[lineup] for lineup in scores if allowed(lineup))
+        
+        top = table.query(fixed={4: "Bob"}, top_k=1)[0]
+        print(f"Best with Bob 4th: {' -> '.join(top[0])} ({top[1]:.3f})")
+        assert top[0][3] == "Bob" and abs(top[1] - best(lambda lineup: lineup[3] == "Bob")) < 1e-5
+        top = table.query(fixed={1: "Calvin"}, excluded={2: ["Jeremiah", "Ty"]}, top_k=1)[0]
+        assert top[0][0] == "Calvin" and top[0][1] not in ("Jeremiah", "Ty")
+        # With Calvin leading off, only Jeremiah's stats are left for his twin's spot
+        twins = ("Jeremiah", "Calvin")
+        assert abs(top[1] - best(lambda lineup: lineup[0] in twins and lineup[1] not in twins + ("Ty",))) < 1e-5
+        
+        # Every lineup returned honours the constraints, including ones further
+        # down the order and ones only a joint naming of the twins can meet
+        # (both twins in slots 1 and 3 with Calvin excluded from both)
+        for fixed, excluded in (({}, {2: ["Calvin"]}), ({}, {1: ["Calvin"], 3: ["Calvin"]}),
+                                ({5: "Ty"}, {2: ["Jeremiah", "Bob"]}), ({1: "Jeremiah"}, {4: ["Calvin"]})):
+            def allowed(lineup):
+                return (all(lineup[slot - 1] == name for slot, name in fixed.items()) and
+                        all(lineup[slot - 1] not in names for slot, names in excluded.items()))
+            found = table.query(fixed=fixed, excluded=excluded, top_k=60)
+            for lineup, score, _ in found:
+                assert allowed(lineup), (fixed, excluded, lineup)
+                assert abs(score - scores[tuple(lineup)]) < 1e-5
+            # One entry per twin-collapsed order that has a valid naming
+            expected = {tuple("twin" if name in twins else name for name in lineup)
+                        for lineup in scores if allowed(lineup)}
+            assert len(found) == len(expected)
+            assert abs(found[0][1] - best(allowed)) < 1e-5
+        
+        # Parallel shards fill in the same table
+        parallel_path = os.path.join(directory, "parallel.scores")
+        bo.LineupOptimizer(players, mode='deep', engine='exact', workers=2, chunk_size=7,
+                           score_table_path=parallel_path).optimize()
+        parallel = bo.ScoreTable(parallel_path)
+        assert (parallel.records['mean'] == table.records['mean']).all()
+    print("Score Table test complete!")
+
+def test_reproducible_streams():
+    print("\nTesting Reproducible Streams...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    
+    # The module-level generator has no say once a seed is given
+    random.seed(1)
+    serial = bo.LineupOptimizer(players, mode='deep', seed=8).optimize()
+    random.seed(2)
+    assert bo.LineupOptimizer(players, mode='deep', seed=8).optimize() == serial
+    for workers in (2, 3):
+        parallel = bo.LineupOptimizer(players, mode='deep', seed=8, workers=workers, chunk_size=11).optimize()
+        assert parallel == serial
+    assert bo.LineupOptimizer(players, mode='quick', seed=8).optimize() == \
+        bo.LineupOptimizer(players, mode='quick', seed=8).optimize()
+    print(f"Seed 8 best: {serial[0][1]:.2f} - {' -> '.join(serial[0][0])}")
+    
+    streams = bo.RandomStreams(8)
+    assert streams.child('games', 1).random() == streams.child('games', 1).random()
+    assert streams.child('games', 1).random() != streams.child('games', 2).random()
+    print("Reproducible Streams test complete!")
+
+def test_batch_cli():
+    print("\nTesting Batch CLI...")
+    # Importing the engine installs no handlers and loads no console modules
+    check = ("import signal, sys, baseball_optimizer; "
+             "assert signal.getsignal(signal.SIGINT) is signal.default_int_handler; "
+             "assert 'win32api' not in sys.modules and 'msvcrt' not in sys.modules")
+    subprocess.run([sys.executable, "-c", check], check=True, cwd=os.path.dirname(os.path.abspath(bo.__file__)))
+    
+    names = ["Jeremiah", "Ty", "Harrison", "Bob"]
+    with tempfile.TemporaryDirectory() as directory:
+        roster_path = os.path.join(directory, "roster.json")
+        output_path = os.path.join(directory, "results.json")
+        roster = {name: bo.playerDictionary[name] for name in names[:2]}
+        roster.update({name: {'hit_chance': bo.playerDictionary[name][1],
+                              'hit_probabilities': bo.playerDictionary[name][2]} for name in names[2:]})
+        with open(roster_path, 'w') as f:
+            json.dump(roster, f)
+        
+        assert bo.cli(["--roster", roster_path, "--mode", "deep", "--engine", "exact", "--top-k", "2",
+                       "--output", output_path]) == 0
+        with open(output_path) as f:
+            report = json.load(f)
+    
+    manager = bo.PlayerManager(bo.playerDictionary)
+    expected = bo.LineupOptimizer({name: manager.players[name] for name in names}, mode='deep',
+                                  engine='exact', top_k=2).optimize()
+    print(f"CLI best: {report['results'][0]['avg_runs']:.3f} - {' -> '.join(report['results'][0]['lineup'])}")
+    assert report['completed'] and report['mode'] == 'deep'
+    assert [(entry['lineup'], entry['avg_runs']) for entry in report['results']] == expected
+    assert report['search_stats']['lineup_space'] == 24
+    print("Batch CLI test complete!")
+
+def test_interrupt_handler():
+    print("\nTesting Interrupt Handler...")
+    if os.name == 'nt':
+        print("Ctrl+C goes through the console on Windows - skipping interrupt handler test")
+        return
+    # Ctrl+C during the interactive analysis stops both optimizers and the keyboard monitor
+    script = ("import baseball_optimizer as bo; bo.install_interrupt_handler(); "
+              "optimizer = bo.ParallelOptimizer(bo.PlayerManager(bo.playerDictionary).players, checkpoint_path=None); "
+              "optimizer.run_parallel_analysis(); assert not optimizer.keyboard_monitor.thread.is_alive(); "
+              "print('stopped' if optimizer.cancel_event.is_set() else 'finished')")
+    with tempfile.TemporaryDirectory() as directory:
+        env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(bo.__file__)))
+        process = subprocess.Popen([sys.executable, "-u", "-c", script], cwd=directory, env=env,
+                                   stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+        try:
+            for line in process.stdout:
+                if "Or close the terminal" in line:
+                    break
+            time.sleep(1)
+            process.send_signal(signal.SIGINT)
+            output, _ = process.communicate(timeout=60)
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+    assert process.returncode == 0
+    assert "Ctrl+C detected" in output
+    assert "stopped" in output.splitlines()
+    
+    # Once closed, the keyboard monitor leaves stdin to the prompts that follow
+    read_fd, write_fd = os.pipe()
+    stdin = sys.stdin
+    try:
+        with os.fdopen(read_fd) as pipe, os.fdopen(write_fd, 'w') as writer:
+            sys.stdin = pipe
+            monitor = bo.KeyboardMonitor()
+            monitor.start()
+            monitor.close()
+            assert not monitor.thread.is_alive()
+            writer.write("bova\n")
+            writer.flush()
+            assert pipe.readline() == "bova\n"
+            assert not monitor.stop_event.is_set()
+    finally:
+        sys.stdin = stdin
+    print("Interrupt Handler test complete!")
+
+def test_telemetry():
+    print("\nTesting Progress Telemetry...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    
+    # Callbacks come once per batch, not once per lineup
+    reported = []
+    optimizer = bo.LineupOptimizer(players, mode='deep', progress_callback=reported.append, progress_every=25)
+    results = optimizer.optimize()
+    snapshot = optimizer.telemetry.snapshot
+    print(f"{len(reported)} callbacks, {snapshot['lineups_per_second']:.0f} lineups/s, "
+          f"{snapshot['games_per_second']:.0f} games/s, best {snapshot['best_score']:.3f}")
+    assert len(reported) == 5 and reported[-1] == 100
+    assert snapshot['finished'] and snapshot['lineups'] == 120 and snapshot['games'] == 12000
+    assert snapshot['best_score'] == results[0][1]
+    
+    # Time-based batches publish far less often than every lineup
+    reported = []
+    bo.LineupOptimizer(players, mode='deep', progress_callback=reported.append, progress_interval=60).optimize()
+    assert reported == [100]
+    
+    # One shared event cancels every optimizer holding it
+    cancel_event = threading.Event()
+    first = bo.LineupOptimizer(players, mode='quick', cancel_event=cancel_event)
+    second = bo.LineupOptimizer(players, mode='deep', cancel_event=cancel_event)
+    first.running = False
+    assert not second.running and second.optimize() == []
+    assert second.telemetry.snapshot['lineups'] == 0
+    print("Progress Telemetry test complete!")
+
+def test_benchmark():
+    print("\nTesting Benchmark Suite...")
+    import benchmark
+    
+    roster = benchmark.benchmark_roster(15)
+    assert len(roster) == 15 and "Jeremiah 2" in roster
+    
+    metrics = benchmark.benchmark_simulator(sizes=(5,), games=200, repeats=1)
+    metrics.update(benchmark.benchmark_modes(modes=('quick', 'anneal'), roster_size=5, max_evaluations=50))
+    metrics.update(benchmark.benchmark_deep_memory(sizes=(9,), lineups=20))
+    print(json.dumps(metrics, indent=2))
+    assert all(value > 0 for value in metrics.values())
+    assert set(metrics) == {"simulate_game.games_per_second.roster_5", "optimizer.lineups_per_second.quick",
+                            "optimizer.lineups_per_second.anneal", "deep.peak_memory_bytes.roster_9"}
+    
+    # Slower rates and bigger memory beyond the tolerance are regressions; faster is not
+    baseline = {'metrics': {"rate": 100.0, "fast": 100.0, "deep.peak_memory_bytes": 1000}}
+    current = {'metrics': {"rate": 70.0, "fast": 150.0, "deep.peak_memory_bytes": 1300, "new": 1.0}}
+    regressions = benchmark.compare(current, baseline, tolerance=0.2)
+    assert [regression['metric'] for regression in regressions] == ["deep.peak_memory_bytes", "rate"]
+    assert benchmark.compare(current, baseline, tolerance=0.5) == []
+    print("Benchmark Suite test complete!")
+
+def test_confidence_intervals():
+    print("\nTesting Confidence Intervals...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    
+    # Every reported score carries the games, standard error and interval behind it
+    optimizer = bo.LineupOptimizer(players, mode='deep', seed=8)
+    results = optimizer.optimize()
+    intervals = optimizer.search_stats['intervals']
+    for (lineup, avg_runs), interval in zip(results, intervals):
+        print(f"{avg_runs:.2f} ± {interval['std_error']:.2f} - {' -> '.join(lineup)}")
+        assert interval['games'] == 100 and interval['mean'] == avg_runs
+        assert interval['ci_low'] < avg_runs < interval['ci_high'] and interval['std_error'] > 0
+    
+    # Refinement keeps simulating tied leaders until they separate or hit the budget
+    refined = bo.LineupOptimizer(players, mode='deep', seed=8, refine_games=800)
+    refined_results = refined.optimize()
+    stats = refined.search_stats
+    print(f"Stopped: {stats['stop_reason']} after {stats['refine_games_played']} extra games")
+    assert stats['stop_reason'] in ('separated', 'budget') and stats['refine_games_played'] > 0
+    assert [avg_runs for _, avg_runs in refined_results] == sorted((avg_runs for _, avg_runs in refined_results),
+                                                                   reverse=True)
+    assert [interval['mean'] for interval in stats['intervals']] == [avg_runs for _, avg_runs in refined_results]
+    assert all(100 <= interval['games'] <= 800 for interval in stats['intervals'])
+    if stats['stop_reason'] == 'budget':
+        assert max(interval['games'] for interval in stats['intervals']) == 800
+    
+    # Exact scores have no sampling error, and distinct ones are already separated
+    exact = bo.LineupOptimizer(players, mode='deep', engine='exact', refine_games=800)
+    exact_results = exact.optimize()
+    assert exact_results == bo.LineupOptimizer(players, mode='deep', engine='exact').optimize()
+    assert exact.search_stats['stop_reason'] == 'separated'
+    assert all(interval['std_error'] == 0 and interval['games'] == 1 for interval in exact.search_stats['intervals'])
+    print("Confidence Intervals test complete!")
+
+def test_subset_selection():
+    print("\nTesting Batting Subset Selection...")
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    
+    # Exact subset search finds the same top lineups as scoring every 3 of the 5 in every order
+    exact = bo.ExactSimulator(players)
+    scored = sorted(((exact.expected_runs(list(lineup)), list(lineup))
+                     for lineup in itertools.permutations(players, 3)), key=lambda entry: entry[0], reverse=True)
+    optimizer = bo.LineupOptimizer(players, mode='subset', engine='exact', lineup_size=3)
+    results = optimizer.optimize()
+    stats = optimizer.search_stats
+    for lineup, avg_runs in results:
+        print(f"{avg_runs:.3f} - {' -> '.join(lineup)}")
+    print(f"{stats['undominated_subsets']} of {stats['subsets']} subsets searched, {stats['lineups_evaluated']} lineups")
+    assert results == [(lineup, avg_runs) for avg_runs, lineup in scored[:3]]
+    assert stats['subsets'] == 10 and stats['undominated_subsets'] == 2
+    assert stats['lineups_evaluated'] == stats['lineup_space'] == 2 * 6
+    assert stats['dominated_by']['Harrison'] == ['Bob', 'Jeremiah', 'Joe', 'Ty']
+    assert stats['rotation_groups'] < stats['lineups_evaluated']
+    
+    # A home run doesn't move runners, so a home-run hitter doesn't dominate a triples hitter
+    # who hits as often, and the best three still come out when the triples hitter is needed
+    sluggers = {"A": bo.Player("A", 0.5, [0, 0, 0, 1]), "B": bo.Player("B", 0.5, [0, 0, 1, 0]),
+                "C": bo.Player("C", 0.9, [0.5, 0.5, 0, 0]), "D": bo.Player("D", 0.7, [1, 0, 0, 0])}
+    slugger_exact = bo.ExactSimulator(sluggers)
+    best = max(itertools.permutations(sluggers, 3), key=lambda lineup: slugger_exact.expected_runs(list(lineup)))
+    slugger_optimizer = bo.LineupOptimizer(sluggers, mode='subset', engine='exact', lineup_size=3, top_k=1)
+    assert slugger_optimizer.optimize() == [(list(best), slugger_exact.expected_runs(list(best)))]
+    assert set(best) == {"B", "C", "D"}
+    assert slugger_optimizer.search_stats['dominated_by'] == {"D": ["C"]}
+    
+    # Rotations of a lineup share their inning distributions but keep exact scores
+    for rotated, evaluation in exact.evaluate_rotations(["Bob", "Ty", "Joe", "Jeremiah"]):
+        assert evaluation['avg_runs'] == exact.expected_runs(rotated)
+    
+    # Monte Carlo scoring searches the same lineups
+    sampled = bo.LineupOptimizer(players, mode='subset', lineup_size=3, seed=2)
+    sampled_results = sampled.optimize()
+    assert all(len(lineup) == 3 and "Harrison" not in lineup for lineup, _ in sampled_results)
+    assert sampled.search_stats['lineups_evaluated'] == 12
+    
+    try:
+        bo.LineupOptimizer(players, mode='subset', lineup_size=6).optimize()
+        assert False, "lineup_size larger than the roster should be rejected"
+    except ValueError:
+        pass
+    print("Batting Subset Selection test complete!")
+
+def test_job_server():
+    print("\nTesting Job Server...")
+    import asyncio
+    import http.client
+    import job_server
+    
+    server = job_server.JobServer(port=0, progress_interval=0.05, deep_workers=1)
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(server.start())
+        started.set()
+        loop.run_forever()
+    
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    started.wait(30)
+    
+    def request(method, path, payload=None, headers=None):
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+        connection.request(method, path, json.dumps(payload) if payload is not None else None, headers or {})
+        response = connection.getresponse()
+        return response.status, json.loads(response.read() or b'null')
+    
+    def events(job_id, on_event=None):
+        # (event, data) pairs of a job's stream, through its terminal event
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+        connection.request('GET', f'/jobs/{job_id}/events')
+        response = connection.getresponse()
+        assert response.getheader('Content-Type') == 'text/event-stream'
+        received = []
+        event = None
+        for line in response:
+            line = line.decode().rstrip('\n')
+            if line.startswith('event: '):
+                event = line[len('event: '):]
+            elif line.startswith('data: '):
+                received.append((event, json.loads(line[len('data: '):])))
+                if on_event:
+                    on_event(*received[-1])
+        return received
+    
+    manager = bo.PlayerManager(bo.playerDictionary)
+    names = ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]
+    roster = {name: {'hit_chance': manager.players[name].hit_chance,
+                     'hit_probabilities': manager.players[name].hit_probabilities} for name in names}
+    try:
+        assert request('GET', '/health')[1]['status'] == 'ok'
+        assert request('POST', '/jobs', {'roster': roster, 'mode': 'sideways'})[0] == 400
+        for invalid in ({'engine': 'abacus'}, {'top_k': 0}, {'max_evaluations': -1}, {'workers': 0},
+                        {'chunk_size': 0}, {'refine_games': -1}, {'confidence': 1}, {'lineup_size': 6}):
+            assert request('POST', '/jobs', dict(invalid, roster=roster, mode='quick'))[0] == 400, invalid
+        assert request('GET', '/jobs/99')[0] == 404
+        
+        # Pages may only call in from the allowed origins (index.html as a file by default)
+        assert request('GET', '/health', headers={'Origin': 'https://example.com'})[0] == 403
+        connection = http.client.HTTPConnection('127.0.0.1', server.port, timeout=60)
+        connection.request('OPTIONS', '/jobs', headers={'Origin': 'null'})
+        response = connection.getresponse()
+        assert response.status == 204 and response.getheader('Access-Control-Allow-Origin') == 'null'
+        server.max_queued = 0
+        assert request('POST', '/jobs', {'roster': roster, 'mode': 'quick'})[0] == 429
+        server.max_queued = 16
+        
+        # A finished job reports the same lineups as running the optimizer directly
+        status, job = request('POST', '/jobs', {'roster': roster, 'mode': 'deep', 'engine': 'exact'})
+        assert status == 202
+        received = events(job['id'])
+        kinds = [event for event, _ in received]
+        print(f"{kinds.count('progress')} progress events, then {kinds[-1]}")
+        assert kinds[-1] == 'done' and 'progress' in kinds
+        progress = [data for event, data in received if event == 'progress'][-1]
+        assert progress['top_lineups'] and progress['top_lineups'][0]['rank'] == 1
+        direct = bo.LineupOptimizer({name: manager.players[name] for name in names}, mode='deep', engine='exact').optimize()
+        report = received[-1][1]
+        assert [(result['lineup'], result['avg_runs']) for result in report['results']] == direct
+        assert request('GET', f"/jobs/{job['id']}")[1]['status'] == 'done'
+        
+        # Cancelling a running job ends its stream with the lineups found so far,
+        # and a job still waiting behind it never starts
+        long_roster = dict(roster, **{f"{name} 2": stats for name, stats in roster.items()})
+        running = request('POST', '/jobs', {'roster': long_roster, 'mode': 'deep', 'seed': 1})[1]
+        queued = request('POST', '/jobs', {'roster': long_roster, 'mode': 'deep', 'seed': 2})[1]
+        
+        def cancel_on_progress(event, data):
+            if event == 'progress' and request('GET', f"/jobs/{running['id']}")[1]['status'] == 'running':
+                request('DELETE', f"/jobs/{queued['id']}")
+                request('DELETE', f"/jobs/{running['id']}")
+        
+        received = events(running['id'], cancel_on_progress)
+        assert received[-1][0] == 'cancelled' and received[-1][1]['completed'] is False
+        assert received[-1][1]['results']
+        # Late subscribers get the same final event as live ones
+        assert events(running['id'])[-1] == received[-1]
+        assert events(queued['id'])[-1] == ('cancelled', {'completed': False, 'results': []})
+        
+        # Finished jobs are forgotten after job_ttl
+        server.job_ttl = 0.2
+        expiring = request('POST', '/jobs', {'roster': roster, 'mode': 'quick', 'engine': 'exact'})[1]
+        assert events(expiring['id'])[-1][0] == 'done'
+        deadline = time.monotonic() + 10
+        while request('GET', f"/jobs/{expiring['id']}")[0] != 404:
+            assert time.monotonic() < deadline
+            time.sleep(0.1)
+    finally:
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result(60)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(10)
+    print("Job Server test complete!")
+
+def test_deep_cluster():
+    print("\nTesting Deep Cluster...")
+    import socket
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe", "Matt"]}
+    single = bo.LineupOptimizer(players, mode='deep', seed=5).optimize()
+    
+    optimizer = bo.LineupOptimizer(players, mode='deep', seed=5, chunk_size=40,
+                                   cluster_address=('127.0.0.1', 0), lease_seconds=2.0, cluster_token='s3cret')
+    results = []
+    thread = threading.Thread(target=lambda: results.extend(optimizer.optimize()))
+    thread.start()
+    while optimizer.coordinator is None or optimizer.coordinator.thread is None:
+        time.sleep(0.05)
+    host, port = optimizer.coordinator.address
+    
+    # One worker dies holding a lease, another stalls past its lease and a third
+    # sends a bogus result; all three ranges are reissued to the real workers
+    def take_lease():
+        connection = socket.create_connection((host, port))
+        stream = connection.makefile('rwb')
+        bo._send_message(stream, {'type': 'hello', 'token': 's3cret'})
+        assert bo._receive_message(stream)['type'] == 'job'
+        bo._send_message(stream, {'type': 'lease'})
+        lease = bo._receive_message(stream)
+        assert lease['type'] == 'lease'
+        return connection, stream, lease
+    
+    try:
+        bo.run_deep_worker(host, port, token='guess')
+        assert False, "worker with the wrong token was accepted"
+    except PermissionError:
+        pass
+    dead, dead_stream, _ = take_lease()
+    dead_stream.close()
+    dead.close()
+    stalled, stalled_stream, _ = take_lease()
+    liar, liar_stream, lease = take_lease()
+    bo._send_message(liar_stream, {'type': 'result', 'lease': lease['lease'], 'start': lease['start'],
+                                   'stop': lease['stop'], 'evaluated': lease['stop'] - lease['start'],
+                                   'top': [[99.0, lease['start'], list(players)[:-1]]]})
+    assert liar_stream.readline() == b''
+    liar.close()
+    
+    workers = [subprocess.Popen([sys.executable, "baseball_optimizer.py", "--worker", f"{host}:{port}",
+                                 "--coordinator-token", "s3cret"],
+                                cwd=os.path.dirname(os.path.abspath(bo.__file__)), stderr=subprocess.PIPE)
+               for _ in range(2)]
+    thread.join(120)
+    for worker in workers:
+        assert worker.wait(60) == 0
+    stalled_stream.close()
+    stalled.close()
+    
+    stats = optimizer.search_stats
+    print(f"{stats['cluster_workers']} workers, {stats['leases_issued']} leases, {stats['leases_reissued']} reissued")
+    assert results == single
+    assert stats['cluster_workers'] == 5 and stats['leases_reissued'] >= 3
+    assert stats['rejected_workers'] == 1 and stats['invalid_results'] == 1
+    assert optimizer.telemetry.snapshot['lineups'] == 720
+    print("Deep Cluster test complete!")
+
+def test_league_batch():
+    print("\nTesting League Batch...")
+    import io
+    stats = {name: {'hit_chance': bo.playerDictionary[name][1], 'hit_probabilities': bo.playerDictionary[name][2]}
+             for name in bo.playerDictionary}
+    names = list(stats)
+    league = {
+        "Small": {name: stats[name] for name in names[2:6]},
+        "Large": {name: stats[name] for name in names[3:9]},
+        "Medium": {name: stats[name] for name in names[5:10]}
+    }
+    
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "league.json")
+        with open(json_path, 'w') as f:
+            json.dump(league, f, indent=1)
+        jsonl_path = os.path.join(directory, "league.jsonl")
+        with open(jsonl_path, 'w') as f:
+            for team, roster in league.items():
+                f.write(json.dumps({'team': team, 'roster': roster}) + "\n")
+        csv_path = os.path.join(directory, "league.csv")
+        with open(csv_path, 'w') as f:
+            f.write("team,player,hit_chance,single,double,triple,home_run\n")
+            for team, roster in league.items():
+                for name, player in roster.items():
+                    f.write(",".join([team, name, str(player['hit_chance'])] +
+                                     [str(p) for p in player['hit_probabilities']]) + "\n")
+        
+        # Every format streams the same teams, even a few characters at a time
+        for path in (json_path, jsonl_path, csv_path):
+            assert list(bo.read_league(path)) == list(league.items()), path
+        with open(json_path) as f:
+            assert list(bo._json_object_members(f, chunk_size=5)) == list(league.items())
+        
+        # One job at a time starts the costliest roster first; lines are written as teams finish
+        output = io.StringIO()
+        options = {'mode': 'deep', 'seed': 4, 'top_k': 2}
+        summary = bo.optimize_league(bo.read_league(json_path), output, options, jobs=1)
+        reports = [json.loads(line) for line in output.getvalue().splitlines()]
+        print([(report['team'], report['results'][0]['avg_runs']) for report in reports])
+        assert summary['teams'] == 3 and summary['failed'] == 0
+        assert [report['team'] for report in reports] == ["Large", "Medium", "Small"]
+        for report in reports:
+            expected = bo.LineupOptimizer(bo.parse_roster(league[report['team']]), **options).optimize()
+            assert [(entry['lineup'], entry['avg_runs']) for entry in report['results']] == expected
+        
+        # A bad roster fails on its own line without stopping the others
+        output_path = os.path.join(directory, "results.jsonl")
+        with open(jsonl_path, 'a') as f:
+            f.write(json.dumps({'team': "Broken", 'roster': {"Nobody": {'hit_chance': 0.5}}}) + "\n")
+        assert bo.cli(["--league", jsonl_path, "--mode", "quick", "--seed", "3", "--jobs", "2",
+                       "--output", output_path]) == 1
+        with open(output_path) as f:
+            reports = {report['team']: report for report in map(json.loads, f)}
+        assert set(reports) == {"Small", "Large", "Medium", "Broken"}
+        assert "error" in reports["Broken"] and reports["Small"]['completed']
+    
+    # Cancelling stops reading the league: only the buffered teams are reported as not started
+    read = []
+    
+    def many_teams():
+        for index in range(50):
+            read.append(index)
+            yield f"Team {index}", league["Small"]
+    
+    cancel_event = threading.Event()
+    summary = bo.optimize_league(many_teams(), io.StringIO(), {'mode': 'quick', 'engine': 'exact'}, jobs=1,
+                                 cancel_event=cancel_event, progress_callback=lambda report: cancel_event.set())
+    assert summary['cancelled'] and summary['teams'] >= 1
+    assert len(read) == summary['teams'] + summary['not_started'] < 50
+    print("League Batch test complete!")
+
+def test_sensitivity_analysis():
+    print("\nTesting Sensitivity Analysis...")
+    if bo.np is None:
+        print("numpy not installed - skipping sensitivity analysis test")
+        return
+    manager = bo.PlayerManager(bo.playerDictionary)
+    players = {name: manager.players[name] for name in ["Jeremiah", "Ty", "Harrison", "Bob", "Joe"]}
+    simulator = bo.BaseballSimulator(players, track_metrics=False)
+    exact = bo.ExactSimulator(players)
+    lineups = [["Bob", "Jeremiah", "Ty", "Joe"], ["Harrison", "Ty", "Joe", "Bob"]]
+    
+    # Every variant plays the same games, so an unchanged roster scores identically
+    runs = simulator.simulate_grid(lineups, [players, dict(players)], 20000, bo.np.random.default_rng(4))
+    assert runs.shape == (2, 2, 20000) and (runs[0] == runs[1]).all()
+    for lineup, lineup_runs in zip(lineups, runs[0]):
+        print(f"{' -> '.join(lineup)}: grid {lineup_runs.mean():.3f}, exact {exact.expected_runs(lineup):.3f}")
+        assert abs(lineup_runs.mean() - exact.expected_runs(lineup)) < 0.1
+    
+    grid = bo.perturbation_grid(players, hit_chance_deltas=(0.2,), split_shifts=(0.5,))
+    assert len(grid) == 2 * len(players)
+    assert grid[0]['players']["Jeremiah"].hit_chance == 1.0 and players["Jeremiah"].hit_chance == 0.9
+    assert [round(p, 12) for p in grid[1]['value']] == [0.1, 0.8]
+    
+    optimizer = bo.LineupOptimizer(players, seed=6)
+    top = [lineup for lineup, _ in bo.LineupOptimizer(players, mode='deep', engine='exact', top_k=3).optimize()]
+    report = optimizer.sensitivity_analysis(top, games=3000, hit_chance_deltas=(-0.3, 0.3))
+    assert report == optimizer.sensitivity_analysis(top, games=3000, hit_chance_deltas=(-0.3, 0.3))
+    assert len(report['perturbations']) == 4 * len(players)
+    for entry in report['flips']:
+        print(f"{entry['player']} {entry['stat']} {entry['delta']:+.2f}: ranking {entry['ranking']}, "
+              f"leader margin {entry['leader_margin']:+.3f} +/- {entry['margin_std_error']:.3f}")
+    assert report['flips'] and all(entry['ranking'] != report['baseline_ranking'] for entry in report['flips'])
+    assert all(entry['changes_leader'] for entry in report['leader_beaten_by'])
+    
+    # A clearly worse lineup stays behind the leader under small changes
+    lineups_with_gap = [["Bob", "Jeremiah", "Ty", "Joe"], ["Harrison", "Ty", "Joe", "Bob"]]
+    report = optimizer.sensitivity_analysis(lineups_with_gap, games=2000, hit_chance_deltas=(-0.05, 0.05))
+    assert report['baseline_ranking'] == [0, 1] and not report['flips'] and not report['leader_beaten_by']
+    
+    # Harrison bats in neither lineup here, so changing him changes nothing
+    report = optimizer.sensitivity_analysis([lineup for lineup in lineups if "Harrison" not in lineup] +
+                                            [["Bob", "Joe", "Ty", "Jeremiah"]], games=500)
+    for entry in report['perturbations']:
+        if entry['player'] == "Harrison":
+            assert entry['scores'] == report['baseline_scores'] and not entry['flips_ranking']
+    print("Sensitivity Analysis test complete!")
+
 if __name__ == "__main__":
     print("Starting tests...\n")
     test_player_manager()
     test_simulator()
     test_quick_optimization()
+    test_exact_simulator()
+    test_batch_simulator()
+    test_parallel_deep_optimization()
+    test_bounded_top_k()
+    test_checkpoint_resume()
+    test_racing_optimization()
+    test_common_random_numbers()
+    test_collapse_duplicate_players()
+    test_metaheuristic_search()
+    test_branch_and_bound()
+    test_compiled_lineup()
+    test_streaming_metrics()
+    test_evaluation_cache()
+    test_incremental_optimization()
+    test_score_table()
+    test_reproducible_streams()
+    test_batch_cli()
+    test_interrupt_handler()
+    test_telemetry()
+    test_benchmark()
+    test_confidence_intervals()
+    test_subset_selection()
+    test_job_server()
+    test_deep_cluster()
+    test_league_batch()
+    test_sensitivity_analysis()
     print("\nAll tests complete!")